@@ -10,3 +10,6 @@ from . import stock_picking
 from . import delivery_carrier
 from . import channable_shipping_mapping
 from . import channable_sync_log
+from . import channable_feed_line
+from . import channable_offer_stock
+from . import stock_quant
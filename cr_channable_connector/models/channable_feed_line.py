@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+from odoo import models, fields, api, _
+
+
+class ChannableFeedLine(models.Model):
+    """
+    Rendered <product> element of a marketplace product feed.
+
+    The feed generator re-renders a line only when the signature of its inputs
+    (product, price, stock, feed configuration) changed since the last run,
+    then concatenates the lines into the marketplace's gzipped feed file.
+    """
+    _name = 'channable.feed.line'
+    _description = 'Channable Feed Line'
+    _order = 'marketplace_id, product_id'
+
+    marketplace_id = fields.Many2one(
+        'channable.marketplace', string='Marketplace',
+        required=True, ondelete='cascade', index=True
+    )
+    product_id = fields.Many2one(
+        'product.product', string='Product',
+        required=True, ondelete='cascade'
+    )
+    signature = fields.Char(string='Signature')
+    xml = fields.Text(string='XML')
+
+    _sql_constraints = [
+        ('marketplace_product_uniq', 'unique(marketplace_id, product_id)',
+         'A product can only appear once in a marketplace feed!')
+    ]
+
+    @api.model
+    def _render_product(self, product, marketplace, stock_qty, price, base_url, brand_fallback):
+        """The <product> element of ``product``, as the feed has always exposed it."""
+        sync_field = marketplace.sync_product_field or 'default_code'
+        channable_id = getattr(product, sync_field)
+        if not channable_id:
+            return ''
+        stock_qty = int(stock_qty) if stock_qty > 0 else 0
+
+        xml_elements = ['  <product>']
+        xml_elements.append(f'    <id>{channable_id}</id>')
+        xml_elements.append(f'    <title><![CDATA[{product.name or ""}]]></title>')
+
+        # Description (using sale description if present, else fallback to product name)
+        description = product.description_sale or product.name or ""
+        xml_elements.append(f'    <description><![CDATA[{description}]]></description>')
+        xml_elements.append(f'    <price>{price:.2f}</price>')
+        xml_elements.append(f'    <stock>{stock_qty}</stock>')
+        xml_elements.append(f'    <ean>{product.barcode or ""}</ean>')
+        xml_elements.append(f'    <sku>{product.default_code or ""}</sku>')
+
+        # Brand (fallback to seller or company name)
+        brand = ""
+        if product.seller_ids:
+            brand = product.seller_ids[0].partner_id.name or ""
+        if not brand:
+            brand = brand_fallback
+        xml_elements.append(f'    <brand><![CDATA[{brand}]]></brand>')
+
+        category = product.categ_id.complete_name or product.categ_id.name or ""
+        xml_elements.append(f'    <category><![CDATA[{category}]]></category>')
+        xml_elements.append(f'    <weight>{product.weight or 0.0:.2f}</weight>')
+
+        image_link = f"{base_url}/web/image/product.product/{product.id}/image_1920"
+        xml_elements.append(f'    <image_link><![CDATA[{image_link}]]></image_link>')
+        link = f"{base_url}/web#id={product.id}&model=product.product&view_type=form"
+        xml_elements.append(f'    <link><![CDATA[{link}]]></link>')
+
+        # Dynamic Attribute Mappings
+        for mapping in marketplace.attribute_mapping_ids:
+            tag = mapping.target_tag
+            val = ""
+            if mapping.mapping_type == 'field' and mapping.field_id:
+                field_name = mapping.field_id.name
+                try:
+                    raw_val = product[field_name]
+                    if raw_val:
+                        if hasattr(raw_val, 'display_name'):
+                            val = raw_val.display_name
+                        elif hasattr(raw_val, 'name'):
+                            val = raw_val.name
+                        else:
+                            val = str(raw_val)
+                except Exception:
+                    pass
+            elif mapping.mapping_type == 'attribute' and mapping.attribute_id:
+                attribute_id = mapping.attribute_id.id
+                matching_value = product.product_template_attribute_value_ids.filtered(
+                    lambda v: v.attribute_id.id == attribute_id
+                )
+                if matching_value:
+                    val = matching_value.name or ""
+
+            if val:
+                if any(c in val for c in ('&', '<', '>', '"', "'")):
+                    xml_elements.append(f'    <{tag}><![CDATA[{val}]]></{tag}>')
+                else:
+                    xml_elements.append(f'    <{tag}>{val}</{tag}>')
+
+        xml_elements.append('  </product>')
+        return "\n".join(xml_elements)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+"""
+Shared HTTP plumbing for the Channable API.
+
+One keep-alive ``requests.Session`` per worker process, sized for the small
+thread pools the connector uses to overlap Channable calls with database
+work. Functions here never touch the ORM so they can run in pool threads.
+"""
+import threading
+
+import requests
+
+CHANNABLE_API_URL = 'https://api.channable.com'
+# Concurrent Channable calls per pool (page prefetch, notifications, downloads)
+CHANNABLE_MAX_WORKERS = 4
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide keep-alive session for Channable calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=4, pool_maxsize=CHANNABLE_MAX_WORKERS * 2
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def auth_headers(connection):
+    return {
+        'Authorization': f'Bearer {(connection.api_token or "").strip()}',
+        'Content-Type': 'application/json',
+    }
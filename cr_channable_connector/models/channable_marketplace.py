@@ -1,14 +1,30 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
+import datetime
+import gzip
+import hashlib
+import io
 import logging
-import requests
 import uuid
 
+from psycopg2.extras import execute_values
+
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from . import channable_http
+from . import channable_stock
+
 _logger = logging.getLogger(__name__)
 
+# Re-read orders modified this long before the watermark (clock skew, late writes)
+ORDER_WATERMARK_OVERLAP = datetime.timedelta(minutes=5)
+# Products priced, counted and rendered together while generating a feed
+FEED_CHUNK_SIZE = 500
+# Every feed line is re-rendered this often, whatever the signatures say
+FEED_FULL_REBUILD_INTERVAL = datetime.timedelta(hours=24)
+# Dirty products recomputed and pushed per delta stock push round
+STOCK_PUSH_BATCH_SIZE = 1000
 
 
 class ChannableMarketplace(models.Model):
@@ -31,6 +47,11 @@ class ChannableMarketplace(models.Model):
         'res.users', string='Assign errors to this user', required=True
     )
     warehouse_id = fields.Many2one('stock.warehouse', string='Warehouse', required=True)
+    stock_quantity_type = fields.Selection([
+        ('on_hand', 'On Hand'),
+        ('free', 'Free (On Hand - Reserved)'),
+    ], string='Published Stock', default='on_hand', required=True,
+        help='Quantity sent to Channable in the product feed and the stock push.')
     carrier_id = fields.Many2one('delivery.carrier', string='Default Carrier')
 
     # ── Accounting & Sales ───────────────────────────────────────────────────
@@ -122,6 +143,24 @@ class ChannableMarketplace(models.Model):
         ('failed', 'Failed'),
         ('partial', 'Partial')
     ], string='Last Sync Status')
+    orders_modified_watermark = fields.Datetime(
+        string='Orders Synced Up To', copy=False, readonly=True,
+        help='Start of the last successful scheduled import. The next scheduled '
+             'import only fetches orders modified since then.'
+    )
+    last_full_reconcile_date = fields.Datetime(
+        string='Last Full Reconcile', copy=False, readonly=True
+    )
+    full_reconcile_interval = fields.Integer(
+        string='Full Reconcile Every (hours)', default=24,
+        help='Scheduled imports fetch only modified orders; this often they re-read '
+             'the whole import window instead, to catch anything an incremental run missed.'
+    )
+
+    feed_attachment_id = fields.Many2one('ir.attachment', string='Feed File', copy=False, readonly=True)
+    feed_etag = fields.Char(string='Feed ETag', copy=False, readonly=True)
+    feed_generated_at = fields.Datetime(string='Feed Generated On', copy=False, readonly=True)
+    feed_rebuilt_at = fields.Datetime(string='Feed Fully Rebuilt On', copy=False, readonly=True)
 
     def _compute_sync_log_count(self):
         if self.ids:
@@ -168,24 +207,31 @@ class ChannableMarketplace(models.Model):
             mp.currency_id = mp.pricelist_id.currency_id or self.env.company.currency_id
 
     def _compute_dashboard_stats(self):
+        SaleOrder = self.env['sale.order']
+        marketplace_domain = [('channable_marketplace_id', 'in', self._origin.ids)]
+        # 1. Orders pending validation (draft/sent status)
+        validation = {
+            mp.id: (count, amount)
+            for mp, count, amount in SaleOrder._read_group(
+                marketplace_domain + [('state', 'in', ['draft', 'sent'])],
+                ['channable_marketplace_id'], ['__count', 'amount_total:sum'],
+            )
+        }
+        # 2. Orders pending to be shipped
+        shipment = {
+            mp.id: (count, amount)
+            for mp, count, amount in SaleOrder._read_group(
+                marketplace_domain + [('picking_ids', 'any', [
+                    ('state', 'not in', ['done', 'cancel']),
+                    ('picking_type_code', '=', 'outgoing'),
+                ])],
+                ['channable_marketplace_id'], ['__count', 'amount_total:sum'],
+            )
+        }
         for mp in self:
-            # 1. Orders pending validation (draft/sent status)
-            validation_orders = self.env['sale.order'].search([
-                ('channable_marketplace_id', '=', mp.id),
-                ('state', 'in', ['draft', 'sent']),
-            ])
-            mp.orders_pending_validation_count = len(validation_orders)
-            mp.orders_pending_validation_amount = sum(validation_orders.mapped('amount_total'))
-
-            # 2. Orders pending to be shipped
-            pending_pickings = self.env['stock.picking'].search([
-                ('sale_id.channable_marketplace_id', '=', mp.id),
-                ('state', 'not in', ['done', 'cancel']),
-                ('picking_type_code', '=', 'outgoing'),
-            ])
-            pending_ship_orders = pending_pickings.mapped('sale_id')
-            mp.orders_pending_shipment_count = len(pending_ship_orders)
-            mp.orders_pending_shipment_amount = sum(pending_ship_orders.mapped('amount_total'))
+            mp_id = mp._origin.id
+            mp.orders_pending_validation_count, mp.orders_pending_validation_amount = validation.get(mp_id, (0, 0.0))
+            mp.orders_pending_shipment_count, mp.orders_pending_shipment_amount = shipment.get(mp_id, (0, 0.0))
 
     def _compute_kanban_dashboard_graph(self):
         import json
@@ -193,28 +239,28 @@ class ChannableMarketplace(models.Model):
         from datetime import timedelta
         from odoo.tools.misc import format_date
 
-        for mp in self:
-            today = fields.Date.today()
-            # 7 days graph
-            days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-            
-            orders = self.env['sale.order'].search([
-                ('channable_marketplace_id', '=', mp.id),
+        today = fields.Date.today()
+        # 7 days graph
+        days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+        daily_amounts = {}
+        for mp, day, amount in self.env['sale.order']._read_group(
+            [
+                ('channable_marketplace_id', 'in', self._origin.ids),
                 ('state', 'in', ['sale', 'done']),
                 ('date_order', '>=', fields.Datetime.to_string(datetime.datetime.combine(days[0], datetime.time.min))),
-            ])
-            
-            daily_amounts = {day: 0.0 for day in days}
-            for order in orders:
-                order_date = order.date_order.date()
-                if order_date in daily_amounts:
-                    daily_amounts[order_date] += order.amount_total
-            
+            ],
+            ['channable_marketplace_id', 'date_order:day'], ['amount_total:sum'],
+        ):
+            if isinstance(day, datetime.datetime):
+                day = day.date()
+            daily_amounts[(mp.id, day)] = amount
+
+        for mp in self:
             values = []
             for day in days:
                 values.append({
                     'x': format_date(self.env, day, date_format='d LLL'),
-                    'y': daily_amounts[day],
+                    'y': daily_amounts.get((mp._origin.id, day), 0.0),
                 })
             
             all_zero = all(v['y'] == 0 for v in values)
@@ -241,6 +287,73 @@ class ChannableMarketplace(models.Model):
         self.dark_mode = not self.dark_mode
         return False
 
+    def _get_warehouse_stock(self, product_ids, max_age=channable_stock.AVAILABILITY_TTL):
+        """{product id: quantity published to Channable} in the marketplace warehouse."""
+        self.ensure_one()
+        return channable_stock.get_availability(
+            self.env, self.warehouse_id, list(product_ids),
+            quantity_type=self.stock_quantity_type or 'on_hand', max_age=max_age,
+        )
+
+    def _offers_url(self):
+        connection = self.project_id.connection_id
+        return (
+            f'https://api.channable.com/v1/companies/{connection.company_id_num}'
+            f'/projects/{self.project_id.channable_identifier}/offers'
+        )
+
+    def _post_stock_offers(self, offers):
+        """Send ``offers`` to Channable in chunks of 100 to optimize payload size and avoid timeouts."""
+        url = self._offers_url()
+        headers = channable_http.auth_headers(self.project_id.connection_id)
+        session = channable_http.get_session()
+        chunk_size = 100
+        for i in range(0, len(offers), chunk_size):
+            resp = session.post(url, headers=headers, json=offers[i:i + chunk_size], timeout=30)
+            resp.raise_for_status()
+
+    def _record_pushed_stock(self, pushed, versions):
+        """
+        Store the stock sent for ``pushed`` ({product id: qty}) and clear the
+        dirty flag of the products whose ``versions`` ({product id: dirty
+        version read before computing their stock}) did not change meanwhile.
+        """
+        OfferStock = self.env['channable.offer.stock']
+        OfferStock.flush_model()
+        if pushed:
+            self.env.cr.execute("""
+                INSERT INTO channable_offer_stock AS s
+                       (marketplace_id, product_id, pushed_qty, pushed_at, dirty, dirty_version,
+                        create_uid, create_date, write_uid, write_date)
+                SELECT %(mp_id)s, r.product_id, r.qty, now() AT TIME ZONE 'UTC', false, 0,
+                       %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+                  FROM unnest(%(product_ids)s::int[], %(qtys)s::int[]) AS r(product_id, qty)
+                ON CONFLICT (marketplace_id, product_id) DO UPDATE
+                   SET pushed_qty = EXCLUDED.pushed_qty,
+                       pushed_at = EXCLUDED.pushed_at,
+                       write_uid = EXCLUDED.write_uid,
+                       write_date = EXCLUDED.write_date
+            """, {
+                'mp_id': self.id,
+                'uid': self.env.uid,
+                'product_ids': list(pushed),
+                'qtys': list(pushed.values()),
+            })
+        if versions:
+            self.env.cr.execute("""
+                UPDATE channable_offer_stock AS s
+                   SET dirty = false
+                  FROM unnest(%(product_ids)s::int[], %(versions)s::int[]) AS r(product_id, version)
+                 WHERE s.marketplace_id = %(mp_id)s
+                   AND s.product_id = r.product_id
+                   AND s.dirty_version = r.version
+            """, {
+                'mp_id': self.id,
+                'product_ids': list(versions),
+                'versions': list(versions.values()),
+            })
+        OfferStock.invalidate_model()
+
     def action_push_product_stock(self):
         self.ensure_one()
         connection = self.project_id.connection_id
@@ -266,26 +379,27 @@ class ChannableMarketplace(models.Model):
                 }
             }
 
-        url_base = (
-            f'https://api.channable.com/v1/companies/{connection.company_id_num}'
-            f'/projects/{self.project_id.channable_identifier}'
-        )
-        url = f'{url_base}/offers'
-        headers = {
-            'Authorization': f'Bearer {(connection.api_token or "").strip()}',
-            'Content-Type': 'application/json',
+        # Pending stock changes, settled by this push unless they change again meanwhile
+        versions = {
+            line['product_id'][0]: line['dirty_version']
+            for line in self.env['channable.offer.stock'].search_read(
+                [('marketplace_id', '=', self.id), ('dirty', '=', True)],
+                ['product_id', 'dirty_version'],
+            )
         }
-
+        # Quantities available in the marketplace's warehouse
+        stock = self._get_warehouse_stock(products.ids)
         offers = []
+        pushed = {}
         for product in products:
-            # Retrieve quantity available in the context of the marketplace's warehouse
-            stock_qty = product.with_context(warehouse=self.warehouse_id.id).qty_available
             channable_product_id = getattr(product, sync_field)
             if not channable_product_id:
                 continue
+            stock_qty = stock.get(product.id, 0.0)
+            pushed[product.id] = int(stock_qty) if stock_qty > 0 else 0
             offers.append({
                 'id': str(channable_product_id),
-                'stock': int(stock_qty) if stock_qty > 0 else 0
+                'stock': pushed[product.id],
             })
 
         if not offers:
@@ -300,22 +414,16 @@ class ChannableMarketplace(models.Model):
                 }
             }
 
-        # Send to Channable in chunks of 100 to optimize payload size and avoid timeouts
-        chunk_size = 100
-        total_pushed = 0
         try:
-            for i in range(0, len(offers), chunk_size):
-                chunk = offers[i:i + chunk_size]
-                resp = requests.post(url, headers=headers, json=chunk, timeout=30)
-                resp.raise_for_status()
-                total_pushed += len(chunk)
+            self._post_stock_offers(offers)
+            self._record_pushed_stock(pushed, versions)
 
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
                     'title': _('Push Product Stock Successful'),
-                    'message': _('Successfully pushed stock for %d products to Channable.') % total_pushed,
+                    'message': _('Successfully pushed stock for %d products to Channable.') % len(offers),
                     'type': 'success',
                     'sticky': False,
                 }
@@ -339,6 +447,247 @@ class ChannableMarketplace(models.Model):
                 }
             }
 
+    def _push_dirty_stock(self):
+        """Push the offers of the dirty products whose stock differs from the last push."""
+        self.ensure_one()
+        sync_field = self.sync_product_field or 'default_code'
+        OfferStock = self.env['channable.offer.stock']
+        pushed_count = 0
+        last_id = 0
+        while True:
+            lines = OfferStock.search([
+                ('marketplace_id', '=', self.id),
+                ('dirty', '=', True),
+                ('id', '>', last_id),
+            ], order='id', limit=STOCK_PUSH_BATCH_SIZE)
+            if not lines:
+                return pushed_count
+            last_id = lines[-1].id
+            versions = {line.product_id.id: line.dirty_version for line in lines}
+            # Always fresh: these products just changed
+            stock = self._get_warehouse_stock(list(versions), max_age=0)
+            offers = []
+            pushed = {}
+            for line in lines:
+                product = line.product_id
+                channable_product_id = product[sync_field]
+                stock_qty = stock.get(product.id, 0.0)
+                stock_qty = int(stock_qty) if stock_qty > 0 else 0
+                if not channable_product_id or (line.pushed_at and line.pushed_qty == stock_qty):
+                    continue
+                offers.append({'id': str(channable_product_id), 'stock': stock_qty})
+                pushed[product.id] = stock_qty
+            self._post_stock_offers(offers)
+            self._record_pushed_stock(pushed, versions)
+            self.env.cr.commit()
+            pushed_count += len(offers)
+
+    @api.model
+    def _cron_push_stock_delta(self):
+        """Cron: push the stock changes of every active marketplace."""
+        for marketplace in self.search([('active', '=', True), ('project_id.connection_id', '!=', False)]):
+            try:
+                pushed_count = marketplace._push_dirty_stock()
+                if pushed_count:
+                    _logger.info("Channable: pushed %d stock changes for marketplace '%s'", pushed_count, marketplace.name)
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Channable delta stock push failed for marketplace '%s'", marketplace.name)
+                self.env['channable.sync.error'].create({
+                    'name': _('Push Product Stock Failed'),
+                    'marketplace_id': marketplace.id,
+                    'action_attempted': 'push_stock',
+                    'detailed_description': str(e),
+                })
+                self.env.cr.commit()
+
+    @api.model
+    def _cron_push_stock_full(self):
+        """Cron: full stock push of every active marketplace, as a safety net for the delta push."""
+        for marketplace in self.search([('active', '=', True), ('project_id.connection_id', '!=', False)]):
+            marketplace.action_push_product_stock()
+            self.env.cr.commit()
+
+    # ── Product feed ──────────────────────────────────────────────────────────
+
+    def _feed_product_domain(self):
+        sync_field = self.sync_product_field or 'default_code'
+        return [
+            ('sale_ok', '=', True),
+            (sync_field, '!=', False),
+            (sync_field, '!=', ''),
+        ]
+
+    def _feed_prices(self, products):
+        """{product id: feed price} with the marketplace pricelist (list price otherwise)."""
+        prices = {product.id: product.list_price or 0.0 for product in products}
+        if self.pricelist_id:
+            try:
+                prices.update(self.pricelist_id._get_products_price(products, 1.0))
+            except Exception:
+                _logger.exception("Channable feed: pricelist prices failed for marketplace '%s'", self.name)
+        return prices
+
+    def _feed_signature_inputs(self, product):
+        """
+        What a product's feed line is rendered from besides the product and its
+        template: the records the line reads (category, main vendor, attribute
+        values, relational fields of the field mappings), as their write dates.
+        """
+        seller = product.seller_ids[:1]
+        inputs = [
+            product.categ_id.complete_name,
+            str(product.categ_id.write_date),
+            str(seller.write_date),
+            str(seller.partner_id.write_date),
+            [str(value.write_date) for value in product.product_template_attribute_value_ids],
+        ]
+        for mapping in self.attribute_mapping_ids:
+            if mapping.mapping_type == 'field' and mapping.field_id.ttype in ('many2one', 'many2many', 'one2many'):
+                try:
+                    inputs.append([str(record.write_date) for record in product[mapping.field_id.name]])
+                except Exception:
+                    pass
+        return inputs
+
+    def _generate_product_feed(self, full=False):
+        """
+        Refresh the feed lines of the products whose inputs changed and rebuild
+        the gzipped feed file when the feed content changed.
+
+        Every ``FEED_FULL_REBUILD_INTERVAL`` (or with ``full``) all the lines are
+        re-rendered, for changes no signature input catches.
+        """
+        self.ensure_one()
+        now = fields.Datetime.now()
+        full = full or not self.feed_rebuilt_at or now - self.feed_rebuilt_at >= FEED_FULL_REBUILD_INTERVAL
+        FeedLine = self.env['channable.feed.line']
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url') or ''
+        brand_fallback = self.env.company.name or ''
+        # Anything here changing invalidates every line
+        config_key = repr((
+            self.sync_product_field, base_url, brand_fallback, self.pricelist_id.id,
+            [(m.id, m.mapping_type, m.field_id.id, m.attribute_id.id, m.target_tag)
+             for m in self.attribute_mapping_ids],
+        ))
+
+        existing = {
+            line['product_id'][0]: (line['id'], line['signature'])
+            for line in FeedLine.search_read([('marketplace_id', '=', self.id)], ['product_id', 'signature'])
+        }
+        product_ids = self.env['product.product'].search(self._feed_product_domain(), order='id').ids
+        changed = False
+        for i in range(0, len(product_ids), FEED_CHUNK_SIZE):
+            products = self.env['product.product'].browse(product_ids[i:i + FEED_CHUNK_SIZE])
+            stock = self._get_warehouse_stock(products.ids)
+            prices = self._feed_prices(products)
+            to_create, to_update = [], []
+            for product in products:
+                signature = hashlib.sha1(repr((
+                    config_key, str(product.write_date), str(product.product_tmpl_id.write_date),
+                    round(stock[product.id], 4), round(prices[product.id], 2),
+                    self._feed_signature_inputs(product),
+                )).encode()).hexdigest()
+                line_id, old_signature = existing.pop(product.id, (None, None))
+                if signature == old_signature and not full:
+                    continue
+                xml = FeedLine._render_product(
+                    product, self, stock[product.id], prices[product.id], base_url, brand_fallback
+                )
+                if line_id:
+                    to_update.append((line_id, signature, xml))
+                else:
+                    to_create.append({
+                        'marketplace_id': self.id,
+                        'product_id': product.id,
+                        'signature': signature,
+                        'xml': xml,
+                    })
+            if to_create:
+                FeedLine.create(to_create)
+            if to_update:
+                execute_values(self.env.cr._obj, """
+                    UPDATE channable_feed_line AS l
+                       SET signature = v.signature, xml = v.xml,
+                           write_date = now() AT TIME ZONE 'UTC', write_uid = %s
+                      FROM (VALUES %%s) AS v(id, signature, xml)
+                     WHERE l.id = v.id
+                """ % self.env.uid, to_update)
+                FeedLine.invalidate_model(['signature', 'xml'])
+            changed = changed or bool(to_create or to_update)
+            products.invalidate_recordset()
+        if existing:
+            # Products no longer in the feed
+            FeedLine.browse([line_id for line_id, _sig in existing.values()]).unlink()
+            changed = True
+
+        if changed or not self.feed_attachment_id:
+            self._write_feed_file()
+        if full:
+            self.feed_rebuilt_at = now
+
+    def _write_feed_file(self):
+        """Concatenate the feed lines into the gzipped feed attachment."""
+        buffer = io.BytesIO()
+        # mtime=0 keeps the archive (and so its ETag) identical for identical feeds
+        with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as feed:
+            feed.write(b'<?xml version="1.0" encoding="utf-8"?>\n<products>')
+            last_product_id = 0
+            while True:
+                self.env.cr.execute("""
+                    SELECT product_id, xml FROM channable_feed_line
+                     WHERE marketplace_id = %s AND product_id > %s AND xml != ''
+                     ORDER BY product_id LIMIT %s
+                """, (self.id, last_product_id, FEED_CHUNK_SIZE))
+                rows = self.env.cr.fetchall()
+                if not rows:
+                    break
+                for product_id, xml in rows:
+                    feed.write(b'\n' + xml.encode('utf-8'))
+                last_product_id = rows[-1][0]
+            feed.write(b'\n</products>')
+        content = buffer.getvalue()
+        etag = hashlib.sha1(content).hexdigest()
+        if etag == self.feed_etag and self.feed_attachment_id:
+            return
+        vals = {
+            'name': f'channable_feed_{self.id}.xml.gz',
+            'raw': content,
+            'mimetype': 'application/gzip',
+            'res_model': self._name,
+            'res_id': self.id,
+        }
+        if self.feed_attachment_id:
+            self.feed_attachment_id.sudo().write(vals)
+        else:
+            self.feed_attachment_id = self.env['ir.attachment'].sudo().create(vals)
+        self.write({'feed_etag': etag, 'feed_generated_at': fields.Datetime.now()})
+
+    @api.model
+    def _cron_generate_product_feeds(self):
+        """Cron: refresh the product feed of every active marketplace."""
+        for marketplace in self.search([('active', '=', True)]):
+            try:
+                marketplace._generate_product_feed()
+                self.env.cr.commit()
+            except Exception:
+                self.env.cr.rollback()
+                _logger.exception("Channable feed generation failed for marketplace '%s'", marketplace.name)
+
+    def action_generate_product_feed(self):
+        self.ensure_one()
+        self._generate_product_feed(full=True)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Product Feed'),
+                'message': _('The product feed has been regenerated.'),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
     def action_sync_orders(self):
         self.ensure_one()
         return {
@@ -352,19 +701,44 @@ class ChannableMarketplace(models.Model):
 
     @api.model
     def action_sync_orders_cron(self):
-        """Cron: auto-import orders for all active marketplaces."""
+        """
+        Cron: auto-import orders for all active marketplaces.
+
+        Between full reconciles only the orders modified since the marketplace
+        watermark are requested; the import advances the watermark when it
+        succeeds.
+        """
+        now = fields.Datetime.now()
         for marketplace in self.search([('active', '=', True)]):
             try:
+                wizard_vals = {'marketplace_id': marketplace.id}
+                if not marketplace._needs_full_reconcile(now):
+                    wizard_vals['modified_since'] = (
+                        marketplace.orders_modified_watermark - ORDER_WATERMARK_OVERLAP
+                    )
                 wizard = self.env['channable.sync.orders.wizard'].with_context(
                     sync_synchronously=True,
+                    track_order_watermark=True,
                     default_marketplace_id=marketplace.id
-                ).create({
-                    'marketplace_id': marketplace.id,
-                })
+                ).create(wizard_vals)
                 wizard.action_import_orders()
             except Exception:
                 _logger.exception("Cron auto-import failed for marketplace '%s'", marketplace.name)
 
+    def _needs_full_reconcile(self, now):
+        self.ensure_one()
+        if not self.orders_modified_watermark or not self.last_full_reconcile_date:
+            return True
+        interval = datetime.timedelta(hours=max(self.full_reconcile_interval, 1))
+        return self.last_full_reconcile_date + interval <= now
+
+    def action_reset_order_watermark(self):
+        """Make the next scheduled import a full reconcile."""
+        self.write({
+            'orders_modified_watermark': False,
+            'last_full_reconcile_date': False,
+        })
+
     def action_sync_orders_shipment(self):
         """Sync shipments for all pending orders in this marketplace."""
         self.ensure_one()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+from odoo import models, fields, api, _
+
+from . import channable_stock
+
+PRECOMMIT_KEY = 'channable.dirty_stock'
+
+
+class ChannableOfferStock(models.Model):
+    """
+    Stock last pushed to Channable for a product of a marketplace.
+
+    Stock changes in a marketplace warehouse flag the product ``dirty``; the
+    delta push job recomputes only the dirty products and sends the offers
+    whose stock differs from ``pushed_qty``. ``dirty_version`` is bumped on
+    every flag so a change made while a push is running is not lost.
+    """
+    _name = 'channable.offer.stock'
+    _description = 'Channable Offer Stock'
+    _order = 'marketplace_id, product_id'
+
+    marketplace_id = fields.Many2one(
+        'channable.marketplace', string='Marketplace',
+        required=True, ondelete='cascade', index=True
+    )
+    product_id = fields.Many2one(
+        'product.product', string='Product',
+        required=True, ondelete='cascade'
+    )
+    pushed_qty = fields.Integer(string='Pushed Stock')
+    pushed_at = fields.Datetime(string='Pushed On')
+    dirty = fields.Boolean(string='To Push', index=True)
+    dirty_version = fields.Integer(string='Change Counter', default=0)
+
+    _sql_constraints = [
+        ('marketplace_product_uniq', 'unique(marketplace_id, product_id)',
+         'A product can only have one stock entry per marketplace!')
+    ]
+
+    @api.model
+    def _mark_dirty(self, product_ids, location_ids):
+        """
+        Remember that the stock of ``product_ids`` changed in ``location_ids``.
+
+        The products are flagged for the marketplaces of those locations'
+        warehouses right before the transaction commits, once per transaction.
+        """
+        pending = self.env.cr.precommit.data.get(PRECOMMIT_KEY)
+        if pending is None:
+            pending = self.env.cr.precommit.data[PRECOMMIT_KEY] = set()
+            self.env.cr.precommit.add(self._flush_dirty)
+        pending.update(zip(product_ids, location_ids))
+
+    @api.model
+    def _flush_dirty(self):
+        pending = self.env.cr.precommit.data.pop(PRECOMMIT_KEY, None)
+        if not pending:
+            return
+        channable_stock.invalidate(self.env.cr.dbname, {product_id for product_id, _loc in pending})
+        marketplaces = self.env['channable.marketplace'].sudo().search([('active', '=', True)])
+        views = [
+            (mp.id, mp.warehouse_id.view_location_id.parent_path)
+            for mp in marketplaces if mp.warehouse_id.view_location_id
+        ]
+        if not views:
+            return
+        locations = self.env['stock.location'].sudo().browse({loc_id for _pid, loc_id in pending})
+        paths = {loc.id: loc.parent_path for loc in locations if loc.usage == 'internal'}
+        rows = {
+            (mp_id, product_id)
+            for product_id, location_id in pending if location_id in paths
+            for mp_id, view_path in views if paths[location_id].startswith(view_path)
+        }
+        if not rows:
+            return
+        self.env.cr.execute("""
+            INSERT INTO channable_offer_stock
+                   (marketplace_id, product_id, dirty, dirty_version,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT mp_id, product_id, true, 1, %(uid)s, now() AT TIME ZONE 'UTC',
+                   %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM unnest(%(mp_ids)s, %(product_ids)s) AS r(mp_id, product_id)
+            ON CONFLICT (marketplace_id, product_id) DO UPDATE
+               SET dirty = true,
+                   dirty_version = channable_offer_stock.dirty_version + 1
+        """, {
+            'uid': self.env.uid,
+            'mp_ids': [mp_id for mp_id, _pid in rows],
+            'product_ids': [product_id for _mp_id, product_id in rows],
+        })
+        self.invalidate_model(['dirty', 'dirty_version'])
+        cron = self.env.ref('cr_channable_connector.ir_cron_channable_push_stock_delta', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+            # Precommit hooks run after the ORM flush
+            self.env.flush_all()
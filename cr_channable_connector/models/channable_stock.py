@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+"""
+Warehouse availability shared by the product feed and the stock push.
+
+Quantities of a whole product set come from one grouped ``stock.quant`` query
+over the internal locations of the warehouse, and are kept for a short time
+per worker process so the feed generator and the pusher reuse each other's
+results instead of recomputing ``qty_available`` product by product.
+"""
+import threading
+import time
+
+# Seconds a computed quantity can be reused
+AVAILABILITY_TTL = 60
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _compute(env, warehouse, product_ids, quantity_type):
+    groups = env['stock.quant'].sudo()._read_group(
+        [
+            ('product_id', 'in', list(product_ids)),
+            ('location_id', 'child_of', warehouse.view_location_id.id),
+            ('location_id.usage', '=', 'internal'),
+        ],
+        ['product_id'], ['quantity:sum', 'reserved_quantity:sum'],
+    )
+    quantities = dict.fromkeys(product_ids, 0.0)
+    for product, quantity, reserved in groups:
+        quantities[product.id] = quantity - reserved if quantity_type == 'free' else quantity
+    return quantities
+
+
+def get_availability(env, warehouse, product_ids, quantity_type='on_hand', max_age=AVAILABILITY_TTL):
+    """
+    {product id: quantity} of ``product_ids`` in ``warehouse``.
+
+    ``quantity_type`` is 'on_hand' (quantity in stock) or 'free' (minus the
+    reserved quantity). Quantities computed less than ``max_age`` seconds ago
+    are reused; the others are computed in one query and cached.
+    """
+    if not product_ids or not warehouse:
+        return {}
+    key = (env.cr.dbname, warehouse.id, quantity_type)
+    now = time.monotonic()
+    result = {}
+    with _cache_lock:
+        cached = _cache.get(key, {})
+        for product_id in product_ids:
+            entry = cached.get(product_id)
+            if entry and now - entry[1] < max_age:
+                result[product_id] = entry[0]
+    missing = [product_id for product_id in product_ids if product_id not in result]
+    if missing:
+        computed = _compute(env, warehouse, missing, quantity_type)
+        result.update(computed)
+        with _cache_lock:
+            cached = _cache.setdefault(key, {})
+            for product_id, quantity in computed.items():
+                cached[product_id] = (quantity, now)
+    return result
+
+
+def invalidate(dbname, product_ids):
+    """Forget the cached quantities of ``product_ids`` in every warehouse."""
+    with _cache_lock:
+        for key, cached in _cache.items():
+            if key[0] == dbname:
+                for product_id in product_ids:
+                    cached.pop(product_id, None)
@@ -1,15 +1,56 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
-import base64
-import datetime
+import hashlib
 import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from . import channable_http
+
 _logger = logging.getLogger(__name__)
 
+# Bytes read at a time while streaming an attachment to disk
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+
+def _fetch_order_attachments(url, headers):
+    """Attachment descriptions of a Channable order (pool thread, no ORM access)."""
+    resp = channable_http.get_session().get(url, headers=headers, timeout=30)
+    resp.raise_for_status()
+    return resp.json().get('order', {}).get('attachments', [])
+
+
+def _download_attachment(url):
+    """
+    Stream ``url`` into a temporary file (pool thread, no ORM access).
+
+    Returns (path, sha1 checksum, size, mimetype); the caller owns the file.
+    """
+    checksum = hashlib.sha1()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix='channable_attachment_')
+    try:
+        with os.fdopen(fd, 'wb') as tmp, \
+                channable_http.get_session().get(url, stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(ATTACHMENT_CHUNK_SIZE):
+                tmp.write(chunk)
+                checksum.update(chunk)
+                size += len(chunk)
+            mimetype = (resp.headers.get('Content-Type') or '').split(';')[0].strip()
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, checksum.hexdigest(), size, mimetype
+
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
@@ -32,6 +73,13 @@ class SaleOrder(models.Model):
     channable_error_count = fields.Integer(
         compute='_compute_channable_error_count', string='Error Count'
     )
+    channable_attachment_sync_state = fields.Selection([
+        ('done', 'Synced'),
+        ('partial', 'Partially Synced'),
+        ('error', 'Failed'),
+    ], string='Attachment Sync', copy=False, readonly=True)
+    channable_attachment_sync_date = fields.Datetime(string='Attachments Synced On', copy=False, readonly=True)
+    channable_attachment_sync_note = fields.Text(string='Attachment Sync Result', copy=False, readonly=True)
 
     @api.depends('channable_error_ids')
     def _compute_channable_error_count(self):
@@ -126,21 +174,8 @@ class SaleOrder(models.Model):
 
     @api.model
     def cron_channable_notify_shipped(self):
-        """Cron: notify Channable for all completed-but-unsynced deliveries."""
-        orders = self.search([
-            ('state', 'in', ['sale', 'done']),
-            ('channable_marketplace_id', '!=', False),
-            ('channable_status', 'not in', ['shipped', 'canceled', 'cancelled', 'manual']),
-            ('picking_ids.state', '=', 'done'),
-            ('picking_ids.channable_sync_status', '=', 'pending'),
-            ('picking_ids.date_done', '>=',
-             fields.Datetime.now() - datetime.timedelta(days=5)),
-        ])
-        for order in orders:
-            try:
-                order.action_channable_notify_shipped()
-            except Exception:
-                pass
+        """Cron: send the queued shipment notifications to Channable."""
+        self.env['stock.picking']._cron_channable_send_shipments()
 
     # ── Public Actions ────────────────────────────────────────────────────────
 
@@ -185,45 +220,155 @@ class SaleOrder(models.Model):
                 order._channable_log_error('Sync Order Error', 'sync_order', e)
 
     def action_channable_sync_attachments(self):
-        """Download / link attachments from Channable order details."""
-        for order in self.filtered(lambda o: o.channable_marketplace_id and o.channable_order_id):
+        """
+        Download / link attachments from Channable order details.
+
+        Order details and files are fetched concurrently. Downloads are
+        streamed to disk and moved into the filestore, files already attached
+        to the order (same URL or same content) are skipped, and the outcome
+        is recorded on each order.
+        """
+        orders = self.filtered(lambda o: o.channable_marketplace_id and o.channable_order_id)
+        if not orders:
+            return
+        outcomes = {order: {'added': 0, 'skipped': 0, 'errors': []} for order in orders}
+
+        # 1. Order details
+        detail_requests = {}
+        for order in orders:
             try:
                 connection, url_base, headers = order._channable_get_connection_and_headers()
-                url = f'{url_base}/orders/{order.channable_order_id}'
-                resp = requests.get(url, headers=headers, timeout=30)
-                resp.raise_for_status()
-                data = resp.json()
-                order_data = data.get('order', {})
-                attachments = order_data.get('attachments', [])
-                saving_type = order.channable_marketplace_id.saving_attachments
+            except Exception as e:
+                outcomes[order]['errors'].append(_('Order details: %s', e))
+                continue
+            detail_requests[order] = (f'{url_base}/orders/{order.channable_order_id}', headers)
+        with ThreadPoolExecutor(max_workers=channable_http.CHANNABLE_MAX_WORKERS) as executor:
+            futures = {
+                order: executor.submit(_fetch_order_attachments, *request_args)
+                for order, request_args in detail_requests.items()
+            }
+            details = {}
+            for order, future in futures.items():
+                try:
+                    details[order] = future.result()
+                except Exception as e:
+                    outcomes[order]['errors'].append(_('Order details: %s', e))
 
-                for att in attachments:
-                    att_url = att.get('url', '')
-                    att_name = att.get('name', 'channable_attachment')
-                    if not att_url:
-                        continue
-                    if saving_type == 'download':
-                        file_resp = requests.get(att_url, timeout=30)
-                        file_resp.raise_for_status()
-                        self.env['ir.attachment'].create({
-                            'name': att_name,
-                            'datas': base64.b64encode(file_resp.content),
-                            'res_model': 'sale.order',
-                            'res_id': order.id,
-                        })
-                    else:
-                        # Save URL as a chatter message link
-                        order.message_post(
-                            body=_(
-                                'Channable attachment: <a href="%s" target="_blank">%s</a>',
-                                att_url, att_name
-                            )
+        # 2. Links, and the files to download
+        Attachment = self.env['ir.attachment']
+        known = {}
+        for att in Attachment.search_read(
+            [('res_model', '=', 'sale.order'), ('res_id', 'in', orders.ids)],
+            ['res_id', 'description', 'checksum'],
+        ):
+            known.setdefault(att['res_id'], set()).update(filter(None, (att['description'], att['checksum'])))
+        downloads = []
+        for order, attachments in details.items():
+            saving_type = order.channable_marketplace_id.saving_attachments
+            order_known = known.setdefault(order.id, set())
+            for att in attachments:
+                att_url = att.get('url', '')
+                att_name = att.get('name', 'channable_attachment')
+                if not att_url:
+                    continue
+                if saving_type != 'download':
+                    # Save URL as a chatter message link
+                    order.message_post(
+                        body=_(
+                            'Channable attachment: <a href="%s" target="_blank">%s</a>',
+                            att_url, att_name
                         )
-            except Exception:
-                pass
+                    )
+                    outcomes[order]['added'] += 1
+                elif att_url in order_known:
+                    outcomes[order]['skipped'] += 1
+                else:
+                    order_known.add(att_url)
+                    downloads.append((order, att_url, att_name))
+
+        # 3. Files
+        with ThreadPoolExecutor(max_workers=channable_http.CHANNABLE_MAX_WORKERS) as executor:
+            futures = [
+                (order, att_url, att_name, executor.submit(_download_attachment, att_url))
+                for order, att_url, att_name in downloads
+            ]
+            for order, att_url, att_name, future in futures:
+                try:
+                    path, checksum, size, mimetype = future.result()
+                except Exception as e:
+                    outcomes[order]['errors'].append(f'{att_name}: {e}')
+                    continue
+                try:
+                    if checksum in known[order.id]:
+                        outcomes[order]['skipped'] += 1
+                        continue
+                    known[order.id].add(checksum)
+                    attachment = Attachment.create({
+                        'name': att_name,
+                        'description': att_url,
+                        'res_model': 'sale.order',
+                        'res_id': order.id,
+                        'mimetype': mimetype or mimetypes.guess_type(att_name)[0] or 'application/octet-stream',
+                    })
+                    self._channable_store_attachment_file(attachment, path, checksum, size)
+                    outcomes[order]['added'] += 1
+                finally:
+                    if os.path.exists(path):
+                        os.unlink(path)
+
+        # 4. Outcome per order
+        now = fields.Datetime.now()
+        for order, outcome in outcomes.items():
+            note = _('%(added)s added, %(skipped)s already attached.', added=outcome['added'], skipped=outcome['skipped'])
+            if outcome['errors']:
+                note += '\n' + '\n'.join(outcome['errors'])
+                state = 'partial' if outcome['added'] or outcome['skipped'] else 'error'
+                order._channable_log_error('Attachment Sync Error', 'sync_order', '\n'.join(outcome['errors']))
+            else:
+                state = 'done'
+            order.write({
+                'channable_attachment_sync_state': state,
+                'channable_attachment_sync_date': now,
+                'channable_attachment_sync_note': note,
+            })
+
+    @api.model
+    def _channable_store_attachment_file(self, attachment, path, checksum, size):
+        """
+        Store the downloaded file at ``path`` as the content of ``attachment``
+        (created without content). The file is moved into the filestore as is
+        rather than read in memory; ir.attachment.create ignores store_fname,
+        checksum and file_size, hence the direct update. Without a filestore
+        the content is written through the ORM.
+        """
+        Attachment = self.env['ir.attachment']
+        if Attachment._storage() != 'file':
+            with open(path, 'rb') as f:
+                attachment.write({'raw': f.read()})
+            return
+        # Same layout as ir.attachment._get_path: files scattered across 256 dirs
+        fname = f'{checksum[:2]}/{checksum}'
+        full_path = Attachment._full_path(fname)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            shutil.move(path, full_path)
+        # Removed by the filestore GC if the transaction does not commit
+        Attachment._mark_for_gc(fname)
+        # The mimetype is the one create() checked (e.g. HTML downgraded to text)
+        attachment.flush_recordset()
+        self.env.cr.execute(
+            """
+            UPDATE ir_attachment
+               SET store_fname = %s, checksum = %s, file_size = %s, mimetype = %s
+             WHERE id = %s
+        """,
+            (fname, checksum, size, attachment.mimetype, attachment.id),
+        )
+        attachment.invalidate_recordset(['store_fname', 'checksum', 'file_size', 'mimetype', 'raw', 'datas'])
 
     def action_channable_notify_shipped(self):
         """POST shipment tracking info to Channable."""
+        deliveries_to_send = self.env['stock.picking']
         for order in self.filtered(lambda o: o.channable_marketplace_id and o.channable_order_id):
             # Look for completed deliveries that haven't been synced yet
             deliveries = order.picking_ids.filtered(
@@ -237,34 +382,9 @@ class SaleOrder(models.Model):
                 )
             if not deliveries:
                 raise UserError(_('No completed deliveries found for order %s.', order.name))
-
-            delivery = deliveries[0]
-            tracking_ref = getattr(delivery, 'carrier_tracking_ref', False) or getattr(delivery, 'tracking_reference', '') or ''
-            carrier = getattr(delivery, 'carrier_id', False) or order.channable_marketplace_id.carrier_id
-            transporter_code = (
-                carrier.channable_transporter_code if carrier and carrier.channable_transporter_code else 'Other'
-            )
-
-            try:
-                connection, url_base, headers = order._channable_get_connection_and_headers()
-                url = f'{url_base}/orders/{order.channable_order_id}/shipment'
-                payload = {
-                    'tracking_code': tracking_ref or '',
-                    'transporter': transporter_code,
-                }
-                resp = requests.post(url, headers=headers, json=payload, timeout=15)
-                resp.raise_for_status()
-                order.channable_status = 'shipped'
-                delivery.channable_sync_status = 'done'
-                order.message_post(body=_("Shipment tracking %s successfully sent to Channable via %s.", tracking_ref or 'N/A', transporter_code))
-            except requests.exceptions.HTTPError as e:
-                err_msg = str(e)
-                if e.response is not None:
-                    err_msg += f"\nResponse body: {e.response.text}"
-                order._channable_log_error(
-                    'Shipment Notification Error', 'update_shipment', err_msg
-                )
-                delivery.channable_sync_status = 'error'
+            deliveries_to_send |= deliveries[0]
+        # Sent right away, in one concurrent batch; failures are queued for retry
+        deliveries_to_send._channable_send_shipments()
 
     def action_channable_cancel_order(self):
         """POST cancellation to Channable (only when order is already cancelled in Odoo)."""
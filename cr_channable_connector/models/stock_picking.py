@@ -1,10 +1,44 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
-from odoo import models, fields
+import datetime
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from odoo import models, fields, api, _
+
+from . import channable_http
 
 _logger = logging.getLogger(__name__)
 
+# Shipment notifications sent per round of the queue
+SHIPMENT_BATCH_SIZE = 100
+# Attempts before a notification is given up and reported as an error
+SHIPMENT_MAX_ATTEMPTS = 6
+# Retry delay: base * 2^(attempt - 1) seconds, capped
+SHIPMENT_RETRY_BASE = 60
+SHIPMENT_RETRY_CAP = 3600
+# Seconds a queue run may spend before handing over to a new run
+SHIPMENT_TIME_BUDGET = 240
+
+
+def _send_shipment(url, headers, payload):
+    """
+    POST one shipment notification (runs in a pool thread, no ORM access).
+
+    Returns (ok, retryable, error message).
+    """
+    try:
+        resp = channable_http.get_session().post(url, headers=headers, json=payload, timeout=15)
+    except requests.exceptions.RequestException as e:
+        return False, True, str(e)
+    if resp.ok:
+        return True, False, ''
+    err_msg = f"{resp.status_code} {resp.reason} for url: {url}\nResponse body: {resp.text}"
+    return False, resp.status_code == 429 or resp.status_code >= 500, err_msg
+
 
 class StockPicking(models.Model):
     _inherit = 'stock.picking'
@@ -15,20 +49,128 @@ class StockPicking(models.Model):
         ('error', 'Error'),
         ('manual', 'Manual'),
     ], string='Channable Sync Status', default='pending', copy=False)
+    # Shipment notification queue
+    channable_notify_queued = fields.Boolean(string='Channable Notification Queued', copy=False, index=True)
+    channable_notify_attempts = fields.Integer(string='Channable Notification Attempts', copy=False)
+    channable_notify_next_at = fields.Datetime(string='Next Channable Notification', copy=False)
+    channable_notify_error = fields.Text(string='Channable Notification Error', copy=False)
 
-    def button_validate(self):
-        """Immediately trigger Channable shipment sync when picking is validated."""
-        res = super(StockPicking, self).button_validate()
-        if self.env.context.get('skip_channable_shipment_notify'):
-            return res
-        for picking in self:
-            if (picking.state == 'done' 
-                    and picking.picking_type_code == 'outgoing' 
-                    and picking.sale_id 
-                    and picking.sale_id.channable_order_id
-                    and picking.channable_sync_status != 'done'):
-                try:
-                    picking.sale_id.action_channable_notify_shipped()
-                except Exception as e:
-                    _logger.info("Immediate Channable shipment sync failed for order %s: %s", picking.sale_id.name, str(e))
+    def _action_done(self):
+        """Queue the Channable shipment notification of validated deliveries."""
+        res = super(StockPicking, self)._action_done()
+        if not self.env.context.get('skip_channable_shipment_notify'):
+            self._channable_queue_shipment()
         return res
+
+    def _channable_queue_shipment(self):
+        pickings = self.filtered(
+            lambda p: p.state == 'done'
+            and p.picking_type_code == 'outgoing'
+            and p.sale_id.channable_order_id
+            and p.sale_id.channable_marketplace_id
+            and p.channable_sync_status != 'done'
+        )
+        if not pickings:
+            return
+        pickings.write({
+            'channable_sync_status': 'pending',
+            'channable_notify_queued': True,
+            'channable_notify_attempts': 0,
+            'channable_notify_next_at': fields.Datetime.now(),
+            'channable_notify_error': False,
+        })
+        cron = self.env.ref('cr_channable_connector.ir_cron_channable_send_shipments', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    def _channable_shipment_request(self):
+        """(url, headers, payload) of the shipment notification of this delivery."""
+        self.ensure_one()
+        order = self.sale_id
+        tracking_ref = getattr(self, 'carrier_tracking_ref', False) or getattr(self, 'tracking_reference', '') or ''
+        carrier = getattr(self, 'carrier_id', False) or order.channable_marketplace_id.carrier_id
+        transporter_code = (
+            carrier.channable_transporter_code if carrier and carrier.channable_transporter_code else 'Other'
+        )
+        connection, url_base, headers = order._channable_get_connection_and_headers()
+        url = f'{url_base}/orders/{order.channable_order_id}/shipment'
+        payload = {
+            'tracking_code': tracking_ref or '',
+            'transporter': transporter_code,
+        }
+        return url, headers, payload
+
+    def _channable_send_shipments(self):
+        """
+        Send the shipment notifications of these deliveries concurrently and
+        record the outcome on each: done, queued again with a backoff delay,
+        or error (reported in channable.sync.error).
+        """
+        requests_by_picking = {}
+        for picking in self:
+            try:
+                requests_by_picking[picking] = picking._channable_shipment_request()
+            except Exception as e:
+                picking._channable_shipment_failed(str(e), retryable=False)
+        if not requests_by_picking:
+            return
+
+        with ThreadPoolExecutor(max_workers=channable_http.CHANNABLE_MAX_WORKERS) as executor:
+            futures = {
+                picking: executor.submit(_send_shipment, *request_args)
+                for picking, request_args in requests_by_picking.items()
+            }
+            results = {picking: future.result() for picking, future in futures.items()}
+
+        for picking, (ok, retryable, err_msg) in results.items():
+            if ok:
+                tracking_ref = requests_by_picking[picking][2]['tracking_code']
+                transporter_code = requests_by_picking[picking][2]['transporter']
+                picking.write({
+                    'channable_sync_status': 'done',
+                    'channable_notify_queued': False,
+                    'channable_notify_error': False,
+                })
+                picking.sale_id.channable_status = 'shipped'
+                picking.sale_id.message_post(body=_(
+                    "Shipment tracking %s successfully sent to Channable via %s.",
+                    tracking_ref or 'N/A', transporter_code
+                ))
+            else:
+                picking._channable_shipment_failed(err_msg, retryable)
+
+    def _channable_shipment_failed(self, err_msg, retryable):
+        self.ensure_one()
+        attempts = self.channable_notify_attempts + 1
+        if retryable and attempts < SHIPMENT_MAX_ATTEMPTS:
+            delay = min(SHIPMENT_RETRY_CAP, SHIPMENT_RETRY_BASE * 2 ** (attempts - 1))
+            self.write({
+                'channable_notify_queued': True,
+                'channable_notify_attempts': attempts,
+                'channable_notify_next_at': fields.Datetime.now() + datetime.timedelta(seconds=delay),
+                'channable_notify_error': err_msg,
+            })
+            return
+        self.write({
+            'channable_sync_status': 'error',
+            'channable_notify_queued': False,
+            'channable_notify_attempts': attempts,
+            'channable_notify_error': err_msg,
+        })
+        self.sale_id._channable_log_error('Shipment Notification Error', 'update_shipment', err_msg)
+
+    @api.model
+    def _cron_channable_send_shipments(self):
+        """Cron: send the queued shipment notifications that are due, in batches."""
+        started = time.monotonic()
+        while time.monotonic() - started < SHIPMENT_TIME_BUDGET:
+            pickings = self.search([
+                ('channable_notify_queued', '=', True),
+                ('channable_notify_next_at', '<=', fields.Datetime.now()),
+            ], order='channable_notify_next_at, id', limit=SHIPMENT_BATCH_SIZE)
+            if not pickings:
+                return
+            pickings._channable_send_shipments()
+            self.env.cr.commit()
+        # Time is up with notifications left: continue in a new run
+        self.env.ref('cr_channable_connector.ir_cron_channable_send_shipments')._trigger()
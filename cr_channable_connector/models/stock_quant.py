@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+from odoo import models, api
+
+
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model
+    def _update_available_quantity(self, product_id, location_id, quantity=False, reserved_quantity=False, *args, **kwargs):
+        """Flag the product for the Channable delta stock push."""
+        res = super()._update_available_quantity(
+            product_id, location_id, quantity, reserved_quantity, *args, **kwargs
+        )
+        self.env['channable.offer.stock']._mark_dirty([product_id.id], [location_id.id])
+        return res
+
+    @api.model
+    def _update_reserved_quantity(self, product_id, location_id, quantity, *args, **kwargs):
+        """Reservations change the free quantity some marketplaces publish."""
+        res = super()._update_reserved_quantity(product_id, location_id, quantity, *args, **kwargs)
+        self.env['channable.offer.stock']._mark_dirty([product_id.id], [location_id.id])
+        return res
@@ -2,13 +2,87 @@
 # Part of Creyox Technologies
 import datetime
 import logging
-import requests
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from odoo import models, fields, api, _
 
+from ..models import channable_http
+
 _logger = logging.getLogger(__name__)
 
+# Orders requested per /orders page
+ORDER_PAGE_SIZE = 100
+# /orders filter on the order's last modification date. ASSUMPTION: this name is
+# not confirmed by Channable's API documentation. An incremental import always
+# sends 'start_date' as well (see _execute_import), so if Channable ignores this
+# parameter the read is still bounded by the watermark instead of returning every order.
+ORDER_MODIFIED_SINCE_PARAM = 'last_modified_after'
+
+
+def _fetch_orders_page(url, headers, params):
+    """One page of /orders (runs in a pool thread, no ORM access)."""
+    response = channable_http.get_session().get(url, headers=headers, params=params, timeout=30)
+    response.raise_for_status()
+    page_orders = response.json().get('orders', [])
+    _logger.info(
+        "[Channable] Raw API response | status=%s | offset=%d | URL: %s\nFetched %d orders",
+        params.get('status'), params['offset'], response.url, len(page_orders)
+    )
+    return page_orders
+
+
+def _iter_order_pages(url, headers, params, statuses):
+    """
+    Yield the /orders pages of each status filter (None for no filter) in order.
+
+    Up to CHANNABLE_MAX_WORKERS pages are requested ahead of the one handed to
+    the caller, so the next pages download while the current one is processed.
+    A short page ends the status; the requests already sent past it are dropped.
+    """
+    workers = channable_http.CHANNABLE_MAX_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for status_filter in statuses:
+                pending = deque()
+                next_offset = 0
+                while True:
+                    while len(pending) < workers:
+                        req_params = dict(params, offset=next_offset, limit=ORDER_PAGE_SIZE)
+                        if status_filter:
+                            req_params['status'] = status_filter
+                        pending.append(executor.submit(_fetch_orders_page, url, headers, req_params))
+                        next_offset += ORDER_PAGE_SIZE
+                    page_orders = pending.popleft().result()
+                    yield page_orders
+                    if len(page_orders) < ORDER_PAGE_SIZE:
+                        break
+                for future in pending:
+                    future.cancel()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _fetch_single_order(url, headers, order_id):
+    single_url = f"{url}/{order_id}"
+    _logger.info("[Channable] Fetching single order by ID: %s", single_url)
+    response = channable_http.get_session().get(single_url, headers=headers, timeout=30)
+    _logger.info("[Channable] Fetch single order ID %s response status: %s", order_id, response.status_code)
+    if response.status_code == 404:
+        _logger.info("[Channable] Order ID %s not found in Channable (404)", order_id)
+        return []
+    response.raise_for_status()
+    order_payload = response.json()
+    order_obj = order_payload.get('order') or order_payload
+    return [order_obj] if order_obj and order_obj.get('id') else []
+
+
+def _iter_orders_by_id(url, headers, order_ids):
+    """Yield each requested order as a one-order page, fetched concurrently, in input order."""
+    with ThreadPoolExecutor(max_workers=channable_http.CHANNABLE_MAX_WORKERS) as executor:
+        yield from executor.map(lambda oid: _fetch_single_order(url, headers, oid), order_ids)
+
 
 class ChannableSyncOrdersWizard(models.TransientModel):
     _name = 'channable.sync.orders.wizard'
@@ -20,6 +94,10 @@ class ChannableSyncOrdersWizard(models.TransientModel):
         default=lambda self: fields.Datetime.now() - datetime.timedelta(days=1)
     )
     date_end = fields.Datetime(string='Date To', default=fields.Datetime.now)
+    modified_since = fields.Datetime(
+        string='Modified Since',
+        help='Only import orders modified after this date, instead of the date range.'
+    )
     import_by_id = fields.Boolean(string='Import Orders by ID')
     order_ids_str = fields.Char(
         string='Order IDs',
@@ -286,6 +364,7 @@ class ChannableSyncOrdersWizard(models.TransientModel):
             'order_ids_str': self.order_ids_str,
             'date_start': self.date_start,
             'date_end': self.date_end,
+            'modified_since': self.modified_since,
             'status_not_shipped': self.status_not_shipped,
             'status_shipped': self.status_shipped,
             'status_waiting': self.status_waiting,
@@ -340,6 +419,8 @@ class ChannableSyncOrdersWizard(models.TransientModel):
 
     def _execute_import(self, marketplace):
         start_time = datetime.datetime.now()
+        # Orders modified from here on are left to the next incremental run
+        watermark = fields.Datetime.now()
         
         orders_count = 0
         total_synced = 0
@@ -358,10 +439,7 @@ class ChannableSyncOrdersWizard(models.TransientModel):
             if not connection:
                 raise Exception(_("No connection configured for this project/marketplace."))
 
-            headers = {
-                'Authorization': f'Bearer {(connection.api_token or "").strip()}',
-                'Content-Type': 'application/json',
-            }
+            headers = channable_http.auth_headers(connection)
             # Use v2 endpoint – the v1 endpoint is deprecated and returns 404
             # when status + date range parameters combined.
             url = (
@@ -372,6 +450,12 @@ class ChannableSyncOrdersWizard(models.TransientModel):
             params = {}
             if self.import_by_id and self.order_ids_str:
                 params['order_ids'] = self.order_ids_str.strip()
+            elif self.modified_since:
+                modified_since = self.modified_since.strftime('%Y-%m-%dT%H:%M:%S')
+                params[ORDER_MODIFIED_SINCE_PARAM] = modified_since
+                # Lower bound in case the filter above is not honoured; older
+                # orders modified since are caught up by the full reconcile
+                params['start_date'] = modified_since
             elif not self.import_by_id:
                 params['start_date'] = self.date_start.strftime('%Y-%m-%dT%H:%M:%S')
                 params['end_date'] = self.date_end.strftime('%Y-%m-%dT%H:%M:%S')
@@ -391,118 +475,76 @@ class ChannableSyncOrdersWizard(models.TransientModel):
                 if self.status_cancelled:
                     statuses.append('cancelled')
                 
-            orders_data = []
-            if self.import_by_id and self.order_ids_str:
-                order_ids = [oid.strip() for oid in self.order_ids_str.split(',') if oid.strip()]
-                _logger.info("[Channable] Parsed IDs to fetch: %s", order_ids)
-                for oid in order_ids:
-                    single_url = f"{url}/{oid}"
-                    _logger.info("[Channable] Fetching single order by ID: %s", single_url)
-                    response = requests.get(single_url, headers=headers, timeout=30)
-                    _logger.info("[Channable] Fetch single order ID %s response status: %s", oid, response.status_code)
-                    if response.status_code == 404:
-                        _logger.info("[Channable] Order ID %s not found in Channable (404)", oid)
-                        continue
-                    response.raise_for_status()
-                    order_payload = response.json()
-                    _logger.info("[Channable] Fetch single order ID %s payload: %s", oid, order_payload)
-                    order_obj = order_payload.get('order') or order_payload
-                    if order_obj and order_obj.get('id'):
-                        orders_data.append(order_obj)
-                            
-            elif not self.import_by_id and statuses:
-                seen_order_ids = set()
-                for status_filter in statuses:
-                    offset = 0
-                    limit = 100
-                    while True:
-                        req_params = params.copy()
-                        req_params['status'] = status_filter
-                        req_params['offset'] = offset
-                        req_params['limit'] = limit
-                        response = requests.get(url, headers=headers, params=req_params, timeout=30)
-                        response.raise_for_status()
-                        data = response.json()
-                        page_orders = data.get('orders', [])
-                        _logger.info(
-                            "[Channable] Raw API response | status=%s | offset=%d | URL: %s\nFetched %d orders",
-                            status_filter, offset, response.url, len(page_orders)
-                        )
-                        for o in page_orders:
-                            o_id = o.get('id')
-                            if o_id and o_id not in seen_order_ids:
-                                seen_order_ids.add(o_id)
-                                orders_data.append(o)
-                        if len(page_orders) < limit:
-                            break
-                        offset += limit
-            else:
-                offset = 0
-                limit = 100
-                while True:
-                    req_params = params.copy()
-                    req_params['offset'] = offset
-                    req_params['limit'] = limit
-                    response = requests.get(url, headers=headers, params=req_params, timeout=30)
-                    response.raise_for_status()
-                    data = response.json()
-                    page_orders = data.get('orders', [])
-                    _logger.info(
-                        "[Channable] Raw API response | offset=%d | URL: %s\nFetched %d orders",
-                        offset, response.url, len(page_orders)
-                    )
-                    for o in page_orders:
-                        orders_data.append(o)
-                    if len(page_orders) < limit:
-                        break
-                    offset += limit
-
-            orders_count = len(orders_data)
-            
-            if not orders_data:
-                notes = _("No orders fetched from the API.")
-                return
-
             marketplace.write({
                 'sync_in_progress': True,
-                'sync_total_orders': orders_count,
+                'sync_total_orders': 0,
                 'sync_processed_orders': 0,
             })
             self.env.cr.commit()
 
-            # Batch orders
+            if self.import_by_id and self.order_ids_str:
+                order_ids = [oid.strip() for oid in self.order_ids_str.split(',') if oid.strip()]
+                _logger.info("[Channable] Parsed IDs to fetch: %s", order_ids)
+                pages = _iter_orders_by_id(url, headers, order_ids)
+            else:
+                pages = _iter_order_pages(url, headers, params, statuses or [None])
+
+            # Pages arrive in request order while the next ones are being
+            # fetched; each is processed and committed before moving on.
             batch_size = 50
-            for i in range(0, orders_count, batch_size):
-                batch = orders_data[i:i + batch_size]
-                try:
-                    batch_result = self._process_order_batch(
-                        batch,
-                        marketplace,
-                        country_cache=country_cache,
-                        state_cache=state_cache,
-                        partner_cache=partner_cache,
-                        shipping_partner_cache=shipping_partner_cache
-                    )
-                    total_synced += batch_result.get('synced', 0)
-                    total_updated += batch_result.get('updated', 0)
-                    total_skipped += batch_result.get('skipped', 0)
-                    # Commit progress after successfully processing the batch
-                    marketplace.write({
-                        'sync_processed_orders': min(i + batch_size, orders_count),
-                    })
-                    self.env.cr.commit()
-                except Exception as batch_err:
-                    self.env.cr.rollback()
-                    _logger.exception("Error processing order batch starting at index %d: %s", i, str(batch_err))
-                    # Update processed count anyway to move forward
+            seen_order_ids = set()
+            for page_orders in pages:
+                page_orders = [
+                    o for o in page_orders
+                    if not o.get('id') or o['id'] not in seen_order_ids
+                ]
+                seen_order_ids.update(o['id'] for o in page_orders if o.get('id'))
+                if not page_orders:
+                    continue
+                orders_count += len(page_orders)
+                marketplace.write({'sync_total_orders': orders_count})
+                self.env.cr.commit()
+
+                page_start = orders_count - len(page_orders)
+                for i in range(0, len(page_orders), batch_size):
+                    batch = page_orders[i:i + batch_size]
+                    processed = min(page_start + i + batch_size, orders_count)
                     try:
+                        batch_result = self._process_order_batch(
+                            batch,
+                            marketplace,
+                            country_cache=country_cache,
+                            state_cache=state_cache,
+                            partner_cache=partner_cache,
+                            shipping_partner_cache=shipping_partner_cache
+                        )
+                        total_synced += batch_result.get('synced', 0)
+                        total_updated += batch_result.get('updated', 0)
+                        total_skipped += batch_result.get('skipped', 0)
+                        # Commit progress after successfully processing the batch
                         marketplace.write({
-                            'sync_processed_orders': min(i + batch_size, orders_count),
+                            'sync_processed_orders': processed,
                         })
                         self.env.cr.commit()
-                    except Exception:
-                        pass
-            
+                    except Exception as batch_err:
+                        self.env.cr.rollback()
+                        _logger.exception(
+                            "Error processing order batch starting at index %d: %s",
+                            page_start + i, str(batch_err)
+                        )
+                        # Update processed count anyway to move forward
+                        try:
+                            marketplace.write({
+                                'sync_processed_orders': processed,
+                            })
+                            self.env.cr.commit()
+                        except Exception:
+                            pass
+
+            if not orders_count:
+                notes = _("No orders fetched from the API.")
+                return
+
             # Determine sync status
             attempted_new = orders_count - total_skipped - total_updated
             if attempted_new > 0:
@@ -559,6 +601,11 @@ class ChannableSyncOrdersWizard(models.TransientModel):
                     'last_sync_orders_count': total_synced,
                     'last_sync_status': status,
                 })
+                if status == 'success' and self._context.get('track_order_watermark'):
+                    watermark_vals = {'orders_modified_watermark': watermark}
+                    if not self.modified_since:
+                        watermark_vals['last_full_reconcile_date'] = watermark
+                    marketplace.write(watermark_vals)
                 self.env.cr.commit()
             except Exception as mp_err:
                 _logger.info("Failed to update marketplace sync statistics: %s", str(mp_err))
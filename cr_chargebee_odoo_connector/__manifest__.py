@@ -122,7 +122,9 @@
         # "views/chargebee_subscription_view.xml",
         "views/product_template_views.xml",
         "views/chargebee_item_family_sync_wizard_form_views.xml",
+        "views/chargebee_webhook_event_views.xml",
         "data/ir_sequence_data.xml",
+        "data/ir_cron_data.xml",
         "security/ir.model.access.csv",
     ],
     "installable": True,
@@ -13,3 +13,5 @@ from . import cr_logs
 from . import res_currency
 from . import journal_configuration
 from . import chargebee_tax_configuration
+from . import chargebee_sync_cursor
+from . import chargebee_webhook_event
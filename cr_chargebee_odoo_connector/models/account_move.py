@@ -4,16 +4,36 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import chargebee
+from . import chargebee_client
 from datetime import datetime, timezone
 import logging
 import json
 import pytz
 from dateutil.relativedelta import relativedelta
-import requests
-import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .chargebee_lookup import ChargebeeLookup
 
 _logger = logging.getLogger(__name__)
 
+# Invoices handled per PDF batch and download threads per batch
+CHARGEBEE_PDF_BATCH_SIZE = 50
+CHARGEBEE_PDF_WORKERS = 8
+# Failed downloads before an invoice is left without PDF
+CHARGEBEE_PDF_MAX_ATTEMPTS = 3
+# Seconds the PDF cron runs before re-triggering itself
+CHARGEBEE_PDF_TIME_BUDGET = 240
+
+
+def _download_chargebee_pdf(stats, chargebee_id, is_refund):
+    """Return the PDF bytes of a Chargebee invoice or credit note (no ORM access)."""
+    with chargebee_client.track_api_calls(stats):
+        document = chargebee.CreditNote if is_refund else chargebee.Invoice
+        download_url = document.pdf(chargebee_id).download.download_url
+        response = chargebee_client.request("GET", download_url)
+        response.raise_for_status()
+        return response.content
+
 
 class AccountMove(models.Model):
     _inherit = "account.move"
@@ -30,6 +50,14 @@ class AccountMove(models.Model):
     adjustments = fields.Text(
         string="Adjustments", help="Adjustment credit notes stored as JSON"
     )
+    chargebee_pdf_state = fields.Selection(
+        [("pending", "To Fetch"), ("done", "Attached"), ("failed", "Failed")],
+        string="Chargebee PDF",
+        copy=False,
+        index=True,
+        help="State of the Chargebee PDF download, done in the background after the sync",
+    )
+    chargebee_pdf_attempts = fields.Integer(string="PDF Download Attempts", copy=False)
 
     def _sequence_matches_date(self):
         """Override to bypass Odoo's sequence validation for Chargebee invoices."""
@@ -51,62 +79,138 @@ class AccountMove(models.Model):
         if not self.chargebee_id:
             _logger.info("Skipping PDF download: Invoice has no chargebee_id")
             return
+        self._attach_chargebee_pdfs()
 
-        # Check if the PDF is already attached to avoid duplication
-        attachment_name = f"Chargebee_{self.chargebee_id}.pdf"
-        existing_attachment = self.env['ir.attachment'].sudo().search([
-            ('res_model', '=', 'account.move'),
-            ('res_id', '=', self.id),
-            ('name', '=', attachment_name)
-        ], limit=1)
+    def _queue_chargebee_pdf(self):
+        """Mark invoices for the PDF cron instead of downloading during the sync."""
+        to_queue = self.filtered(
+            lambda m: m.chargebee_id and m.chargebee_pdf_state not in ("pending", "done")
+        )
+        if not to_queue:
+            return
+        to_queue.sudo().write({"chargebee_pdf_state": "pending", "chargebee_pdf_attempts": 0})
 
-        if existing_attachment:
-            _logger.info("PDF attachment %s already exists for invoice %s", attachment_name, self.name)
+    @api.model
+    def _trigger_chargebee_pdf_cron(self):
+        """Wake the PDF cron up once at the end of a sync run if invoices are waiting."""
+        if self.sudo().search_count([("chargebee_pdf_state", "=", "pending")], limit=1):
+            self.env.ref(
+                "cr_chargebee_odoo_connector.ir_cron_fetch_chargebee_pdfs"
+            ).sudo()._trigger()
+
+    def _attach_chargebee_pdfs(self):
+        """
+        Download the Chargebee PDF of every invoice in ``self`` that has none yet.
+
+        Existing attachments are found with a single query, the PDFs are
+        downloaded in a bounded thread pool over the shared Chargebee session
+        (threads never touch the ORM) and the attachments are created in one batch.
+        """
+        moves = self.filtered("chargebee_id").sudo()
+        if not moves:
             return
+        names = {move.id: f"Chargebee_{move.chargebee_id}.pdf" for move in moves}
+        existing = self.env["ir.attachment"].sudo().search_read(
+            [
+                ("res_model", "=", "account.move"),
+                ("res_id", "in", moves.ids),
+                ("name", "in", list(set(names.values()))),
+            ],
+            ["res_id", "name"],
+        )
+        attached = {(att["res_id"], att["name"]) for att in existing}
+        done = moves.filtered(lambda m: (m.id, names[m.id]) in attached)
+        todo = moves - done
+
+        contents = {}
+        if todo:
+            chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
+            if not chargebee_config or not chargebee_config.api_key or not chargebee_config.site_name:
+                _logger.info("Skipping PDF download: Chargebee configuration is incomplete")
+                return
+            chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
+
+            stats = chargebee_client.current_stats()
+            with ThreadPoolExecutor(
+                max_workers=min(CHARGEBEE_PDF_WORKERS, len(todo))
+            ) as pool:
+                futures = {
+                    pool.submit(
+                        _download_chargebee_pdf,
+                        stats,
+                        move.chargebee_id,
+                        move.move_type in ("out_refund", "in_refund"),
+                    ): move
+                    for move in todo
+                }
+                for future in as_completed(futures):
+                    move = futures[future]
+                    try:
+                        contents[move.id] = future.result()
+                    except Exception as e:
+                        _logger.info(
+                            "Error fetching PDF from Chargebee for invoice %s: %s", move.name, str(e)
+                        )
 
-        # Load Chargebee config
+        fetched = todo.filtered(lambda m: m.id in contents)
+        attachments = self.env["ir.attachment"].sudo().create(
+            [
+                {
+                    "name": names[move.id],
+                    "type": "binary",
+                    "raw": contents[move.id],
+                    "res_model": "account.move",
+                    "res_id": move.id,
+                    "mimetype": "application/pdf",
+                }
+                for move in fetched
+            ]
+        )
+        for move, attachment in zip(fetched, attachments):
+            move.message_post(
+                body=_("Synced Chargebee Invoice PDF"), attachment_ids=[attachment.id]
+            )
+        if fetched:
+            _logger.info("Attached %s Chargebee PDFs", len(fetched))
+
+        (done | fetched).write({"chargebee_pdf_state": "done"})
+        for move in todo - fetched:
+            attempts = move.chargebee_pdf_attempts + 1
+            move.write(
+                {
+                    "chargebee_pdf_attempts": attempts,
+                    "chargebee_pdf_state": (
+                        "failed" if attempts >= CHARGEBEE_PDF_MAX_ATTEMPTS else "pending"
+                    ),
+                }
+            )
+
+    @api.model
+    @chargebee_client.tracked
+    def _cron_fetch_chargebee_pdfs(self):
+        """Attach the PDFs of queued Chargebee invoices, batch by batch."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
         if not chargebee_config or not chargebee_config.api_key or not chargebee_config.site_name:
-            _logger.info("Skipping PDF download: Chargebee configuration is incomplete")
             return
 
-        # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
-
-        try:
-            # 1. Fetch PDF URL from Chargebee (differentiate invoice vs credit note)
-            if self.move_type in ('out_refund', 'in_refund'):
-                pdf_data = chargebee.CreditNote.pdf(self.chargebee_id)
-            else:
-                pdf_data = chargebee.Invoice.pdf(self.chargebee_id)
-            download_url = pdf_data.download.download_url
-
-            # 2. Download the PDF content
-            response = requests.get(download_url, timeout=30)
-            if response.status_code == 200:
-                pdf_content = base64.b64encode(response.content)
-
-                # 3. Create ir.attachment in Odoo
-                attachment = self.env['ir.attachment'].sudo().create({
-                    'name': attachment_name,
-                    'type': 'binary',
-                    'datas': pdf_content,
-                    'res_model': 'account.move',
-                    'res_id': self.id,
-                    'mimetype': 'application/pdf',
-                })
-
-                # 4. Post attachment to invoice chatter
-                self.message_post(
-                    body=_("Synced Chargebee Invoice PDF"),
-                    attachment_ids=[attachment.id]
-                )
-                _logger.info("Successfully fetched and attached Chargebee PDF for invoice %s", self.name)
-            else:
-                _logger.info("Failed to download PDF from Chargebee. HTTP Status: %s", response.status_code)
+        started = time.time()
+        tried = []
+        while time.time() - started < CHARGEBEE_PDF_TIME_BUDGET:
+            moves = self.sudo().search(
+                [("chargebee_pdf_state", "=", "pending"), ("id", "not in", tried)],
+                limit=CHARGEBEE_PDF_BATCH_SIZE,
+                order="id",
+            )
+            if not moves:
+                return
+            tried += moves.ids
+            moves._attach_chargebee_pdfs()
+            self.env.cr.commit()
 
-        except Exception as e:
-            _logger.info("Error fetching PDF from Chargebee for invoice %s: %s", self.name, str(e))
+        # Time budget spent: carry on in a fresh run
+        self.env.ref(
+            "cr_chargebee_odoo_connector.ir_cron_fetch_chargebee_pdfs"
+        ).sudo()._trigger()
 
     def convert_timestamp_to_datetime(self, timestamp):
         """Convert a timestamp to a datetime object."""
@@ -197,7 +301,7 @@ class AccountMove(models.Model):
             raise UserError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         for invoice in invoices:
             if invoice.move_type == "out_refund":
@@ -235,7 +339,7 @@ class AccountMove(models.Model):
                         invoice_data = None
                         if invoice.chargebee_id:
                             try:
-                                chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+                                chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
                                 invoice_result = chargebee.Invoice.retrieve(invoice.chargebee_id)
                                 invoice_data = invoice_result.invoice
                             except Exception as e:
@@ -309,6 +413,7 @@ class AccountMove(models.Model):
 
         return invoices
 
+    @chargebee_client.tracked
     def action_sync_credit_notes(self):
         """Sync only credit notes from Chargebee."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -319,16 +424,19 @@ class AccountMove(models.Model):
         ):
             raise UserError(_("Chargebee configuration is incomplete."))
 
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
         try:
             _logger.info("Starting Chargebee credit note sync...")
-            credit_notes = chargebee.CreditNote.list({"limit": 100})
+            lookup = ChargebeeLookup(self.env)
+            credit_notes = chargebee_config._chargebee_iter_records(
+                "credit_notes",
+                chargebee.CreditNote.list,
+                on_page=lambda records: self._prefetch_chargebee_documents(lookup, records),
+            )
             for credit_note_data in credit_notes:
                 credit_note = credit_note_data.credit_note
 
-                cn_company = self.env[
-                    "res.company"
-                ].get_or_create_company_from_chargebee(credit_note.business_entity_id)
+                cn_company = lookup.company(credit_note.business_entity_id)
                 # Check if the credit note already exists
                 existing_cn = (
                     self.env["account.move"]
@@ -345,7 +453,7 @@ class AccountMove(models.Model):
                     _logger.info(
                         f"Credit note {existing_cn.name} already exists. Skipping."
                     )
-                    existing_cn._fetch_and_attach_chargebee_pdf()
+                    existing_cn._queue_chargebee_pdf()
                     self.env.cr.commit()
                     continue
 
@@ -377,7 +485,8 @@ class AccountMove(models.Model):
                 cn_journal = self._get_credit_note_journal_from_chargebee_family(
                     chargebee_config,
                     cn_company,
-                    chargebee_line_items
+                    chargebee_line_items,
+                    lookup=lookup,
                 )
 
                 # Create credit note
@@ -388,7 +497,7 @@ class AccountMove(models.Model):
                         {
                             "name": credit_note.id,
                             "move_type": "out_refund",
-                            "partner_id": self._get_or_create_partner(credit_note).id,
+                            "partner_id": self._get_or_create_partner(credit_note, lookup).id,
                             "chargebee_id": credit_note.id,
                             "invoice_date": fields.Datetime.to_string(
                                 datetime.utcfromtimestamp(credit_note.date)
@@ -400,9 +509,10 @@ class AccountMove(models.Model):
                     )
                 )
                 if new_cn:
-                    new_cn._fetch_and_attach_chargebee_pdf()
+                    new_cn._queue_chargebee_pdf()
                     self.env.cr.commit()
 
+            self._trigger_chargebee_pdf_cron()
             _logger.info("Credit note sync completed successfully.")
         except Exception as e:
             _logger.error(f"Error syncing credit notes: {e}")
@@ -460,7 +570,7 @@ class AccountMove(models.Model):
                     chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
                     # Get credit notes related to this invoice
                     try:
-                        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+                        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
                         credit_notes = chargebee.CreditNote.list(
                             {"reference_invoice_id[is]": invoice.chargebee_id}
                         )
@@ -512,13 +622,13 @@ class AccountMove(models.Model):
                         }
                     )
                     if new_cn:
-                        new_cn._fetch_and_attach_chargebee_pdf()
+                        new_cn._queue_chargebee_pdf()
                         self.env.cr.commit()
                 else:
                     _logger.info(
                         f"Credit note {credit_note.id} already exists for invoice {invoice.chargebee_id}."
                     )
-                    existing_cn._fetch_and_attach_chargebee_pdf()
+                    existing_cn._queue_chargebee_pdf()
                     self.env.cr.commit()
         except chargebee.APIError as e:
             _logger.error(
@@ -538,6 +648,7 @@ class AccountMove(models.Model):
                 )
             )
 
+    @chargebee_client.tracked
     def action_sync_account_invoices(self):
         """Sync invoices from Chargebee and create products if they do not exist."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -549,12 +660,18 @@ class AccountMove(models.Model):
             raise UserError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         try:
             start_time = datetime.now()
             total_records = 0
-            invoices = chargebee.Invoice.list({"limit": 100})
+            lookup = ChargebeeLookup(self.env)
+            invoices = chargebee_config._chargebee_iter_records(
+                "invoices",
+                chargebee.Invoice.list,
+                incremental=True,
+                on_page=lambda records: self._prefetch_chargebee_documents(lookup, records),
+            )
             for inv_data in invoices:
                 invoice = inv_data.invoice
 
@@ -563,9 +680,7 @@ class AccountMove(models.Model):
                 #     _logger.info(f"Skipping subscription invoice with id {invoice.id}")
                 #     continue
 
-                invoice_company = self.env[
-                    "res.company"
-                ].get_or_create_company_from_chargebee(invoice.business_entity_id)
+                invoice_company = lookup.company(invoice.business_entity_id)
                 # Check if the invoice already exists
                 existing_invoice = (
                     self.env["account.move"]
@@ -582,7 +697,7 @@ class AccountMove(models.Model):
                     _logger.info(
                         f"Skipping reconciled invoice: {existing_invoice.name}"
                     )
-                    existing_invoice._fetch_and_attach_chargebee_pdf()
+                    existing_invoice._queue_chargebee_pdf()
                     self.env.cr.commit()
                     continue
 
@@ -591,12 +706,7 @@ class AccountMove(models.Model):
                 for item in getattr(invoice, "line_items", []):
                     # Check if the product exists
                     entity_id = getattr(item, 'entity_id', None) or item.id
-                    product = self.env["product.product"].search(
-                        [
-                            ("default_code", "=", entity_id),
-                        ],
-                        limit=1,
-                    )
+                    product = lookup.product(entity_id)
                     if not product:
                         # Create product if it doesn't exist
                         product = (
@@ -616,6 +726,7 @@ class AccountMove(models.Model):
                             )
                         )
                         product.product_tmpl_id._apply_chargebee_configured_taxes()
+                        lookup.remember_product(product)
                         _logger.info(
                             f"Created product {product.name} with Chargebee ID {entity_id}."
                         )
@@ -654,7 +765,8 @@ class AccountMove(models.Model):
                 invoice_journal = self._get_invoice_journal_from_chargebee_family(
                     chargebee_config,
                     invoice_company,
-                    chargebee_line_items
+                    chargebee_line_items,
+                    lookup=lookup,
                 )
         
                 if not invoice_journal:
@@ -678,7 +790,7 @@ class AccountMove(models.Model):
                     "name": invoice.id,
                     "move_type": "out_invoice",
                     "invoice_date": self.convert_timestamp_to_datetime(invoice.date),
-                    "partner_id": self._get_or_create_partner(invoice).id,
+                    "partner_id": self._get_or_create_partner(invoice, lookup).id,
                     "chargebee_id": invoice.id,
                     "invoice_line_ids": line_items,
                     "fiscal_position_id": False,
@@ -706,14 +818,15 @@ class AccountMove(models.Model):
                 # Handle linked payments for paid invoices
                 if invoice.status == "paid" and invoice.linked_payments and odoo_invoice:
                     self._register_chargebee_payment(
-                        odoo_invoice, invoice.linked_payments
+                        odoo_invoice, invoice.linked_payments, lookup=lookup
                     )
                     self.env.cr.commit()
 
                 # Fetch and attach PDF from Chargebee
                 if odoo_invoice:
-                    odoo_invoice._fetch_and_attach_chargebee_pdf()
+                    odoo_invoice._queue_chargebee_pdf()
                     self.env.cr.commit()
+            self._trigger_chargebee_pdf_cron()
             # Log successful data processing
             self.env["cr.data.processing.log"].sudo()._log_data_processing(
                 table_name="Account Invoice",
@@ -744,7 +857,7 @@ class AccountMove(models.Model):
                 )
             )
 
-    def _register_chargebee_payment(self, odoo_invoice, linked_payments):
+    def _register_chargebee_payment(self, odoo_invoice, linked_payments, lookup=None):
         """Register payments for a synced Chargebee invoice."""
         _logger.info("registering payment")
 
@@ -759,13 +872,14 @@ class AccountMove(models.Model):
 
         _logger.info("invoice company while registering payment : %s", odoo_invoice.company_id)
 
-        chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
+        lookup = lookup or ChargebeeLookup(self.env)
+        chargebee_config = lookup.config()
 
         # Get invoice data to extract line items
         invoice_data = None
         if odoo_invoice.chargebee_id:
             try:
-                chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+                chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
                 invoice_result = chargebee.Invoice.retrieve(odoo_invoice.chargebee_id)
                 invoice_data = invoice_result.invoice
             except Exception as e:
@@ -784,14 +898,16 @@ class AccountMove(models.Model):
             invoice_payment_journal = self._get_payment_journal_from_chargebee_family(
                 chargebee_config,
                 odoo_invoice.company_id,
-                line_items_list
+                line_items_list,
+                lookup=lookup,
             )
         else:
             # Fallback to company-only
             invoice_payment_journal = self._get_payment_journal_from_chargebee_family(
                 chargebee_config,
                 odoo_invoice.company_id,
-                []
+                [],
+                lookup=lookup,
             )
 
         # Ensure we have a valid journal
@@ -871,6 +987,7 @@ class AccountMove(models.Model):
                     f"Failed to register payment for invoice {odoo_invoice.name}: {e}"
                 )
 
+    @chargebee_client.tracked
     def sync_subscription_from_chargebee(self):
         """Sync Chargebee Subscription as Invoice in Odoo"""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -882,12 +999,20 @@ class AccountMove(models.Model):
             raise UserError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         try:
             start_time = datetime.now()
             total_records = 0
-            subscriptions = chargebee.Subscription.list({"limit": 100})
+            lookup = ChargebeeLookup(self.env)
+            subscriptions = chargebee_config._chargebee_iter_records(
+                "subscriptions",
+                chargebee.Subscription.list,
+                incremental=True,
+                on_page=lambda records: self._prefetch_chargebee_subscriptions(
+                    lookup, records
+                ),
+            )
 
             for sub_data in subscriptions:
                 subscription = sub_data.subscription
@@ -902,9 +1027,7 @@ class AccountMove(models.Model):
                 # Fetch customer details for partner creation
                 customer = chargebee.Customer.retrieve(subscription.customer_id)
 
-                subs_company = self.env[
-                    "res.company"
-                ].get_or_create_company_from_chargebee(subscription.business_entity_id)
+                subs_company = lookup.company(subscription.business_entity_id)
 
                 # Check if the invoice already exists (assuming a 'chargebee_subscription_id' field on account.move)
                 existing_invoice = (
@@ -922,7 +1045,7 @@ class AccountMove(models.Model):
                     _logger.info(
                         f"Skipping posted subscription invoice: {existing_invoice.name}"
                     )
-                    existing_invoice._fetch_and_attach_chargebee_pdf()
+                    existing_invoice._queue_chargebee_pdf()
                     self.env.cr.commit()
                     continue
 
@@ -934,13 +1057,7 @@ class AccountMove(models.Model):
                     line_items = []
                     for item in getattr(subscription, "subscription_items", []):
                         # Check if the product exists
-                        product = self.env["product.product"].search(
-                            [
-                                ("default_code", "=", item.item_price_id),
-                                ("company_id", "=", subs_company.id),
-                            ],
-                            limit=1,
-                        )
+                        product = lookup.product(item.item_price_id, subs_company)
                         if not product:
                             # Create product if it doesn't exist
                             product = (
@@ -961,6 +1078,7 @@ class AccountMove(models.Model):
                                 )
                             )
                             product.product_tmpl_id._apply_chargebee_configured_taxes()
+                            lookup.remember_product(product, subs_company)
                             _logger.info(
                                 f"Created product {product.name} with Chargebee Item Price ID {item.item_price_id}."
                             )
@@ -999,7 +1117,8 @@ class AccountMove(models.Model):
                     invoice_journal = self._get_invoice_journal_from_chargebee_family(
                         chargebee_config,
                         subs_company,
-                        chargebee_line_items
+                        chargebee_line_items,
+                        lookup=lookup,
                     )
 
                     if not invoice_journal:
@@ -1026,7 +1145,7 @@ class AccountMove(models.Model):
                             subscription.started_at
                         ),
                         "partner_id": self.create_partner_for_subscription(
-                            subscription
+                            subscription, lookup
                         ).id,
                         "chargebee_id": subscription.id,
                         "invoice_line_ids": line_items,
@@ -1049,10 +1168,11 @@ class AccountMove(models.Model):
                         super(AccountMove, odoo_invoice).action_post()
                     self.env.cr.commit()
                     if odoo_invoice:
-                        odoo_invoice._fetch_and_attach_chargebee_pdf()
+                        odoo_invoice._queue_chargebee_pdf()
                         self.env.cr.commit()
                     total_records += 1
 
+            self._trigger_chargebee_pdf_cron()
             # Log successful data processing
             self.env["cr.data.processing.log"].sudo()._log_data_processing(
                 table_name="Subscription",
@@ -1083,8 +1203,47 @@ class AccountMove(models.Model):
                 )
             )
 
-    def _get_or_create_partner(self, invoice):
+    def _prefetch_chargebee_documents(self, lookup, documents):
+        """Load the companies, products and partners a page of invoices or credit notes uses."""
+        documents = [doc for doc in documents if doc]
+        lookup.prefetch_companies(
+            getattr(doc, "business_entity_id", None) for doc in documents
+        )
+        lookup.prefetch_products(
+            getattr(item, "entity_id", None) or item.id
+            for doc in documents
+            for item in getattr(doc, "line_items", None) or []
+        )
+        addresses = [getattr(doc, "billing_address", None) for doc in documents]
+        lookup.prefetch_partners(
+            customer_ids=[getattr(doc, "customer_id", None) for doc in documents],
+            emails=[getattr(address, "email", None) for address in addresses],
+            names=[
+                f"{getattr(address, 'first_name', '')} {getattr(address, 'last_name', '')}".strip()
+                for address in addresses
+            ],
+        )
+
+    def _prefetch_chargebee_subscriptions(self, lookup, subscriptions):
+        """Load the companies and products a page of subscriptions uses."""
+        subscriptions = [sub for sub in subscriptions if sub]
+        lookup.prefetch_companies(
+            getattr(sub, "business_entity_id", None) for sub in subscriptions
+        )
+        codes_by_company = {}
+        for sub in subscriptions:
+            company = lookup._companies.get(getattr(sub, "business_entity_id", None))
+            if not company:
+                continue
+            codes_by_company.setdefault(company, set()).update(
+                item.item_price_id for item in getattr(sub, "subscription_items", None) or []
+            )
+        for company, codes in codes_by_company.items():
+            lookup.prefetch_products(codes, company)
+
+    def _get_or_create_partner(self, invoice, lookup=None):
         """Fetch or create a partner based on Chargebee invoice data."""
+        lookup = lookup or ChargebeeLookup(self.env)
         billing_address = getattr(invoice, "billing_address", None)
         vat_number = getattr(invoice, "vat_number", False)
         if not vat_number and billing_address:
@@ -1094,15 +1253,7 @@ class AccountMove(models.Model):
         email = getattr(billing_address, "email", None)
         full_name = f"{getattr(billing_address, 'first_name', '')} {getattr(billing_address, 'last_name', '')}".strip()
 
-        partner = False
-        if customer_id:
-            partner = self.env["res.partner"].sudo().search([("chargebee_customer_id", "=", customer_id)], limit=1)
-
-        if not partner and email:
-            partner = self.env["res.partner"].sudo().search([("email", "=", email)], limit=1)
-
-        if not partner and full_name:
-            partner = self.env["res.partner"].sudo().search([("name", "=", full_name)], limit=1)
+        partner = lookup.partner(customer_id, email, full_name)
 
         if not partner:
             # Fetch actual customer details from Chargebee to get email and address
@@ -1146,21 +1297,12 @@ class AccountMove(models.Model):
                         "is_company": True,
                         "chargebee_customer_id": customer_id,
                         "vat": vat_number,
-                        "country_id": self.env["res.country"]
-                        .sudo()
-                        .search(
-                            [("name", "=", country_name)],
-                            limit=1,
-                        )
-                        .id,
-                        "company_id": self.env["res.company"]
-                        .get_or_create_company_from_chargebee(
-                            invoice.business_entity_id
-                        )
-                        .id,
+                        "country_id": lookup.country(name=country_name).id,
+                        "company_id": lookup.company(invoice.business_entity_id).id,
                     }
                 )
             )
+            lookup.remember_partner(partner)
 
         vals_to_write = {}
         if customer_id and not partner.chargebee_customer_id:
@@ -1169,11 +1311,13 @@ class AccountMove(models.Model):
             vals_to_write['vat'] = vat_number
         if vals_to_write:
             partner.write(vals_to_write)
+            lookup.remember_partner(partner)
             _logger.info("Updated partner '%s' with %s during manual invoice sync", partner.name, vals_to_write)
         return partner
 
-    def create_partner_for_subscription(self, invoice):
+    def create_partner_for_subscription(self, invoice, lookup=None):
         """Fetch or create a partner based on Chargebee invoice data."""
+        lookup = lookup or ChargebeeLookup(self.env)
         billing_address = getattr(invoice, "billing_address", None)
         full_name = f"Subscription Partner"
         customer_id = getattr(invoice, "customer_id", None)
@@ -1199,16 +1343,10 @@ class AccountMove(models.Model):
                     "zip": getattr(billing_address, "zip", ""),
                     "is_company": True,
                     "vat": vat_number,
-                    "country_id": self.env["res.country"]
-                    .sudo()
-                    .search(
-                        [("name", "=", getattr(billing_address, "country", ""))],
-                        limit=1,
-                    )
-                    .id,
-                    "company_id": self.env["res.company"]
-                    .get_or_create_company_from_chargebee(invoice.business_entity_id)
-                    .id,
+                    "country_id": lookup.country(
+                        name=getattr(billing_address, "country", "")
+                    ).id,
+                    "company_id": lookup.company(invoice.business_entity_id).id,
                 }
             )
         )
@@ -1240,10 +1378,10 @@ class AccountMove(models.Model):
                 self.env.cr.execute("SELECT pg_advisory_xact_lock(%s)", (lock_key,))
                 _logger.info("Acquired advisory lock for customer '%s'", customer_id)
 
+            lookup = ChargebeeLookup(self.env)
+
             # Get or create company based on business entity
-            invoice_company = self.env['res.company'].get_or_create_company_from_chargebee(
-                business_entity_id
-            )
+            invoice_company = lookup.company(business_entity_id)
 
             # Check if invoice already exists
             existing_invoice = self.sudo().search([
@@ -1266,7 +1404,8 @@ class AccountMove(models.Model):
             # Prepare line items
             line_items = self._prepare_invoice_lines_from_webhook(
                 invoice_data.get('line_items', []),
-                invoice_company
+                invoice_company,
+                lookup=lookup,
             )
 
 
@@ -1275,13 +1414,14 @@ class AccountMove(models.Model):
                 return None
 
             # Get appropriate journal
-            chargebee_config = self.env['chargebee.configuration'].search([], limit=1)
+            chargebee_config = lookup.config()
 
             # Get journal based on family from Chargebee API
             invoice_journal = self._get_invoice_journal_from_chargebee_family(
                 chargebee_config,
                 invoice_company,
-                invoice_data.get('line_items', [])
+                invoice_data.get('line_items', []),
+                lookup=lookup,
             )
 
 
@@ -1292,7 +1432,9 @@ class AccountMove(models.Model):
                 )
 
             # Get or create partner
-            partner = self._get_or_create_partner_from_webhook(invoice_data, invoice_company)
+            partner = self._get_or_create_partner_from_webhook(
+                invoice_data, invoice_company, lookup=lookup
+            )
 
             # Prepare invoice values
             invoice_vals = {
@@ -1324,12 +1466,14 @@ class AccountMove(models.Model):
 
             # Fetch and attach PDF from Chargebee
             if odoo_invoice:
-                odoo_invoice._fetch_and_attach_chargebee_pdf()
+                odoo_invoice._queue_chargebee_pdf()
                 self.env.cr.commit()
 
             # Handle payments if invoice is paid
             if invoice_data.get('status') == 'paid':
-                self._process_webhook_payments(odoo_invoice, invoice_data, webhook_content)
+                self._process_webhook_payments(
+                    odoo_invoice, invoice_data, webhook_content, lookup=lookup
+                )
 
             return odoo_invoice
 
@@ -1361,7 +1505,7 @@ class AccountMove(models.Model):
             self.env.cr.rollback()
             raise
 
-    def _prepare_invoice_lines_from_webhook(self, line_items, company):
+    def _prepare_invoice_lines_from_webhook(self, line_items, company, lookup=None):
         """
         Prepare invoice lines from webhook line items data.
 
@@ -1373,10 +1517,12 @@ class AccountMove(models.Model):
             list: Invoice line items in Odoo format
         """
         prepared_lines = []
+        lookup = lookup or ChargebeeLookup(self.env)
+        lookup.prefetch_products(item.get('entity_id') or item.get('id') for item in line_items)
 
         for item in line_items:
             # Get or create product
-            product = self._get_or_create_product_from_webhook(item, company)
+            product = self._get_or_create_product_from_webhook(item, company, lookup=lookup)
 
 
             if not product:
@@ -1399,7 +1545,7 @@ class AccountMove(models.Model):
 
         return prepared_lines
 
-    def _get_or_create_product_from_webhook(self, item_data, company):
+    def _get_or_create_product_from_webhook(self, item_data, company, lookup=None):
         """
         Get or create product from webhook item data.
         FIXED: Handle item_price_id to item_id conversion.
@@ -1418,9 +1564,8 @@ class AccountMove(models.Model):
             return None
 
         # Search for existing product using the entity_id
-        product = self.env['product.product'].search([
-            ('default_code', '=', entity_id),
-        ], limit=1)
+        lookup = lookup or ChargebeeLookup(self.env)
+        product = lookup.product(entity_id)
 
         if not product:
             # Create new product
@@ -1434,11 +1579,12 @@ class AccountMove(models.Model):
                 'supplier_taxes_id': [(5, 0, 0)],
             })
             product.product_tmpl_id._apply_chargebee_configured_taxes()
+            lookup.remember_product(product)
             _logger.info(f"Created product {product.name} with item_id {entity_id}")
 
         return product
 
-    def _get_or_create_partner_from_webhook(self, invoice_data, company):
+    def _get_or_create_partner_from_webhook(self, invoice_data, company, lookup=None):
         """
         Get or create partner from webhook invoice data.
         Reuses existing _get_or_create_partner logic.
@@ -1456,24 +1602,13 @@ class AccountMove(models.Model):
         if vat_number:
             _logger.info("Found VAT number '%s' in webhook invoice payload", vat_number)
 
-        # Search by Chargebee customer ID first
-        partner = False
-        if customer_id:
-            partner = self.env['res.partner'].sudo().search([
-                ('chargebee_customer_id', '=', customer_id)
-            ], limit=1)
-
         billing_address = invoice_data.get('billing_address', {})
         email = billing_address.get('email', '') if billing_address else ''
         full_name = f"{billing_address.get('first_name', '')} {billing_address.get('last_name', '')}".strip() if billing_address else ''
 
-        # Fallback to Email search
-        if not partner and email:
-            partner = self.env['res.partner'].sudo().search([('email', '=', email)], limit=1)
-
-        # Fallback to Name search
-        if not partner and full_name:
-            partner = self.env['res.partner'].sudo().search([('name', '=', full_name)], limit=1)
+        # Search by Chargebee customer ID first, then email, then name
+        lookup = lookup or ChargebeeLookup(self.env)
+        partner = lookup.partner(customer_id, email, full_name)
 
         if not partner:
             if billing_address:
@@ -1491,9 +1626,7 @@ class AccountMove(models.Model):
                         'is_company': True,
                         'vat': vat_number,
                         'state_id': False,  # Add state mapping if needed
-                        'country_id': self.env['res.country'].sudo().search([
-                            ('code', '=', billing_address.get('country', ''))
-                        ], limit=1).id,
+                        'country_id': lookup.country(code=billing_address.get('country', '')).id,
                         'company_id': company.id,
                     })
                     _logger.info(f"Created partner {partner.name} from webhook")
@@ -1516,16 +1649,18 @@ class AccountMove(models.Model):
         if vals_to_write:
             partner.write(vals_to_write)
             _logger.info("Updated partner '%s' with %s in webhook", partner.name, vals_to_write)
+        lookup.remember_partner(partner)
 
         return partner
 
-    def _get_item_family_from_chargebee(self, line_items):
+    def _get_item_family_from_chargebee(self, line_items, lookup=None):
         """
         Fetch item family from Chargebee API based on line items.
         This doesn't rely on local products existing in Odoo.
 
         Args:
             line_items (list): Line items from webhook/invoice (list of dicts)
+            lookup (ChargebeeLookup): Per-run cache, families are resolved once per entity
 
         Returns:
             chargebee.item.family or None: Odoo family record
@@ -1534,17 +1669,26 @@ class AccountMove(models.Model):
             _logger.info("No line items provided for family lookup")
             return None
 
+        lookup = lookup or ChargebeeLookup(self.env)
+        first_item = line_items[0] if isinstance(line_items, list) else line_items
+        entity_id = first_item.get('entity_id') or first_item.get('id')
+        if entity_id not in lookup.item_families:
+            lookup.item_families[entity_id] = self._fetch_item_family_from_chargebee(
+                first_item, lookup
+            )
+        return lookup.item_families[entity_id]
+
+    def _fetch_item_family_from_chargebee(self, first_item, lookup):
+        """Resolve the family of a line item through the Chargebee API."""
         # Get Chargebee config
-        chargebee_config = self.env['chargebee.configuration'].search([], limit=1)
+        chargebee_config = lookup.config()
         if not chargebee_config or not chargebee_config.api_key or not chargebee_config.site_name:
             _logger.warning("Chargebee configuration incomplete")
             return None
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
-        # Get first line item to determine family
-        first_item = line_items[0] if isinstance(line_items, list) else line_items
         entity_id = first_item.get('entity_id') or first_item.get('id')
         entity_type = first_item.get('entity_type', '')
 
@@ -1580,9 +1724,7 @@ class AccountMove(models.Model):
                 _logger.info(f"Found item_family_id '{family_id}' from Chargebee for item '{item_id}'")
 
                 # Fetch or find the family in Odoo
-                odoo_family = self.env['chargebee.item.family'].search([
-                    ('chargebee_id', '=', family_id)
-                ], limit=1)
+                odoo_family = lookup.family(family_id)
 
                 if not odoo_family:
                     # Create family if it doesn't exist
@@ -1593,6 +1735,7 @@ class AccountMove(models.Model):
                             'name': chargebee_family.name,
                             'chargebee_id': chargebee_family.id,
                         })
+                        lookup.remember_family(odoo_family)
                         _logger.info(f"Created item family '{odoo_family.name}' in Odoo")
                     except Exception as e:
                         _logger.warning(f"Could not create family {family_id}: {e}")
@@ -1607,7 +1750,7 @@ class AccountMove(models.Model):
             _logger.error(f"Error fetching item family from Chargebee: {e}", exc_info=True)
             return None
 
-    def _get_invoice_journal_from_chargebee_family(self, chargebee_config, company, line_items):
+    def _get_invoice_journal_from_chargebee_family(self, chargebee_config, company, line_items, lookup=None):
         """
         Get invoice journal based on company and family fetched from Chargebee API.
 
@@ -1615,12 +1758,17 @@ class AccountMove(models.Model):
             chargebee_config (chargebee.configuration): Chargebee config
             company (res.company): Company record
             line_items (list): Line items from webhook/invoice
+            lookup (ChargebeeLookup): Per-run cache of resolved families and journals
 
         Returns:
             account.journal: Journal record
         """
         # Fetch family from Chargebee API
-        item_family = self._get_item_family_from_chargebee(line_items)
+        lookup = lookup or ChargebeeLookup(self.env)
+        item_family = self._get_item_family_from_chargebee(line_items, lookup)
+        cache_key = ("invoice", company.id, item_family.id if item_family else False)
+        if cache_key in lookup.journals:
+            return lookup.journals[cache_key]
 
         # Find journal config matching both company and family (if family exists)
         journal_config = None
@@ -1654,9 +1802,10 @@ class AccountMove(models.Model):
         else:
             _logger.warning(f"No invoice journal found for company {company.name}")
 
+        lookup.journals[cache_key] = invoice_journal
         return invoice_journal
 
-    def _get_payment_journal_from_chargebee_family(self, chargebee_config, company, line_items):
+    def _get_payment_journal_from_chargebee_family(self, chargebee_config, company, line_items, lookup=None):
         """
         Get payment journal based on company and family fetched from Chargebee API.
 
@@ -1664,12 +1813,17 @@ class AccountMove(models.Model):
             chargebee_config (chargebee.configuration): Chargebee config
             company (res.company): Company record
             line_items (list): Line items from webhook/invoice
+            lookup (ChargebeeLookup): Per-run cache of resolved families and journals
 
         Returns:
             account.journal: Payment journal record
         """
         # Fetch family from Chargebee API
-        item_family = self._get_item_family_from_chargebee(line_items)
+        lookup = lookup or ChargebeeLookup(self.env)
+        item_family = self._get_item_family_from_chargebee(line_items, lookup)
+        cache_key = ("payment", company.id, item_family.id if item_family else False)
+        if cache_key in lookup.journals:
+            return lookup.journals[cache_key]
 
         # Find journal config matching both company and family (if family exists)
         journal_config = None
@@ -1696,9 +1850,10 @@ class AccountMove(models.Model):
         if payment_journal:
             _logger.info(f"Selected payment journal: {payment_journal.name}")
 
+        lookup.journals[cache_key] = payment_journal
         return payment_journal
 
-    def _get_credit_note_journal_from_chargebee_family(self, chargebee_config, company, line_items):
+    def _get_credit_note_journal_from_chargebee_family(self, chargebee_config, company, line_items, lookup=None):
         """
         Get credit note journal based on company and family fetched from Chargebee API.
 
@@ -1706,12 +1861,17 @@ class AccountMove(models.Model):
             chargebee_config (chargebee.configuration): Chargebee config
             company (res.company): Company record
             line_items (list): Line items from webhook/invoice
+            lookup (ChargebeeLookup): Per-run cache of resolved families and journals
 
         Returns:
             account.journal: Credit note journal record
         """
         # Fetch family from Chargebee API
-        item_family = self._get_item_family_from_chargebee(line_items)
+        lookup = lookup or ChargebeeLookup(self.env)
+        item_family = self._get_item_family_from_chargebee(line_items, lookup)
+        cache_key = ("credit_note", company.id, item_family.id if item_family else False)
+        if cache_key in lookup.journals:
+            return lookup.journals[cache_key]
 
         # Find journal config matching both company and family (if family exists)
         journal_config = None
@@ -1738,9 +1898,10 @@ class AccountMove(models.Model):
         if credit_note_journal:
             _logger.info(f"Selected credit note journal: {credit_note_journal.name}")
 
+        lookup.journals[cache_key] = credit_note_journal
         return credit_note_journal
 
-    def _process_webhook_payments(self, odoo_invoice, invoice_data, webhook_content):
+    def _process_webhook_payments(self, odoo_invoice, invoice_data, webhook_content, lookup=None):
         """
         Process payments from webhook data.
 
@@ -1767,7 +1928,7 @@ class AccountMove(models.Model):
 
             if linked_payments:
                 _logger.info(f"Processing {len(linked_payments)} payments for invoice {odoo_invoice.name}")
-                self._register_chargebee_payment(odoo_invoice, linked_payments)
+                self._register_chargebee_payment(odoo_invoice, linked_payments, lookup=lookup)
                 self.env.cr.commit()
 
         except Exception as e:
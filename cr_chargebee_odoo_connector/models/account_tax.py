@@ -4,6 +4,7 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import chargebee
+from . import chargebee_client
 import logging
 from datetime import datetime
 
@@ -17,6 +18,7 @@ class AccountTax(models.Model):
         string="Chargebee Tax ID", help="ID of the tax in Chargebee"
     )
 
+    @chargebee_client.tracked
     def sync_taxes_from_chargebee(self):
         """Sync taxes from Chargebee based on invoice line items and create or update taxes in Odoo."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -28,7 +30,7 @@ class AccountTax(models.Model):
             raise UserError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
         start_time = datetime.now()
         total_records = 0
         try:
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+"""
+Thin transport layer under the Chargebee SDK and our direct REST calls.
+
+Every Chargebee request of the connector goes through ``_send_with_retry``:
+it shares one keep-alive ``requests.Session``, limits the number of calls in
+flight per process, retries rate-limited (429) and temporarily unavailable
+responses after ``Retry-After`` or an exponential backoff with jitter, and
+counts calls, retries and latency for the sync run in progress.
+"""
+from contextlib import contextmanager
+import functools
+import logging
+import random
+import threading
+import time
+
+import chargebee
+import requests
+from chargebee import http_request
+
+_logger = logging.getLogger(__name__)
+
+# Chargebee calls in flight per worker process
+CHARGEBEE_MAX_CONCURRENT_CALLS = 4
+# Retries of a rate-limited or unavailable call before giving up
+CHARGEBEE_MAX_RETRIES = 5
+# Backoff (seconds) when Chargebee sends no Retry-After: base * 2^attempt, capped
+CHARGEBEE_BACKOFF_BASE = 1.0
+CHARGEBEE_BACKOFF_CAP = 60.0
+CHARGEBEE_RETRY_STATUSES = (429, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_call_slots = threading.BoundedSemaphore(CHARGEBEE_MAX_CONCURRENT_CALLS)
+_local = threading.local()
+
+
+class ChargebeeApiStats:
+    """Counters of the Chargebee calls made during one sync run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.latency = 0.0
+
+    def record(self, latency, retried=False, throttled=False):
+        with self._lock:
+            self.calls += 1
+            self.latency += latency
+            self.retries += int(retried)
+            self.throttled += int(throttled)
+
+    def merge(self, other):
+        with self._lock:
+            self.calls += other.calls
+            self.retries += other.retries
+            self.throttled += other.throttled
+            self.latency += other.latency
+
+    def log_vals(self):
+        """Values for the API columns of cr.data.processing.log."""
+        return {
+            "cr_api_calls": self.calls,
+            "cr_api_retries": self.retries,
+            "cr_api_throttled": self.throttled,
+            "cr_api_avg_latency": (self.latency / self.calls * 1000) if self.calls else 0.0,
+        }
+
+
+def current_stats():
+    """Stats of the run tracked by the current thread, or None."""
+    return getattr(_local, "stats", None)
+
+
+@contextmanager
+def track_api_calls(stats=None):
+    """
+    Count the Chargebee calls of the enclosed block in ``stats`` (a new one by
+    default). Pass the caller's stats to count calls made in worker threads.
+    Nested runs are added to the enclosing run when they end.
+    """
+    previous = current_stats()
+    stats = stats or ChargebeeApiStats()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+        if previous is not None and previous is not stats:
+            previous.merge(stats)
+
+
+def tracked(method):
+    """Decorator tracking the Chargebee calls of a sync method as one run."""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with track_api_calls():
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+def get_session():
+    """Process-wide keep-alive session for Chargebee hosts."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=4, pool_maxsize=CHARGEBEE_MAX_CONCURRENT_CALLS * 2
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _retry_delay(attempt, retry_after=None):
+    try:
+        delay = float(retry_after)
+    except (TypeError, ValueError):
+        delay = min(CHARGEBEE_BACKOFF_CAP, CHARGEBEE_BACKOFF_BASE * 2 ** attempt)
+    return delay + random.uniform(0, 1)
+
+
+def _send_with_retry(send, describe):
+    """
+    Run ``send()`` in a call slot, retrying while it reports a retryable status.
+
+    ``send`` returns ``(result, status, headers)``; on a status in
+    CHARGEBEE_RETRY_STATUSES the call is retried, otherwise ``result`` is
+    returned (or raised when it is an exception).
+    """
+    stats = current_stats()
+    for attempt in range(CHARGEBEE_MAX_RETRIES + 1):
+        with _call_slots:
+            started = time.monotonic()
+            result, status, headers = send()
+            latency = time.monotonic() - started
+        retry = status in CHARGEBEE_RETRY_STATUSES and attempt < CHARGEBEE_MAX_RETRIES
+        if stats:
+            stats.record(latency, retried=retry, throttled=status == 429)
+        if not retry:
+            if isinstance(result, Exception):
+                raise result
+            return result
+        delay = _retry_delay(attempt, (headers or {}).get("Retry-After"))
+        _logger.info(
+            "Chargebee %s answered %s, retrying in %.1fs (attempt %s/%s)",
+            describe,
+            status,
+            delay,
+            attempt + 1,
+            CHARGEBEE_MAX_RETRIES,
+        )
+        time.sleep(delay)
+
+
+def request(method, url, **kwargs):
+    """``requests.request`` for direct Chargebee REST calls, through the shared session."""
+    kwargs.setdefault("timeout", 30)
+
+    def send():
+        response = get_session().request(method, url, **kwargs)
+        return response, response.status_code, response.headers
+
+    return _send_with_retry(send, f"{method} {url}")
+
+
+class _SessionTransport:
+    """
+    Stands in for ``requests`` inside the SDK so its calls reuse the shared
+    session. The status and headers of the last response are kept per thread:
+    the SDK raises a plain Exception for non-JSON bodies (e.g. a gateway's HTML
+    502 page), which carries neither.
+    """
+
+    def request(self, **kwargs):
+        response = get_session().request(**kwargs)
+        _local.last_response = (response.status_code, response.headers)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+def _sdk_request(method, url, env, *args, **kwargs):
+    is_read = method.lower() == "get"
+
+    def send():
+        _local.last_response = None
+        try:
+            return _sdk_request.original(method, url, env, *args, **kwargs), 200, None
+        except chargebee.APIError as e:
+            return e, e.http_status_code, e.http_headers
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Reads are safe to repeat; writes may have reached Chargebee
+            return e, 503 if is_read else None, None
+        except Exception as e:
+            # Non-JSON answer: use the status of the response the SDK received.
+            # A gateway timeout on a write may still have been processed.
+            status, headers = _local.last_response or (None, None)
+            if status == 504 and not is_read:
+                status = None
+            return e, status, headers
+
+    return _send_with_retry(send, f"{method.upper()} {url}")
+
+
+def install():
+    """Route the SDK's HTTP calls through the shared session and retry logic (once)."""
+    if getattr(http_request.request, "_cr_wrapped", False):
+        return
+    _sdk_request.original = http_request.request
+    _sdk_request._cr_wrapped = True
+    http_request.request = _sdk_request
+    http_request.requests = _SessionTransport()
+
+
+def configure(api_key, site_name):
+    """``chargebee.configure`` with the connector's transport installed."""
+    install()
+    chargebee.configure(api_key, site_name)
+
+
+install()
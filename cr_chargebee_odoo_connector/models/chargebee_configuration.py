@@ -2,6 +2,37 @@
 # Part of Creyox Technologies.
 from odoo import models, fields, api, http, _
 import chargebee
+from . import chargebee_client
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Page size of every Chargebee list call (the API maximum)
+CHARGEBEE_PAGE_SIZE = 100
+# Seconds a resumable sync may run before handing over to the bulk sync cron
+CHARGEBEE_SYNC_TIME_BUDGET = 90
+
+# Attribute holding the record in a list result, per entity
+CHARGEBEE_RESULT_ATTRS = {
+    "invoices": "invoice",
+    "credit_notes": "credit_note",
+    "subscriptions": "subscription",
+    "items": "item",
+    "customers": "customer",
+}
+# Entities synced incrementally from their updated_at watermark
+CHARGEBEE_INCREMENTAL_ENTITIES = ("invoices", "subscriptions", "customers")
+
+# Sync method resuming each entity: (model, method)
+CHARGEBEE_SYNC_METHODS = {
+    "invoices": ("account.move", "action_sync_account_invoices"),
+    "credit_notes": ("account.move", "action_sync_credit_notes"),
+    "subscriptions": ("account.move", "sync_subscription_from_chargebee"),
+    "items": ("product.template", "sync_items_from_chargebee"),
+    "customers": ("res.partner", "sync_chargebee_customers"),
+}
 
 
 class ChargebeeConfiguration(models.Model):
@@ -63,6 +94,11 @@ class ChargebeeConfiguration(models.Model):
         inverse_name="cb_config_id",
         string="Tax Configurations",
     )
+    sync_cursor_ids = fields.One2many(
+        comodel_name="chargebee.sync.cursor",
+        inverse_name="cb_config_id",
+        string="Sync Cursors",
+    )
 
     # webhook fields
     webhook_url = fields.Char(
@@ -191,7 +227,9 @@ class ChargebeeConfiguration(models.Model):
         }
 
     def sync_chargebee_customers_(self):
-        self.env["res.partner"].sync_chargebee_customers()
+        self.env["res.partner"].with_context(
+            chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+        ).sync_chargebee_customers()
         """Open the wizard or list view depending on records."""
         return {
             "type": "ir.actions.client",
@@ -219,7 +257,9 @@ class ChargebeeConfiguration(models.Model):
         }
 
     def sync_subscription_from_chargebee_(self):
-        self.env["account.move"].sync_subscription_from_chargebee()
+        self.env["account.move"].with_context(
+            chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+        ).sync_subscription_from_chargebee()
         """Open the wizard or list view depending on records."""
         return {
             "type": "ir.actions.client",
@@ -261,7 +301,9 @@ class ChargebeeConfiguration(models.Model):
 
     def action_sync_chargebee_credit_note(self):
         """Perform the sync and close the wizard."""
-        self.env["account.move"].action_sync_credit_notes()
+        self.env["account.move"].with_context(
+            chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+        ).action_sync_credit_notes()
         return {
             "type": "ir.actions.client",
             "tag": "display_notification",
@@ -288,7 +330,9 @@ class ChargebeeConfiguration(models.Model):
         }
 
     def action_sync_chargebee_items(self):
-        self.env["product.template"].sync_items_from_chargebee()
+        self.env["product.template"].with_context(
+            chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+        ).sync_items_from_chargebee()
         return {
             "type": "ir.actions.client",
             "tag": "display_notification",
@@ -302,7 +346,9 @@ class ChargebeeConfiguration(models.Model):
 
     def action_sync_chargebee_invoice_for_account_move(self):
         """Perform the sync and close the wizard."""
-        self.env["account.move"].action_sync_account_invoices()
+        self.env["account.move"].with_context(
+            chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+        ).action_sync_account_invoices()
         return {
             "type": "ir.actions.client",
             "tag": "display_notification",
@@ -314,12 +360,186 @@ class ChargebeeConfiguration(models.Model):
             },
         }
 
+    def _get_sync_cursor(self, entity):
+        """Return the sync cursor of an entity, creating it on first use."""
+        self.ensure_one()
+        cursor = self.sync_cursor_ids.filtered(lambda c: c.entity == entity)[:1]
+        if not cursor:
+            cursor = self.env["chargebee.sync.cursor"].sudo().create(
+                {"cb_config_id": self.id, "entity": entity}
+            )
+        return cursor
+
+    def _start_sync_run(self, cursor, query, incremental=False):
+        """Reset a cursor for a new run with the given list filters."""
+        cursor.write(
+            {
+                "state": "running",
+                "next_offset": False,
+                "run_params": json.dumps(query),
+                "run_incremental": incremental,
+                "run_started_at": fields.Datetime.now(),
+                "pages_processed": 0,
+                "records_processed": 0,
+            }
+        )
+
+    def _chargebee_iter_records(
+        self,
+        entity,
+        list_method,
+        params=None,
+        updated_after=None,
+        incremental=False,
+        on_page=None,
+    ):
+        """
+        Yield every record of a Chargebee list endpoint, following next_offset.
+
+        The position is stored on the entity's sync cursor and committed once
+        the caller has processed the last record of a page, so an interrupted
+        run resumes from the first unfinished page with the same filters.
+        ``updated_after`` adds an ``updated_at[after]`` filter (Unix timestamp).
+
+        With ``incremental``, a new run only lists records updated since the
+        cursor's watermark, sorted by ``updated_at``; the watermark moves to the
+        newest ``updated_at`` of each page in the same commit as the page.
+
+        When the context key ``chargebee_sync_max_seconds`` is set, the
+        iteration stops at a page boundary once that budget is spent and the
+        bulk sync cron is triggered to carry on.
+
+        ``on_page`` is called with the list of records of each page before they
+        are yielded, so callers can prefetch what the page refers to or process
+        the page in bulk; its writes are committed together with the page.
+        """
+        self.ensure_one()
+        cursor = self._get_sync_cursor(entity)
+        max_seconds = self.env.context.get("chargebee_sync_max_seconds")
+        started = time.time()
+
+        if cursor.state == "running" and cursor.run_params:
+            query = json.loads(cursor.run_params)
+            offset = cursor.next_offset or None
+            _logger.info("Resuming Chargebee %s sync at offset %s", entity, offset)
+        else:
+            query = dict(params or {})
+            if incremental:
+                query["sort_by[asc]"] = "updated_at"
+                if cursor.updated_at_watermark and not updated_after:
+                    # "after" is strict: step back one second so records sharing
+                    # the watermark second are not lost between pages
+                    updated_after = cursor.updated_at_watermark - 1
+            if updated_after:
+                query["updated_at[after]"] = int(updated_after)
+            offset = None
+            self._start_sync_run(cursor, query, incremental)
+            self.env.cr.commit()
+
+        result_attr = CHARGEBEE_RESULT_ATTRS[entity]
+        while True:
+            page_query = dict(query, limit=CHARGEBEE_PAGE_SIZE)
+            if offset:
+                page_query["offset"] = offset
+            page = list_method(page_query)
+
+            if on_page:
+                on_page([getattr(entry, result_attr, None) for entry in page])
+
+            page_watermark = 0
+            for entry in page:
+                record = getattr(entry, result_attr, None)
+                page_watermark = max(
+                    page_watermark, getattr(record, "updated_at", None) or 0
+                )
+                yield entry
+
+            # The caller has processed the whole page: move the cursor forward
+            offset = getattr(page, "next_offset", None)
+            vals = {
+                "next_offset": offset or False,
+                "pages_processed": cursor.pages_processed + 1,
+                "records_processed": cursor.records_processed + len(page),
+                "last_page_at": fields.Datetime.now(),
+            }
+            if cursor.run_incremental and page_watermark > cursor.updated_at_watermark:
+                vals["updated_at_watermark"] = page_watermark
+            if not offset:
+                vals.update(
+                    {
+                        "state": "idle",
+                        "run_params": False,
+                        "last_completed_at": fields.Datetime.now(),
+                    }
+                )
+            cursor.write(vals)
+            self.env.cr.commit()
+            if not offset:
+                return
+
+            if max_seconds and time.time() - started > max_seconds:
+                _logger.info(
+                    "Chargebee %s sync paused after %s pages, continuing in background",
+                    entity,
+                    cursor.pages_processed,
+                )
+                self._trigger_bulk_sync()
+                return
+
+    def _trigger_bulk_sync(self):
+        cron = self.env.ref(
+            "cr_chargebee_odoo_connector.ir_cron_chargebee_bulk_sync",
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _cron_chargebee_bulk_sync(self):
+        """Resume every unfinished Chargebee sync run, one time budget per entity."""
+        cursors = self.env["chargebee.sync.cursor"].sudo().search(
+            [("state", "=", "running")]
+        )
+        for cursor in cursors:
+            model_name, method_name = CHARGEBEE_SYNC_METHODS[cursor.entity]
+            try:
+                getattr(
+                    self.env[model_name].with_context(
+                        chargebee_sync_max_seconds=CHARGEBEE_SYNC_TIME_BUDGET
+                    ),
+                    method_name,
+                )()
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.error("Bulk Chargebee %s sync failed: %s", cursor.entity, e)
+
+    def action_backfill_chargebee(self):
+        """Restart a full sync of every entity and let the cron work through it."""
+        self.ensure_one()
+        for entity in CHARGEBEE_SYNC_METHODS:
+            cursor = self._get_sync_cursor(entity)
+            incremental = entity in CHARGEBEE_INCREMENTAL_ENTITIES
+            query = {"sort_by[asc]": "updated_at"} if incremental else {}
+            cursor.updated_at_watermark = 0
+            self._start_sync_run(cursor, query, incremental)
+        self._trigger_bulk_sync()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "Chargebee Backfill",
+                "message": "Full sync scheduled, it will run in the background.",
+                "type": "success",
+                "sticky": False,
+            },
+        }
+
     def test_connection(self):
         """Test the Chargebee API connection."""
         self.ensure_one()
         try:
             # Configure Chargebee with provided API key and site URL
-            chargebee.configure(self.api_key, self.site_name)
+            chargebee_client.configure(self.api_key, self.site_name)
             # Test API by listing customers (or any simple API call)
             chargebee.Customer.list({"limit": 1})
             return {
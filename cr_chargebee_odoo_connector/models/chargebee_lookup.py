@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo.osv import expression
+
+# Partner keys tried in order when matching Chargebee data to a partner
+PARTNER_KEYS = ("chargebee_customer_id", "email", "name")
+
+
+class ChargebeeLookup:
+    """
+    Per-run memo of the Odoo records Chargebee data resolves to.
+
+    One instance lives for a sync run (or a single webhook call). The keys of a
+    whole page are loaded with the ``prefetch_*`` methods in one query each;
+    single lookups fall back to one search whose result, found or not, is kept
+    for the rest of the run. Records created during the run are registered with
+    ``remember_*`` so the following lines and invoices reuse them.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self._config = None
+        self._companies = {}
+        self._products = {}
+        self._partners = {key: {} for key in PARTNER_KEYS}
+        self._countries = {}
+        self._family_records = None
+        # Chargebee line entity id -> chargebee.item.family (possibly empty)
+        self.item_families = {}
+        # (kind, company id, family id) -> account.journal
+        self.journals = {}
+
+    def config(self):
+        if self._config is None:
+            self._config = self.env["chargebee.configuration"].search([], limit=1)
+        return self._config
+
+    # ------------------------------------------------------------------
+    # Companies
+    # ------------------------------------------------------------------
+
+    def prefetch_companies(self, business_entity_ids):
+        missing = {be_id for be_id in business_entity_ids if be_id} - set(self._companies)
+        if not missing:
+            return
+        companies = self.env["res.company"].search([("chargebee_id", "in", list(missing))])
+        for company in companies:
+            self._companies[company.chargebee_id] = company
+
+    def company(self, business_entity_id):
+        """Company of a Chargebee business entity, created on first use."""
+        if business_entity_id not in self._companies:
+            self._companies[business_entity_id] = self.env[
+                "res.company"
+            ].get_or_create_company_from_chargebee(business_entity_id)
+        return self._companies[business_entity_id]
+
+    # ------------------------------------------------------------------
+    # Products
+    # ------------------------------------------------------------------
+
+    def prefetch_products(self, codes, company=None):
+        company_id = company.id if company else False
+        missing = {
+            code for code in codes if code and (code, company_id) not in self._products
+        }
+        if not missing:
+            return
+        domain = [("default_code", "in", list(missing))]
+        if company_id:
+            domain.append(("company_id", "=", company_id))
+        Product = self.env["product.product"]
+        for product in Product.search(domain):
+            self._products.setdefault((product.default_code, company_id), product)
+        for code in missing:
+            self._products.setdefault((code, company_id), Product)
+
+    def product(self, code, company=None):
+        """First product with ``code`` as internal reference (optionally in ``company``)."""
+        key = (code, company.id if company else False)
+        if key not in self._products:
+            self.prefetch_products([code], company)
+        return self._products[key]
+
+    def remember_product(self, product, company=None):
+        self._products[(product.default_code, company.id if company else False)] = product
+
+    # ------------------------------------------------------------------
+    # Partners
+    # ------------------------------------------------------------------
+
+    def prefetch_partners(self, customer_ids=(), emails=(), names=()):
+        wanted = {}
+        for key, values in zip(PARTNER_KEYS, (customer_ids, emails, names)):
+            values = {value for value in values if value} - set(self._partners[key])
+            if values:
+                wanted[key] = values
+        if not wanted:
+            return
+        domain = expression.OR([[(key, "in", list(values))] for key, values in wanted.items()])
+        Partner = self.env["res.partner"].sudo()
+        for key, values in wanted.items():
+            for value in values:
+                self._partners[key][value] = Partner
+        for partner in Partner.search(domain):
+            for key, values in wanted.items():
+                value = partner[key]
+                if value in values:
+                    self._partners[key][value] |= partner
+
+    def partner(self, customer_id=None, email=None, name=None, company=None):
+        """
+        First partner matching the Chargebee customer id, then email, then name.
+
+        With ``company``, only partners of that company or shared ones match,
+        company-specific partners first.
+        """
+        self.prefetch_partners([customer_id], [email], [name])
+        for key, value in zip(PARTNER_KEYS, (customer_id, email, name)):
+            partners = self._partners[key].get(value) if value else None
+            if partners and company:
+                partners = partners.filtered(
+                    lambda p: p.company_id == company
+                ) or partners.filtered(lambda p: not p.company_id)
+            if partners:
+                return partners[:1]
+        return self.env["res.partner"].sudo()
+
+    def remember_partner(self, partner):
+        for key in PARTNER_KEYS:
+            value = partner[key]
+            if value:
+                matches = self._partners[key].get(value)
+                self._partners[key][value] = (
+                    matches | partner if matches is not None else partner
+                )
+
+    # ------------------------------------------------------------------
+    # Countries and families
+    # ------------------------------------------------------------------
+
+    def country(self, name=None, code=None):
+        key = ("code", code) if code else ("name", name)
+        if key not in self._countries:
+            Country = self.env["res.country"].sudo()
+            self._countries[key] = (
+                Country.search([(key[0], "=", key[1])], limit=1) if key[1] else Country
+            )
+        return self._countries[key]
+
+    def family(self, chargebee_id):
+        """Odoo item family of a Chargebee family id (all families loaded once)."""
+        if self._family_records is None:
+            self._family_records = {
+                family.chargebee_id: family
+                for family in self.env["chargebee.item.family"].search([])
+            }
+        return self._family_records.get(chargebee_id) or self.env["chargebee.item.family"]
+
+    def remember_family(self, family):
+        self.family(family.chargebee_id)
+        self._family_records[family.chargebee_id] = family
@@ -4,6 +4,7 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 import chargebee
+from . import chargebee_client
 from datetime import datetime
 import logging
 
@@ -65,7 +66,7 @@ class ChargebeeSubscription(models.Model):
             raise UserError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         # Fetch subscriptions from Chargebee
         try:
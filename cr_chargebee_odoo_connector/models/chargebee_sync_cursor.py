@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo import models, fields
+
+
+class ChargebeeSyncCursor(models.Model):
+    _name = "chargebee.sync.cursor"
+    _description = "Chargebee Sync Cursor"
+    _rec_name = "entity"
+
+    cb_config_id = fields.Many2one(
+        comodel_name="chargebee.configuration",
+        string="Chargebee Config",
+        required=True,
+        ondelete="cascade",
+    )
+    entity = fields.Selection(
+        [
+            ("invoices", "Invoices"),
+            ("credit_notes", "Credit Notes"),
+            ("subscriptions", "Subscriptions"),
+            ("items", "Items"),
+            ("customers", "Customers"),
+        ],
+        string="Entity",
+        required=True,
+    )
+    state = fields.Selection(
+        [("idle", "Idle"), ("running", "In Progress")],
+        string="State",
+        default="idle",
+        required=True,
+    )
+    next_offset = fields.Char(
+        string="Next Offset", help="Chargebee offset of the next page to fetch"
+    )
+    run_params = fields.Text(
+        string="Run Filters",
+        help="List filters of the run in progress (JSON), reused when resuming",
+    )
+    run_incremental = fields.Boolean(
+        string="Incremental Run",
+        help="The run in progress lists records sorted by updated_at and moves the watermark",
+    )
+    updated_at_watermark = fields.Integer(
+        string="Updated At Watermark",
+        help="Unix timestamp of the newest updated_at already synced. "
+        "Incremental runs only ask Chargebee for records changed after it.",
+    )
+    run_started_at = fields.Datetime(string="Run Started At")
+    pages_processed = fields.Integer(string="Pages Processed")
+    records_processed = fields.Integer(string="Records Processed")
+    last_page_at = fields.Datetime(string="Last Page At")
+    last_completed_at = fields.Datetime(string="Last Completed At")
+
+    _sql_constraints = [
+        (
+            "unique_config_entity",
+            "unique(cb_config_id, entity)",
+            "Only one sync cursor per entity is allowed.",
+        ),
+    ]
+
+    def action_reset_watermark(self):
+        """Make the next incremental run re-read every record."""
+        self.write({"updated_at_watermark": 0})
+
+    def action_reset_cursor(self):
+        """Drop the run in progress so the next sync starts from the first page."""
+        self.write(
+            {
+                "state": "idle",
+                "next_offset": False,
+                "run_params": False,
+                "pages_processed": 0,
+                "records_processed": 0,
+            }
+        )
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from datetime import datetime, timedelta
+import chargebee
+from . import chargebee_client
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Events stored by the webhook endpoint, grouped by handler
+INVOICE_EVENTS = ("invoice_generated", "payment_succeeded", "invoice_updated")
+CUSTOMER_EVENTS = ("customer_created", "customer_changed")
+ITEM_EVENTS = ("item_created", "item_updated")
+ITEM_FAMILY_EVENTS = ("item_family_created", "item_family_updated")
+HANDLED_EVENTS = INVOICE_EVENTS + CUSTOMER_EVENTS + ITEM_EVENTS + ITEM_FAMILY_EVENTS
+
+# Failed attempts before an event is moved to the dead-letter state
+WEBHOOK_MAX_ATTEMPTS = 8
+# Retry delay is 2^attempts minutes, capped at this many minutes
+WEBHOOK_MAX_BACKOFF_MINUTES = 360
+# Events left in "processing" longer than this are considered crashed
+WEBHOOK_STALE_MINUTES = 15
+# Processed events are kept this many days for auditing
+WEBHOOK_RETENTION_DAYS = 30
+
+
+class ChargebeeWebhookEvent(models.Model):
+    _name = "chargebee.webhook.event"
+    _description = "Chargebee Webhook Event"
+    _order = "occurred_at desc, id desc"
+    _rec_name = "event_id"
+
+    event_id = fields.Char(string="Event ID", required=True, readonly=True)
+    event_type = fields.Char(string="Event Type", required=True, readonly=True)
+    entity_key = fields.Char(
+        string="Entity",
+        index=True,
+        readonly=True,
+        help="Chargebee object the event is about; events of one entity are processed in order",
+    )
+    occurred_at = fields.Integer(
+        string="Occurred At (Unix)", readonly=True, help="Event time sent by Chargebee"
+    )
+    payload = fields.Text(string="Payload", readonly=True)
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("processing", "Processing"),
+            ("done", "Done"),
+            ("dead", "Failed"),
+        ],
+        string="State",
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempts = fields.Integer(string="Attempts", readonly=True)
+    next_attempt_at = fields.Datetime(string="Next Attempt", readonly=True)
+    processed_at = fields.Datetime(string="Processed At", readonly=True)
+    result_message = fields.Char(string="Result", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    _sql_constraints = [
+        (
+            "unique_event_id",
+            "unique(event_id)",
+            "This Chargebee event has already been received.",
+        ),
+    ]
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _entity_key(self, event_type, content):
+        """Key of the object an event changes, e.g. ``invoice:inv_123``."""
+        if event_type in INVOICE_EVENTS:
+            return f"invoice:{(content.get('invoice') or {}).get('id')}"
+        if event_type in CUSTOMER_EVENTS:
+            return f"customer:{(content.get('customer') or {}).get('id')}"
+        if event_type in ITEM_EVENTS:
+            return f"item:{(content.get('item') or {}).get('id')}"
+        return f"item_family:{(content.get('item_family') or {}).get('id')}"
+
+    @api.model
+    def _enqueue(self, webhook_data):
+        """
+        Store a webhook for the worker and return True if it is new.
+
+        Redeliveries of an event id already in the queue are ignored, so the
+        endpoint can acknowledge every delivery right away.
+        """
+        event_type = webhook_data.get("event_type")
+        content = webhook_data.get("content") or {}
+        event_id = webhook_data.get("id")
+        if not event_id:
+            # Should not happen with Chargebee; fall back to a deterministic key
+            event_id = f"{event_type}:{self._entity_key(event_type, content)}:{webhook_data.get('occurred_at')}"
+
+        self.env.cr.execute(
+            """
+            INSERT INTO chargebee_webhook_event
+                (event_id, event_type, entity_key, occurred_at, payload, state, attempts,
+                 create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, %s, %s, 'pending', 0,
+                    %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (event_id) DO NOTHING
+            RETURNING id
+        """,
+            (
+                event_id,
+                event_type,
+                self._entity_key(event_type, content),
+                webhook_data.get("occurred_at") or 0,
+                json.dumps(webhook_data),
+                self.env.uid,
+                self.env.uid,
+            ),
+        )
+        created = bool(self.env.cr.fetchone())
+        if created:
+            self.env.ref(
+                "cr_chargebee_odoo_connector.ir_cron_process_chargebee_webhooks"
+            ).sudo()._trigger()
+        return created
+
+    def action_retry(self):
+        """Put failed events back in the queue with a fresh retry budget."""
+        self.write(
+            {
+                "state": "pending",
+                "attempts": 0,
+                "next_attempt_at": False,
+                "last_error": False,
+            }
+        )
+        self.env.ref(
+            "cr_chargebee_odoo_connector.ir_cron_process_chargebee_webhooks"
+        ).sudo()._trigger()
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _cron_process_webhook_events(self, max_events=200):
+        """Process queued webhook events, oldest first and in order per entity."""
+        self._requeue_stale_events()
+        for _i in range(max_events):
+            event = self._acquire_next_event()
+            if not event:
+                break
+            event._run_event()
+        self.env["account.move"]._trigger_chargebee_pdf_cron()
+        self._gc_done_events()
+
+    @api.model
+    def _requeue_stale_events(self):
+        stale_before = datetime.now() - timedelta(minutes=WEBHOOK_STALE_MINUTES)
+        stale = self.search(
+            [("state", "=", "processing"), ("write_date", "<", stale_before)]
+        )
+        if stale:
+            _logger.warning("Requeuing %s stale Chargebee webhook events", len(stale))
+            stale.write({"state": "pending"})
+            self.env.cr.commit()
+
+    @api.model
+    def _acquire_next_event(self):
+        """
+        Lock and mark the next runnable event as processing.
+
+        An event is runnable when no older event of the same entity is still
+        waiting (including one backing off after a failure), which keeps e.g.
+        invoice_generated ahead of payment_succeeded for the same invoice.
+        """
+        self.env.cr.execute(
+            """
+            SELECT e.id FROM chargebee_webhook_event e
+            WHERE e.state = 'pending'
+              AND (e.next_attempt_at IS NULL OR e.next_attempt_at <= now() at time zone 'UTC')
+              AND NOT EXISTS (
+                  SELECT 1 FROM chargebee_webhook_event p
+                  WHERE p.entity_key = e.entity_key
+                    AND p.state IN ('pending', 'processing')
+                    AND (p.occurred_at, p.id) < (e.occurred_at, e.id)
+              )
+            ORDER BY e.occurred_at, e.id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        event = self.browse(row[0])
+        event.write({"state": "processing", "attempts": event.attempts + 1})
+        self.env.cr.commit()
+        return event
+
+    def _run_event(self):
+        self.ensure_one()
+        try:
+            message = self._dispatch_event()
+        except Exception as e:
+            _logger.error(
+                "Chargebee webhook %s (%s) failed: %s",
+                self.event_id,
+                self.event_type,
+                e,
+                exc_info=True,
+            )
+            self.env.cr.rollback()
+            dead = self.attempts >= WEBHOOK_MAX_ATTEMPTS
+            backoff = min(2 ** self.attempts, WEBHOOK_MAX_BACKOFF_MINUTES)
+            self.write(
+                {
+                    "state": "dead" if dead else "pending",
+                    "next_attempt_at": (
+                        False if dead else datetime.now() + timedelta(minutes=backoff)
+                    ),
+                    "last_error": str(e),
+                }
+            )
+        else:
+            self.write(
+                {
+                    "state": "done",
+                    "processed_at": datetime.now(),
+                    "result_message": message,
+                    "next_attempt_at": False,
+                }
+            )
+        self.env.cr.commit()
+
+    @api.model
+    def _gc_done_events(self):
+        limit = datetime.now() - timedelta(days=WEBHOOK_RETENTION_DAYS)
+        self.search([("state", "=", "done"), ("processed_at", "<", limit)]).unlink()
+        self.env.cr.commit()
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    def _dispatch_event(self):
+        """Apply the event to Odoo; raise to retry, return a short result message."""
+        self.ensure_one()
+        webhook_data = json.loads(self.payload)
+        content = webhook_data.get("content") or {}
+        if self.event_type in INVOICE_EVENTS:
+            return self._process_invoice_event(self.event_type, content)
+        if self.event_type in CUSTOMER_EVENTS:
+            return self._process_customer_event(content)
+        if self.event_type in ITEM_EVENTS:
+            return self._process_item_event(content)
+        if self.event_type in ITEM_FAMILY_EVENTS:
+            return self._process_item_family_event(content)
+        return _("Event type not handled")
+
+    def _process_invoice_event(self, event_type, content):
+        """Create, update or pay a subscription installment invoice."""
+        invoice_data = content.get("invoice")
+        if not invoice_data:
+            raise UserError(_("No invoice data in %s") % event_type)
+
+        invoice_id = invoice_data.get("id")
+        # Only process subscription invoices (installment invoices)
+        if not invoice_data.get("subscription_id"):
+            return _("Invoice %s is not a subscription invoice, skipped") % invoice_id
+
+        AccountMove = self.env["account.move"].sudo()
+        if event_type == "payment_succeeded":
+            # Events of an invoice run in order, so invoice_generated is done by now
+            odoo_invoice = AccountMove.search([("chargebee_id", "=", invoice_id)], limit=1)
+            if not odoo_invoice:
+                _logger.warning(f"Invoice {invoice_id} not found in Odoo, creating it first")
+                odoo_invoice = AccountMove.sync_invoice_from_webhook_data(invoice_data, content)
+            if not odoo_invoice:
+                raise UserError(_("Invoice %s not found") % invoice_id)
+
+            transaction_data = content.get("transaction")
+            if not transaction_data:
+                _logger.warning("No transaction data in payment_succeeded webhook")
+                return _("No transaction data")
+            AccountMove._register_chargebee_payment(odoo_invoice, [transaction_data])
+            _logger.info(f"Payment registered for invoice {odoo_invoice.name}")
+            return _("Payment registered for %s") % odoo_invoice.name
+
+        # invoice_generated / invoice_updated: create or update the invoice
+        odoo_invoice = AccountMove.sync_invoice_from_webhook_data(invoice_data, content)
+        if not odoo_invoice:
+            raise UserError(_("Failed to create invoice %s") % invoice_id)
+        _logger.info(f"Successfully created/updated invoice {odoo_invoice.name} from webhook")
+        return _("Invoice %s processed") % odoo_invoice.name
+
+    def _process_customer_event(self, content):
+        """Create or update the res.partner of a Chargebee customer."""
+        customer_data = content.get("customer")
+        if not customer_data:
+            raise UserError(_("No customer data in webhook payload"))
+
+        customer_id = customer_data.get("id")
+        first_name = customer_data.get("first_name", "")
+        last_name = customer_data.get("last_name", "")
+        email = customer_data.get("email")
+        business_entity_id = customer_data.get("business_entity_id")
+        vat = customer_data.get("vat_number") or customer_data.get(
+            "billing_address", {}
+        ).get("vat_number")
+
+        customer_company = (
+            self.env["res.company"]
+            .sudo()
+            .get_or_create_company_from_chargebee(business_entity_id)
+        )
+
+        ResPartner = self.env["res.partner"].sudo()
+        existing_partner = ResPartner.search(
+            [
+                ("chargebee_customer_id", "=", customer_id),
+                ("company_id", "in", [customer_company.id, False]),
+            ],
+            order="company_id desc",
+            limit=1,
+        )
+        if not existing_partner and email:
+            existing_partner = ResPartner.search(
+                [("email", "=", email), ("company_id", "in", [customer_company.id, False])],
+                order="company_id desc",
+                limit=1,
+            )
+
+        partner_name = f"{first_name} {last_name}".strip() or email or customer_id
+        partner_vals = {
+            "name": partner_name,
+            "email": email,
+            "phone": customer_data.get("phone"),
+            "company_name": customer_data.get("company"),
+            "chargebee_customer_id": customer_id,
+            "company_id": customer_company.id,
+            "is_company": True,
+            "vat": vat,
+        }
+
+        if existing_partner:
+            existing_partner.write(partner_vals)
+            _logger.info("Successfully updated Customer %s from webhook", partner_name)
+            return _("Customer %s updated") % partner_name
+        ResPartner.create(partner_vals)
+        _logger.info("Successfully created Customer %s from webhook", partner_name)
+        return _("Customer %s created") % partner_name
+
+    def _process_item_event(self, content):
+        """Create or update the product.template of a Chargebee item."""
+        item_data = content.get("item")
+        if not item_data:
+            raise UserError(_("No item data in webhook payload"))
+
+        item_id = item_data.get("id")
+        item_name = item_data.get("external_name") or item_data.get("name")
+        item_family_id = item_data.get("item_family_id")
+        item_description = item_data.get("description", "")
+
+        # Fetch config for API client
+        config = self.env["chargebee.configuration"].sudo().search([], limit=1)
+        price = 0.0
+        currency = "USD"
+        item_price_id = item_id
+        if config and config.api_key and config.site_name:
+            chargebee_client.configure(config.api_key, config.site_name)
+            try:
+                item_prices = chargebee.ItemPrice.list({"item_id[is]": item_id, "limit": 1})
+                if item_prices:
+                    item_price_data = item_prices[0].item_price
+                    price = item_price_data.price / 100 if item_price_data.price else 0.0
+                    currency = item_price_data.currency_code or "USD"
+                    item_price_id = item_price_data.id
+            except Exception as e:
+                _logger.info("Could not fetch item price for item %s: %s", item_id, str(e))
+
+        # Find associated family
+        family = (
+            self.env["chargebee.item.family"]
+            .sudo()
+            .search([("chargebee_id", "=", item_family_id)], limit=1)
+        )
+
+        # Get or create category
+        ProductCategory = self.env["product.category"].sudo()
+        category = (
+            ProductCategory.search([("id", "=", family.id)], limit=1) if family else False
+        )
+        if not category:
+            category = ProductCategory.create(
+                {"name": family.name if family else "Default Category"}
+            )
+
+        ProductTemplate = self.env["product.template"].sudo()
+        existing_product = ProductTemplate.search(
+            [("default_code", "=", item_price_id)], limit=1
+        )
+
+        vals = {
+            "name": item_name,
+            "list_price": price,
+            "default_code": item_price_id,
+            "description_sale": item_description or "",
+            "description": item_description or "",
+            "categ_id": category.id,
+            "currency_id": self.env["res.currency"]
+            .sudo()
+            .search([("name", "=", currency)], limit=1)
+            .id,
+            "company_id": False,
+            "chargebee_id": item_price_id,
+            "chargebee_created": True,
+            "item_family_id": family.id if family else False,
+            "taxes_id": [(5, 0, 0)],
+            "supplier_taxes_id": [(5, 0, 0)],
+        }
+
+        if existing_product:
+            existing_product.write(vals)
+            product = existing_product
+            _logger.info("Successfully updated Product %s from webhook", item_name)
+        else:
+            vals["type"] = "consu"
+            vals["detailed_type"] = "consu"
+            product = ProductTemplate.create(vals)
+            product.write({"taxes_id": [(5, 0, 0)], "supplier_taxes_id": [(5, 0, 0)]})
+            _logger.info("Successfully created Product %s from webhook", item_name)
+
+        # Apply company-wise configured taxes
+        product._apply_chargebee_configured_taxes()
+        return _("Product %s synced") % item_name
+
+    def _process_item_family_event(self, content):
+        """Create or update a chargebee.item.family."""
+        family_data = content.get("item_family")
+        if not family_data:
+            raise UserError(_("No item_family data in webhook payload"))
+
+        family_id = family_data.get("id")
+        family_name = family_data.get("name")
+        ChargebeeItemFamily = self.env["chargebee.item.family"].sudo()
+        existing_family = ChargebeeItemFamily.search(
+            [("chargebee_id", "=", family_id)], limit=1
+        )
+
+        vals = {"name": family_name, "chargebee_id": family_id}
+        if existing_family:
+            existing_family.write(vals)
+            _logger.info("Successfully updated Item Family %s from webhook", family_name)
+        else:
+            ChargebeeItemFamily.create(vals)
+            _logger.info("Successfully created Item Family %s from webhook", family_name)
+        return _("Item family %s synced") % family_name
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
 from odoo import models, fields
+from . import chargebee_client
 
 
 class DataProcessingLog(models.Model):
@@ -35,6 +36,12 @@ class DataProcessingLog(models.Model):
         required=True,
         help="Identifies the context or page the log is related to.",
     )
+    cr_api_calls = fields.Integer("API Calls")
+    cr_api_retries = fields.Integer("API Retries")
+    cr_api_throttled = fields.Integer(
+        "Rate Limited Calls", help="Calls Chargebee answered with 429 (too many requests)"
+    )
+    cr_api_avg_latency = fields.Float("Avg API Latency (ms)", digits=(16, 1))
 
     def _log_data_processing(
         self,
@@ -47,9 +54,14 @@ class DataProcessingLog(models.Model):
         context,
         error_message="",
     ):
-        """Logs data processing operations into the DataProcessingLog model."""
+        """
+        Logs data processing operations into the DataProcessingLog model,
+        with the Chargebee API counters of the run in progress.
+        """
+        stats = chargebee_client.current_stats()
         self.env["cr.data.processing.log"].sudo().create(
             {
+                **(stats.log_vals() if stats else {}),
                 "cr_table_name": table_name,
                 "cr_record_count": record_count,
                 "cr_status": status,
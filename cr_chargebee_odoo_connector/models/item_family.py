@@ -3,6 +3,7 @@
 
 from odoo import models, fields, api, _
 import chargebee
+from . import chargebee_client
 from datetime import datetime
 import logging
 
@@ -24,6 +25,7 @@ class ChargebeeItemFamily(models.Model):
         comodel_name="journal.configuration",
     )
 
+    @chargebee_client.tracked
     def sync_item_families(self):
         """Fetch item families from Chargebee and store in Odoo."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -35,7 +37,7 @@ class ChargebeeItemFamily(models.Model):
             raise ValueError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         # Fetch item families from Chargebee
         families = chargebee.ItemFamily.list()
@@ -3,6 +3,7 @@
 
 from odoo import models, fields, api, _
 import chargebee
+from . import chargebee_client
 from odoo.exceptions import UserError
 import logging
 from datetime import datetime
@@ -20,6 +21,7 @@ class ProductTemplate(models.Model):
     chargebee_created = fields.Boolean(string="Created in Chargebee", default=False)
     item_family_id = fields.Many2one("chargebee.item.family", string="Item Family")
 
+    @chargebee_client.tracked
     def sync_items_from_chargebee(self):
         """Sync items from Chargebee and create corresponding product records in Odoo."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -31,99 +33,20 @@ class ProductTemplate(models.Model):
             raise ValueError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
         start_time = datetime.now()
         total_records = 0
         try:
-            # Fetch items from Chargebee
-            items = chargebee.Item.list({"limit": 100})  # Adjust limit as needed
-            for item_data in items:
-                item = item_data.item
-
-                # Fetch item prices for the item
-                item_prices = chargebee.ItemPrice.list(
-                    {"item_id[is]": item.id, "limit": 1}
-                )
-                price = None
-                currency = "USD"
-                if item_prices:
-                    item_price_data = item_prices[0].item_price
-                    price = (
-                        item_price_data.price / 100 if item_price_data.price else 0.0
-                    )
-                    currency = item_price_data.currency_code or "USD"
-
-                # Find the associated family in Odoo
-                family = self.env["chargebee.item.family"].search(
-                    [("chargebee_id", "=", item.item_family_id)], limit=1
-                )
-
-                # Get or create a valid product category
-                category = self.env["product.category"].search(
-                    [("id", "=", family.id)], limit=1
-                )
-                if not category:
-                    category = self.env["product.category"].create(
-                        {
-                            "name": family.name if family else "Default Category",
-                        }
-                    )
-
-                # Check if the product already exists in Odoo's base model `product.template`
-                item_price_id = item_price_data.id if item_prices else item.id
-                existing_product = self.env["product.template"].search(
-                    [("default_code", "=", item_price_id)], limit=1
-                )
-
-                if existing_product:
-                    # Update the existing product in base model
-                    existing_product.write(
-                        {
-                            "name": getattr(item, 'external_name', None) or item.name,
-                            "list_price": price if price else 0.0,
-                            "default_code": item_price_id,
-                            "description_sale": item.description or "",
-                            "description": item.description or "",
-                            "categ_id": category.id,
-                            "currency_id": self.env["res.currency"]
-                            .search([("name", "=", currency)], limit=1)
-                            .id,
-                            "company_id": False,  # item available to all company
-                            "chargebee_id": item_price_id,
-                            "chargebee_created": True,
-                            "item_family_id": family.id if family else False,
-                            "taxes_id": [(5, 0, 0)],
-                            "supplier_taxes_id": [(5, 0, 0)],
-                        }
-                    )
-                    product = existing_product
-                else:
-                    # Create a new product record in base model
-                    product = self.env["product.template"].create(
-                        {
-                            "name": getattr(item, 'external_name', None) or item.name,
-                            "list_price": price if price else 0.0,
-                            "default_code": item_price_id,
-                            "description_sale": item.description or "",
-                            "description": item.description or "",
-                            "categ_id": category.id,
-                            "currency_id": self.env["res.currency"]
-                            .search([("name", "=", currency)], limit=1)
-                            .id,
-                            "company_id": False,  # item available to all company
-                            "type": "consu",  # Set product type, can be 'consu' or 'service' based on your requirement
-                            "chargebee_id": item_price_id,
-                            "detailed_type": "consu",
-                            "chargebee_created": True,
-                            "item_family_id": family.id if family else False,
-                            "taxes_id": [(5, 0, 0)],
-                            "supplier_taxes_id": [(5, 0, 0)],
-                        }
-                    )
-
-                # Apply company-wise configured taxes
-                product._apply_chargebee_configured_taxes()
-
+            # Fetch items from Chargebee; each page is upserted in bulk
+            run_cache = {"currencies": {}, "families": None, "categories": {}}
+            items = chargebee_config._chargebee_iter_records(
+                "items",
+                chargebee.Item.list,
+                on_page=lambda page_items: self._upsert_chargebee_items(
+                    page_items, run_cache
+                ),
+            )
+            for _item_data in items:
                 total_records += 1
                 # Log successful data processing
             self.env["cr.data.processing.log"].sudo()._log_data_processing(
@@ -151,6 +74,122 @@ class ProductTemplate(models.Model):
             )
             raise ValueError(_("Error syncing items from Chargebee: %s") % str(e))
 
+    @api.model
+    def _fetch_chargebee_item_prices(self, item_ids):
+        """Return {item id: [item_price, ...]} for all price points of ``item_ids``."""
+        prices = {}
+        offset = None
+        while True:
+            params = {"item_id[in]": list(item_ids), "limit": 100}
+            if offset:
+                params["offset"] = offset
+            result = chargebee.ItemPrice.list(params)
+            for entry in result:
+                item_price = entry.item_price
+                prices.setdefault(item_price.item_id, []).append(item_price)
+            offset = getattr(result, "next_offset", None)
+            if not offset:
+                return prices
+
+    @api.model
+    def _upsert_chargebee_items(self, items, run_cache):
+        """
+        Create or update the products of a page of Chargebee items.
+
+        Prices of the whole page come from paginated ItemPrice.list calls and
+        every price point becomes a product (default code = item price id);
+        items without price keep their item id. Families, categories and
+        currencies are resolved from ``run_cache``, shared by the whole run.
+        """
+        items = [item for item in items if item]
+        if not items:
+            return
+        prices_by_item = self._fetch_chargebee_item_prices([item.id for item in items])
+
+        if run_cache["families"] is None:
+            run_cache["families"] = {
+                family.chargebee_id: family
+                for family in self.env["chargebee.item.family"].search([])
+            }
+
+        vals_by_code = {}
+        for item in items:
+            family = run_cache["families"].get(item.item_family_id) or self.env[
+                "chargebee.item.family"
+            ]
+            category = self._get_chargebee_item_category(family, run_cache)
+            base_vals = {
+                "name": getattr(item, "external_name", None) or item.name,
+                "description_sale": item.description or "",
+                "description": item.description or "",
+                "categ_id": category.id,
+                "company_id": False,  # item available to all company
+                "chargebee_created": True,
+                "item_family_id": family.id if family else False,
+                "taxes_id": [(5, 0, 0)],
+                "supplier_taxes_id": [(5, 0, 0)],
+            }
+            for item_price in prices_by_item.get(item.id) or [None]:
+                code = item_price.id if item_price else item.id
+                currency = (item_price.currency_code if item_price else None) or "USD"
+                vals_by_code[code] = dict(
+                    base_vals,
+                    list_price=(
+                        item_price.price / 100 if item_price and item_price.price else 0.0
+                    ),
+                    default_code=code,
+                    chargebee_id=code,
+                    currency_id=self._get_chargebee_currency(currency, run_cache).id,
+                )
+
+        existing = {}
+        for product in self.env["product.template"].search(
+            [("default_code", "in", list(vals_by_code))]
+        ):
+            existing.setdefault(product.default_code, product)
+
+        products = self.env["product.template"]
+        to_create = []
+        for code, vals in vals_by_code.items():
+            product = existing.get(code)
+            if product:
+                product.write(vals)
+                products |= product
+            else:
+                # Set product type, can be 'consu' or 'service' based on your requirement
+                to_create.append(dict(vals, type="consu", detailed_type="consu"))
+        if to_create:
+            products |= self.env["product.template"].create(to_create)
+
+        # Apply company-wise configured taxes
+        products._apply_chargebee_configured_taxes()
+
+    @api.model
+    def _get_chargebee_item_category(self, family, run_cache):
+        """Product category of an item family, created at most once per run."""
+        categories = run_cache["categories"]
+        if family.id not in categories:
+            category = self.env["product.category"].search(
+                [("id", "=", family.id)], limit=1
+            )
+            if not category:
+                category = self.env["product.category"].create(
+                    {
+                        "name": family.name if family else "Default Category",
+                    }
+                )
+            categories[family.id] = category
+        return categories[family.id]
+
+    @api.model
+    def _get_chargebee_currency(self, code, run_cache):
+        currencies = run_cache["currencies"]
+        if code not in currencies:
+            currencies[code] = self.env["res.currency"].search(
+                [("name", "=", code)], limit=1
+            )
+        return currencies[code]
+
     def create_item_in_chargebee(self):
         """Create an item in Chargebee under the selected family."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -162,7 +201,7 @@ class ProductTemplate(models.Model):
             raise ValueError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
         start_time = datetime.now()
         total_records = 0
         # Check and create item family in Chargebee if not set
@@ -3,8 +3,8 @@
 
 from odoo import models, fields, _
 from odoo.exceptions import UserError
-import requests
 from requests.auth import HTTPBasicAuth
+from . import chargebee_client
 
 
 class ResCompany(models.Model):
@@ -36,7 +36,7 @@ class ResCompany(models.Model):
             if existing:
                 return existing
             url = f"https://{site}.chargebee.com/api/v2/business_entities/{cb_be_id}"
-            response = requests.get(url, auth=HTTPBasicAuth(api_key, ""))
+            response = chargebee_client.request("GET", url, auth=HTTPBasicAuth(api_key, ""))
             if response.status_code != 200:
                 raise UserError(
                     _(f"Failed to retrieve Business Entity {cb_be_id}: {response.text}")
@@ -47,7 +47,9 @@ class ResCompany(models.Model):
         # if no be id provided sync all companies
         url = f"https://{site}.chargebee.com/api/v2/business_entities"
         params = {"limit": 100}
-        response = requests.get(url, params=params, auth=HTTPBasicAuth(api_key, ""))
+        response = chargebee_client.request(
+            "GET", url, params=params, auth=HTTPBasicAuth(api_key, "")
+        )
         if response.status_code != 200:
             raise UserError(_(f"Failed to retrieve Business Entities: {response.text}"))
         companies = []
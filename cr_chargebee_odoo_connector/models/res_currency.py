@@ -3,6 +3,7 @@
 
 from odoo import models, api, _
 import chargebee
+from . import chargebee_client
 from odoo.exceptions import UserError
 import logging
 from datetime import datetime
@@ -13,6 +14,7 @@ _logger = logging.getLogger(__name__)
 class ResCurrency(models.Model):
     _inherit = "res.currency"
 
+    @chargebee_client.tracked
     def sync_chargebee_currencies(self):
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         """
@@ -32,7 +34,7 @@ class ResCurrency(models.Model):
             )
         try:
             # Configure Chargebee
-            chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+            chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
             # Fetch currencies from Chargebee
             currencies_response = chargebee.Currency.list({"limit": 100})
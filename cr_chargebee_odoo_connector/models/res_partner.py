@@ -3,7 +3,9 @@
 from odoo import models, fields, api, _
 import logging
 import chargebee
+from . import chargebee_client
 from datetime import datetime
+from .chargebee_lookup import ChargebeeLookup
 
 _logger = logging.getLogger(__name__)
 
@@ -30,7 +32,7 @@ class ResPartner(models.Model):
             raise ValueError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         successful_exports = []
         failed_exports = []
@@ -103,6 +105,18 @@ class ResPartner(models.Model):
             },
         }
 
+    def _prefetch_chargebee_customers(self, lookup, customers):
+        """Load the companies and partners a page of Chargebee customers matches."""
+        customers = [customer for customer in customers if customer]
+        lookup.prefetch_companies(
+            getattr(customer, "business_entity_id", None) for customer in customers
+        )
+        lookup.prefetch_partners(
+            customer_ids=[customer.id for customer in customers],
+            emails=[getattr(customer, "email", None) for customer in customers],
+        )
+
+    @chargebee_client.tracked
     def sync_chargebee_customers(self):
         """Synchronize customers from Chargebee to Odoo."""
         chargebee_config = self.env["chargebee.configuration"].search([], limit=1)
@@ -114,22 +128,24 @@ class ResPartner(models.Model):
             raise ValueError(_("Chargebee configuration is incomplete."))
 
         # Configure Chargebee
-        chargebee.configure(chargebee_config.api_key, chargebee_config.site_name)
+        chargebee_client.configure(chargebee_config.api_key, chargebee_config.site_name)
 
         # Initialize counters and error messages
         total_synced = 0
         errors = []
         new_customers = []  # Track newly created customers
         start_time = datetime.now()
+        lookup = ChargebeeLookup(self.env)
         # Fetch customers from Chargebee
-        customers = chargebee.Customer.list({"limit": 100})  # Adjust limit as needed
+        customers = chargebee_config._chargebee_iter_records(
+            "customers",
+            chargebee.Customer.list,
+            incremental=True,
+            on_page=lambda records: self._prefetch_chargebee_customers(lookup, records),
+        )
         for customer_data in customers:
             chargebee_customer = customer_data.customer
-            customer_company = self.env[
-                "res.company"
-            ].get_or_create_company_from_chargebee(
-                chargebee_customer.business_entity_id
-            )
+            customer_company = lookup.company(chargebee_customer.business_entity_id)
             try:
                 vat_number = getattr(chargebee_customer.billing_address, 'vat_number', False) if getattr(chargebee_customer, 'billing_address', None) else False
                 if not vat_number:
@@ -147,19 +163,17 @@ class ResPartner(models.Model):
                 }
 
                 # Update existing or create new
-                existing_partner = self.env["res.partner"].sudo().search(
-                    [("chargebee_customer_id", "=", chargebee_customer.id), ("company_id", "in", [customer_company.id, False])],
-                    order="company_id desc", limit=1
+                existing_partner = lookup.partner(
+                    chargebee_customer.id,
+                    chargebee_customer.email,
+                    company=customer_company,
                 )
-                if not existing_partner and chargebee_customer.email:
-                    existing_partner = self.env["res.partner"].sudo().search(
-                        [("email", "=", chargebee_customer.email), ("company_id", "in", [customer_company.id, False])],
-                        order="company_id desc", limit=1
-                    )
                 if existing_partner:
                     existing_partner.write(partner_vals)
+                    lookup.remember_partner(existing_partner)
                 else:
                     new_partner = self.env["res.partner"].sudo().create(partner_vals)
+                    lookup.remember_partner(new_partner)
                     new_customers.append(
                         new_partner.name
                     )  # Add the newly created partner's name
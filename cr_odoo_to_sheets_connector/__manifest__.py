@@ -87,6 +87,7 @@
     "depends": ["base", "web", "mail"],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "views/sheet_configuration.xml",
         "views/logs.xml",
     ],
@@ -1,7 +1,20 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
 
-from odoo import models, fields
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from psycopg2 import sql
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+JOB_EXPORT_CHUNK_SIZE = 5000
+JOB_IMPORT_CHUNK_SIZE = 500
+JOB_STALE_MINUTES = 15
+# Result chunks of finished jobs are kept this long for the Apps Script to fetch
+JOB_CHUNK_RETENTION_DAYS = 7
 
 
 class DataProcessingLog(models.Model):
@@ -27,6 +40,7 @@ class DataProcessingLog(models.Model):
     partial_count = fields.Integer("Partially Updated Records", default=0)
     status = fields.Selection(
         [
+            ("pending", "Pending"),
             ("success", "Success"),
             ("partial", "Partial Success"),
             ("failure", "Failure"),
@@ -41,3 +55,319 @@ class DataProcessingLog(models.Model):
     timestamp = fields.Char("Duration")
     initiated_at = fields.Datetime("Started At")
     completed_at = fields.Datetime("Completed At")
+
+    # Background job tracking (only set for asynchronous transfers)
+    config_id = fields.Many2one(
+        "cr.google.sheet.connector.config", string="Configuration", ondelete="cascade"
+    )
+    job_state = fields.Selection(
+        [
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        string="Job State",
+        index=True,
+    )
+    job_params = fields.Text("Job Parameters (JSON)")
+    job_progress = fields.Integer("Processed Records", default=0)
+    job_chunk_count = fields.Integer("Result Chunks", default=0)
+
+    # ------------------------------------------------------------------
+    # Job API
+    # ------------------------------------------------------------------
+
+    @api.model
+    def create_job(self, config, operation_type, table, params, rows=None):
+        """Queue a background transfer and wake up the job worker."""
+        job = self.sudo().create(
+            {
+                "table_name": table,
+                "operation_type": operation_type,
+                # the first row holds the column headers
+                "record_count": max(len(rows) - 1, 0) if rows is not None else 0,
+                "status": "pending",
+                "config_id": config.id,
+                "job_state": "queued",
+                "job_params": json.dumps(params),
+                "initiated_at": datetime.now(),
+            }
+        )
+        if rows is not None:
+            self.env["ir.attachment"].sudo().create(
+                {
+                    "name": "input.json",
+                    "res_model": self._name,
+                    "res_id": job.id,
+                    "raw": json.dumps(rows).encode("utf-8"),
+                    "mimetype": "application/json",
+                }
+            )
+        self.env.ref(
+            "cr_odoo_to_sheets_connector.ir_cron_process_sheet_jobs"
+        ).sudo()._trigger()
+        return job
+
+    def get_job_status(self):
+        """Return the job state as sent to the Apps Script."""
+        self.ensure_one()
+        return {
+            "job_id": self.id,
+            "state": self.job_state,
+            "status": self.status,
+            "operation": self.operation_type,
+            "table": self.table_name,
+            "total": self.record_count,
+            "processed": self.job_progress,
+            "chunk_count": self.job_chunk_count,
+            "success_count": self.success_count,
+            "partial_count": self.partial_count,
+            "failed_count": self.failed_count,
+            "message": self.message or "",
+            "error": self.error_message or "",
+        }
+
+    def get_job_chunk(self, chunk_index):
+        """Return the decoded rows of result chunk ``chunk_index`` or None."""
+        self.ensure_one()
+        attachment = self.env["ir.attachment"].sudo().search(
+            [
+                ("res_model", "=", self._name),
+                ("res_id", "=", self.id),
+                ("name", "=", self._job_chunk_name(chunk_index)),
+            ],
+            limit=1,
+        )
+        if not attachment:
+            return None
+        return json.loads(attachment.raw.decode("utf-8"))
+
+    @api.model
+    def _job_chunk_name(self, chunk_index):
+        return f"chunk_{chunk_index}.json"
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _cron_process_sheet_jobs(self, max_jobs=5):
+        """Process queued (and stale running) transfer jobs, oldest first."""
+        for _i in range(max_jobs):
+            job = self._acquire_next_job()
+            if not job:
+                break
+            try:
+                job._run_job()
+            except Exception as e:
+                _logger.exception(f"Sheet job {job.id} failed")
+                self.env.cr.rollback()
+                job.write(
+                    {
+                        "job_state": "failed",
+                        "status": "failure",
+                        "error_message": str(e),
+                        "completed_at": datetime.now(),
+                    }
+                )
+                self.env.cr.commit()
+        self._gc_job_chunks()
+
+    @api.model
+    def _gc_job_chunks(self):
+        """Delete the result chunks of jobs finished more than the retention ago."""
+        finished_before = datetime.now() - timedelta(days=JOB_CHUNK_RETENTION_DAYS)
+        jobs = self.sudo().search(
+            [
+                ("job_state", "in", ["done", "failed"]),
+                ("completed_at", "<", finished_before),
+                ("job_chunk_count", ">", 0),
+            ]
+        )
+        if not jobs:
+            return
+        self.env["ir.attachment"].sudo().search(
+            [
+                ("res_model", "=", self._name),
+                ("res_id", "in", jobs.ids),
+                ("name", "=like", "chunk\\_%.json"),
+            ]
+        ).unlink()
+        jobs.write({"job_chunk_count": 0})
+        self.env.cr.commit()
+
+    @api.model
+    def _acquire_next_job(self):
+        """Lock and mark the next runnable job as running, skipping locked rows."""
+        stale_before = datetime.now() - timedelta(minutes=JOB_STALE_MINUTES)
+        self.env.cr.execute(
+            """
+            SELECT id FROM cr_data_processing_log
+            WHERE job_state = 'queued'
+               OR (job_state = 'running' AND write_date < %s)
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """,
+            (stale_before,),
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        job = self.browse(row[0])
+        job.write({"job_state": "running"})
+        self.env.cr.commit()
+        return job
+
+    def _run_job(self):
+        self.ensure_one()
+        from .sheet_controller import OdooDataController
+
+        controller = OdooDataController()
+        started = time.time()
+        if self.operation_type == "odoo_to_sheet":
+            self._run_export_job(controller)
+        else:
+            self._run_import_job(controller)
+
+        duration = time.time() - started
+        self.write(
+            {
+                "job_state": "done",
+                "timestamp": f"{duration:.2f}s",
+                "completed_at": datetime.now(),
+            }
+        )
+        self.env.cr.commit()
+
+    def _run_export_job(self, controller):
+        """Export the table chunk by chunk, storing each chunk as an attachment."""
+        params = json.loads(self.job_params or "{}")
+        table = self.table_name
+        target_fields = params.get("fields") or []
+        lang = params.get("lang") or "en_US"
+        company_id = self.config_id.company_id.id
+        if target_fields and "id" not in target_fields:
+            target_fields = ["id"] + target_fields
+
+        if not self.job_chunk_count:
+            self.record_count = self._count_table_rows(table, company_id)
+            controller._clear_display_name_cache(self.env.cr.dbname, company_id, lang)
+            self.env.cr.commit()
+
+        # Resume after the last stored chunk
+        offset = self.job_progress
+        while True:
+            result = controller._fetch_optimized_data(
+                table,
+                target_fields,
+                JOB_EXPORT_CHUNK_SIZE,
+                offset,
+                self.initiated_at,
+                company_id,
+                lang=lang,
+                env=self.env,
+            )
+            if isinstance(result, dict) and "error" in result:
+                raise ValueError(result["error"])
+            if not result:
+                break
+
+            self.env["ir.attachment"].sudo().create(
+                {
+                    "name": self._job_chunk_name(self.job_chunk_count),
+                    "res_model": self._name,
+                    "res_id": self.id,
+                    "raw": json.dumps(result).encode("utf-8"),
+                    "mimetype": "application/json",
+                }
+            )
+            offset += len(result)
+            self.write(
+                {
+                    "job_progress": offset,
+                    "job_chunk_count": self.job_chunk_count + 1,
+                    "success_count": offset,
+                }
+            )
+            self.env.cr.commit()
+            if len(result) < JOB_EXPORT_CHUNK_SIZE:
+                break
+
+        self.write(
+            {
+                "status": "success",
+                "record_count": offset,
+                "message": f"Successfully exported {offset} records",
+            }
+        )
+
+    def _run_import_job(self, controller):
+        """Import the stored rows in committed chunks, resuming after a crash."""
+        attachment = self.env["ir.attachment"].sudo().search(
+            [
+                ("res_model", "=", self._name),
+                ("res_id", "=", self.id),
+                ("name", "=", "input.json"),
+            ],
+            limit=1,
+        )
+        records_data = json.loads(attachment.raw.decode("utf-8")) if attachment else []
+        if len(records_data) < 2:
+            raise ValueError("No data to import")
+
+        model = self.env[self.table_name].sudo()
+        headers = records_data[0]
+        rows = records_data[1:]
+        has_company = "company_id" in model._fields
+        company_id = self.config_id.company_id.id if has_company else None
+        detailed_errors = json.loads(self.detailed_errors or "[]")
+
+        start = self.job_progress
+        while start < len(rows):
+            chunk = rows[start : start + JOB_IMPORT_CHUNK_SIZE]
+            counts = controller._import_records(
+                model, headers, chunk, company_id, start_index=start + 1
+            )
+            detailed_errors += counts["detailed_errors"]
+            start += len(chunk)
+            self.write(
+                {
+                    "job_progress": start,
+                    "success_count": self.success_count + counts["success_count"],
+                    "partial_count": self.partial_count + counts["partial_count"],
+                    "failed_count": self.failed_count + counts["failed_count"],
+                    "detailed_errors": (
+                        json.dumps(detailed_errors, indent=2) if detailed_errors else False
+                    ),
+                }
+            )
+            self.env.cr.commit()
+
+        status, error_summary = controller._summarize_import(
+            self.success_count, self.partial_count, self.failed_count, detailed_errors
+        )
+        # the rows are imported: the input is no longer needed to resume
+        attachment.unlink()
+        self.write(
+            {
+                "status": status,
+                "message": error_summary if status == "success" else False,
+                "error_message": (
+                    error_summary if status in ["failure", "partial"] else False
+                ),
+            }
+        )
+
+    @api.model
+    def _count_table_rows(self, table, company_id=None):
+        """Count the rows an export of ``table`` will return for the company."""
+        model = self.env[table]
+        query = sql.SQL("SELECT COUNT(*) FROM {}").format(sql.Identifier(model._table))
+        params = []
+        if company_id and "company_id" in model._fields and model._fields["company_id"].store:
+            query += sql.SQL(" WHERE company_id = %s OR company_id IS NULL")
+            params.append(company_id)
+        self.env.cr.execute(query, params)
+        return self.env.cr.fetchone()[0]
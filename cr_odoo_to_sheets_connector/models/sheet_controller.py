@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies
 
+import functools
 import json
 import logging
 import time
@@ -17,6 +18,73 @@ _logger = logging.getLogger(__name__)
 _model_columns_cache = {}
 _batch_cache = {}
 BATCH_CACHE_TTL = 5  # 5 seconds
+# Display names of related records, shared by the pages of one fetch
+_display_name_cache = {}
+NAME_CACHE_TTL = 300  # 5 minutes
+
+# Per-token throttling: the rate limit is a token bucket kept in Postgres (see
+# cr.google.sheet.connector.config._consume_rate_token); concurrency slots are
+# Postgres advisory locks so they hold across workers
+THROTTLE_LOCK_NAMESPACE = 0x5348 << 32
+CONCURRENCY_RETRY_AFTER = 5  # seconds
+
+
+def _too_many_requests(message, retry_after):
+    return Response(
+        json.dumps({"error": message, "retry_after": retry_after}),
+        status=429,
+        content_type="application/json",
+        headers=[("Retry-After", str(retry_after))],
+    )
+
+
+def throttled(func):
+    """
+    Apply the token's rate and concurrency limits to a connector endpoint.
+
+    Requests over the limit get a 429 with a Retry-After header. Requests
+    without a valid token pass through so the endpoint answers 401 itself.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        token = request.httprequest.headers.get("X-Odoo-Access-Token")
+        limits = token and request.env[
+            "cr.google.sheet.connector.config"
+        ].sudo()._get_token_limits(token.strip())
+        if not limits:
+            return func(self, *args, **kwargs)
+
+        config_id, rate_limit, max_concurrent = limits
+        retry_after = request.env[
+            "cr.google.sheet.connector.config"
+        ].sudo()._consume_rate_token(config_id, rate_limit)
+        if retry_after:
+            _logger.info(f"Rate limit exceeded for config {config_id}")
+            return _too_many_requests("Rate limit exceeded", retry_after)
+
+        if not max_concurrent or max_concurrent <= 0:
+            return func(self, *args, **kwargs)
+
+        # Hold the slot in the request transaction: it is released when the
+        # request commits or rolls back (the endpoints only commit their log
+        # once the work is done).
+        cr = request.env.cr
+        for slot in range(min(max_concurrent, 1000)):
+            cr.execute(
+                "SELECT pg_try_advisory_xact_lock(%s)",
+                (THROTTLE_LOCK_NAMESPACE + config_id * 1000 + slot,),
+            )
+            if cr.fetchone()[0]:
+                break
+        else:
+            _logger.info(f"Concurrency limit reached for config {config_id}")
+            return _too_many_requests(
+                "Too many concurrent requests", CONCURRENCY_RETRY_AFTER
+            )
+        return func(self, *args, **kwargs)
+
+    return wrapper
 
 
 class OdooDataController(http.Controller):
@@ -32,9 +100,9 @@ class OdooDataController(http.Controller):
                 status=401,
             )
 
-        config = request.env["cr.google.sheet.connector.config"].sudo().search(
-            [("cr_access_token", "=", token.strip())], limit=1
-        )
+        Config = request.env["cr.google.sheet.connector.config"].sudo()
+        limits = Config._get_token_limits(token.strip())
+        config = Config.browse(limits[0]) if limits else Config
         if not config:
             _logger.info("Access denied: Invalid Token")
             return None, Response(
@@ -46,6 +114,7 @@ class OdooDataController(http.Controller):
         return config, None
 
     @http.route("/ht", auth="public", type="http", methods=["GET"])
+    @throttled
     def fetch_data(self):
         """Fetches the list of available models and returns them as a JSON response."""
         config, error_resp = self._get_config_or_error()
@@ -126,6 +195,7 @@ class OdooDataController(http.Controller):
     @http.route(
         "/get_model_fields", auth="public", type="http", csrf=False, methods=["POST"]
     )
+    @throttled
     def get_model_fields(self, **params):
         """Fetches the list of ACTUAL STORED fields that can be fetched from the database."""
         config, error_resp = self._get_config_or_error()
@@ -304,6 +374,7 @@ class OdooDataController(http.Controller):
         csrf=False,
         methods=["POST"],
     )
+    @throttled
     def fetch_table_data(self, table):
         """Optimized table data fetching with direct SQL queries and caching."""
         config, error_resp = self._get_config_or_error()
@@ -322,6 +393,7 @@ class OdooDataController(http.Controller):
             target_fields = req_data.get("fields", [])
             limit = req_data.get("limit", 10000)
             offset = req_data.get("offset", 0)
+            lang = req_data.get("lang") or request.env.lang or "en_US"
 
             _logger.info(
                 f"Parameters - Fields: {target_fields if target_fields else 'ALL'}, "
@@ -331,7 +403,7 @@ class OdooDataController(http.Controller):
                 target_fields = ["id"] + target_fields
             # Generate cache key
             cache_key = hashlib.md5(
-                f"{table}_{offset}_{limit}_{','.join(sorted(target_fields or []))}".encode()
+                f"{table}_{offset}_{limit}_{lang}_{','.join(sorted(target_fields or []))}".encode()
             ).hexdigest()
 
             current_time = time.time()
@@ -349,9 +421,21 @@ class OdooDataController(http.Controller):
                         content_type="application/json",
                     )
 
+            # A first page starts a new fetch: drop names cached by earlier runs
+            if not offset:
+                self._clear_display_name_cache(
+                    request.env.cr.dbname, config.company_id.id, lang
+                )
+
             # Fetch using optimized SQL
             result = self._fetch_optimized_data(
-                table, target_fields, limit, offset, initiated_at, config.company_id.id
+                table,
+                target_fields,
+                limit,
+                offset,
+                initiated_at,
+                config.company_id.id,
+                lang=lang,
             )
 
             # Check if result is an error
@@ -457,10 +541,167 @@ class OdooDataController(http.Controller):
 
             return Response(json.dumps({"error": str(e)}), status=500)
 
-    def _fetch_optimized_data(self, table, target_fields, limit, offset, initiated_at, company_id=None):
+    def _json_response(self, payload, status=200):
+        return Response(
+            json.dumps(payload), status=status, content_type="application/json"
+        )
+
+    @http.route(
+        "/get_table_count/<string:table>",
+        auth="public",
+        type="http",
+        csrf=False,
+        methods=["POST"],
+    )
+    @throttled
+    def fetch_table_count(self, table):
+        """Return the number of rows an export of the table would return."""
+        config, error_resp = self._get_config_or_error()
+        if error_resp:
+            return error_resp
+
+        try:
+            count = request.env["cr.data.processing.log"].sudo()._count_table_rows(
+                table, config.company_id.id
+            )
+            return self._json_response({"count": count})
+        except KeyError:
+            return self._json_response({"error": f"Model {table} not found"}, 404)
+        except Exception as e:
+            _logger.exception("Error counting rows of %s", table)
+            return self._json_response({"error": str(e)}, 500)
+
+    @http.route(
+        "/sheet_job/start", auth="public", type="http", csrf=False, methods=["POST"]
+    )
+    @throttled
+    def start_sheet_job(self, **params):
+        """Queue an import or export to run in the background and return its id."""
+        config, error_resp = self._get_config_or_error()
+        if error_resp:
+            return error_resp
+
+        try:
+            data = json.loads(request.httprequest.data.decode("utf-8"))
+        except ValueError:
+            return self._json_response({"error": "Invalid JSON payload"}, 400)
+
+        operation = data.get("operation")
+        table = data.get("table")
+        if operation not in ("odoo_to_sheet", "sheet_to_odoo") or not table:
+            return self._json_response(
+                {"error": "Missing or invalid operation/table in the request."}, 400
+            )
+        if table not in request.env:
+            return self._json_response({"error": f"Model {table} not found"}, 404)
+
+        Log = request.env["cr.data.processing.log"].sudo()
+        if operation == "odoo_to_sheet":
+            job = Log.create_job(
+                config,
+                operation,
+                table,
+                {
+                    "fields": data.get("fields") or [],
+                    "lang": data.get("lang") or request.env.lang or "en_US",
+                },
+            )
+        else:
+            rows = data.get("data")
+            if not rows or len(rows) < 2:
+                return self._json_response({"error": "Missing data in the request."}, 400)
+            job = Log.create_job(config, operation, table, {}, rows=rows)
+
+        _logger.info(f"Queued {operation} job {job.id} for {table}")
+        return self._json_response(job.get_job_status())
+
+    @http.route(
+        "/sheet_job/status", auth="public", type="http", csrf=False, methods=["POST"]
+    )
+    @throttled
+    def sheet_jobs_status(self, **params):
+        """Return the progress of several background jobs in one call."""
+        config, error_resp = self._get_config_or_error()
+        if error_resp:
+            return error_resp
+
+        try:
+            data = json.loads(request.httprequest.data.decode("utf-8"))
+        except ValueError:
+            return self._json_response({"error": "Invalid JSON payload"}, 400)
+
+        job_ids = [job_id for job_id in data.get("job_ids") or [] if isinstance(job_id, int)]
+        jobs = request.env["cr.data.processing.log"].sudo().search(
+            [("id", "in", job_ids), ("config_id", "=", config.id), ("job_state", "!=", False)]
+        )
+        return self._json_response({"jobs": [job.get_job_status() for job in jobs]})
+
+    @http.route(
+        "/sheet_job/<int:job_id>", auth="public", type="http", csrf=False, methods=["GET"]
+    )
+    @throttled
+    def sheet_job_status(self, job_id):
+        """Return the progress of a background job."""
+        job, error_resp = self._get_job_or_error(job_id)
+        if error_resp:
+            return error_resp
+        return self._json_response(job.get_job_status())
+
+    @http.route(
+        "/sheet_job/<int:job_id>/chunk/<int:chunk_index>",
+        auth="public",
+        type="http",
+        csrf=False,
+        methods=["GET"],
+    )
+    @throttled
+    def sheet_job_chunk(self, job_id, chunk_index):
+        """Return one result chunk of a background export."""
+        job, error_resp = self._get_job_or_error(job_id)
+        if error_resp:
+            return error_resp
+        rows = job.get_job_chunk(chunk_index)
+        if rows is None:
+            return self._json_response({"error": "Chunk not available yet"}, 404)
+        return self._json_response(rows)
+
+    def _get_job_or_error(self, job_id):
+        """Get a job owned by the token's configuration or return None, error_response."""
+        config, error_resp = self._get_config_or_error()
+        if error_resp:
+            return None, error_resp
+        job = request.env["cr.data.processing.log"].sudo().search(
+            [("id", "=", job_id), ("config_id", "=", config.id), ("job_state", "!=", False)],
+            limit=1,
+        )
+        if not job:
+            return None, self._json_response({"error": "Job not found"}, 404)
+        return job, None
+
+    def _clear_display_name_cache(self, dbname, company_id, lang):
+        """Drop cached display names for a database/company/lang and any expired entries."""
+        current_time = time.time()
+        for key in list(_display_name_cache):
+            if key[:3] == (dbname, company_id, lang) or (
+                current_time - _display_name_cache[key][1] >= NAME_CACHE_TTL
+            ):
+                _display_name_cache.pop(key, None)
+
+    def _fetch_optimized_data(
+        self,
+        table,
+        target_fields,
+        limit,
+        offset,
+        initiated_at,
+        company_id=None,
+        lang=None,
+        env=None,
+    ):
         """Fetch data using direct SQL queries - ONLY uses fields that exist in DB."""
         start_time = time.time()
-        cr = request.env.cr
+        env = env or request.env
+        cr = env.cr
         table_name_db = table.replace(".", "_")
 
         # Get column information (cached)
@@ -585,7 +826,13 @@ class OdooDataController(http.Controller):
 
         # Fetch relational field names
         relational_data = self._fetch_relational_names(
-            column_names, relational_fields, rows, table
+            column_names,
+            relational_fields,
+            rows,
+            table,
+            lang=lang,
+            company_id=company_id,
+            env=env,
         )
 
         # Serialize data
@@ -614,143 +861,153 @@ class OdooDataController(http.Controller):
         return result_data
 
     def _fetch_relational_names(
-        self, column_names, relational_fields, rows, current_model
+        self,
+        column_names,
+        relational_fields,
+        rows,
+        current_model,
+        lang=None,
+        company_id=None,
+        env=None,
     ):
-        """Fetch display names for relational fields."""
+        """Fetch display names for relational fields, one lookup per comodel."""
         relational_data = {}
-        cr = request.env.cr
 
+        # Group every referenced id by comodel across all relational columns
+        ids_by_model = {}
         for col_name in column_names:
             if col_name not in relational_fields:
                 continue
-
-            field_info = relational_fields[col_name]
-            field_type = field_info["type"]
-            related_model = field_info["relation"]
-            related_table = related_model.replace(".", "_")
+            related_model = relational_fields[col_name]["relation"]
             col_index = column_names.index(col_name)
-
+            model_ids = ids_by_model.setdefault(related_model, set())
+            for row in rows:
+                val = row[col_index]
+                if isinstance(val, list):
+                    model_ids.update(v for v in val if isinstance(v, int))
+                elif val and isinstance(val, int):
+                    model_ids.add(val)
+
+        names_by_model = {}
+        for related_model, ids in ids_by_model.items():
             try:
-                # Get the rec_name for the related model
-                rec_name = self._get_model_rec_name(related_model)
-
-                # Check if the rec_name column exists in the related table
-                cr.execute(
-                    """
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = %s AND column_name = %s
-                """,
-                    (related_table, rec_name),
+                names_by_model[related_model] = self._resolve_display_names(
+                    related_model, ids, lang, company_id, env=env
+                )
+            except Exception as e:
+                _logger.warning(
+                    f"Failed to fetch display names for {related_model}: {str(e)}"
                 )
 
-                if not cr.fetchone():
-                    _logger.warning(
-                        f"Field {rec_name} not found in {related_table}, skipping"
-                    )
-                    continue
-
-                if field_type == "many2one":
-                    # Collect all IDs from this column
-                    ids = set()
-                    for row in rows:
-                        val = row[col_index]
-                        if val and isinstance(val, int):
-                            ids.add(val)
-
-                    if ids:
-                        # Fetch names in one query
-                        cr.execute(
-                            sql.SQL(
-                                """
-                            SELECT id, {}
-                            FROM {}
-                            WHERE id = ANY(%s)
-                        """
-                            ).format(
-                                sql.Identifier(rec_name), sql.Identifier(related_table)
-                            ),
-                            [list(ids)],
-                        )
+        for col_name in column_names:
+            if col_name not in relational_fields:
+                continue
+            related_model = relational_fields[col_name]["relation"]
+            if related_model not in names_by_model:
+                continue
 
-                        id_to_name = {row[0]: row[1] for row in cr.fetchall()}
+            id_to_name = names_by_model[related_model]
+            col_index = column_names.index(col_name)
+            relational_data[col_name] = {}
+
+            for row_idx, row in enumerate(rows):
+                val = row[col_index]
+                if isinstance(val, list):
+                    # Format as "ID1:Name1,ID2:Name2,ID3:Name3"
+                    relational_data[col_name][row_idx] = ",".join(
+                        f"{item_id}:{id_to_name[item_id]}"
+                        if id_to_name.get(item_id)
+                        else str(item_id)
+                        for item_id in val
+                    )
+                elif val and id_to_name.get(val):
+                    relational_data[col_name][row_idx] = f"{val}:{id_to_name[val]}"
+                elif val:
+                    relational_data[col_name][row_idx] = str(val)
+                else:
+                    relational_data[col_name][row_idx] = ""
 
-                        # Map back to rows with format "ID:Name"
-                        relational_data[col_name] = {}
-                        for row_idx, row in enumerate(rows):
-                            val = row[col_index]
-                            if val and val in id_to_name:
-                                display_name = (
-                                    id_to_name[val] if id_to_name[val] else str(val)
-                                )
-                                relational_data[col_name][
-                                    row_idx
-                                ] = f"{val}:{display_name}"
-                            elif val:
-                                relational_data[col_name][row_idx] = str(val)
-                            else:
-                                relational_data[col_name][row_idx] = ""
-
-                elif field_type in ("many2many", "one2many"):
-                    # For many2many/one2many, handle array fields
-                    relational_data[col_name] = {}
-
-                    # Collect all unique IDs across all rows
-                    all_ids = set()
-                    for row in rows:
-                        val = row[col_index]
-                        if val and isinstance(val, list):
-                            all_ids.update(val)
-
-                    if all_ids:
-                        # Fetch all names in one query
-                        cr.execute(
-                            sql.SQL(
-                                """
-                            SELECT id, {}
-                            FROM {}
-                            WHERE id = ANY(%s)
-                        """
-                            ).format(
-                                sql.Identifier(rec_name), sql.Identifier(related_table)
-                            ),
-                            [list(all_ids)],
-                        )
+        return relational_data
 
-                        id_to_name = {row[0]: row[1] for row in cr.fetchall()}
-
-                        # Map back to rows
-                        for row_idx, row in enumerate(rows):
-                            val = row[col_index]
-                            if val and isinstance(val, list):
-                                # Format as "ID1:Name1,ID2:Name2,ID3:Name3"
-                                formatted_items = []
-                                for item_id in val:
-                                    display_name = id_to_name.get(item_id, str(item_id))
-                                    if display_name:
-                                        formatted_items.append(
-                                            f"{item_id}:{display_name}"
-                                        )
-                                    else:
-                                        formatted_items.append(str(item_id))
-                                relational_data[col_name][row_idx] = ",".join(
-                                    formatted_items
-                                )
-                            else:
-                                relational_data[col_name][row_idx] = ""
+    def _resolve_display_names(
+        self, model_name, ids, lang=None, company_id=None, env=None
+    ):
+        """
+        Return {id: display name} for the given ids of ``model_name``.
+
+        Names are cached per (database, company, lang, model) for the duration
+        of a multi-page fetch. Models that keep the default display name and
+        whose ``_rec_name`` is a char/text column are read straight from that
+        column (translated jsonb columns are resolved in SQL for ``lang``);
+        any other model goes through ``display_name`` so custom names,
+        relational ``_rec_name`` and company context apply.
+        """
+        lang = lang or "en_US"
+        env = env or request.env
+        cache_key = (env.cr.dbname, company_id, lang, model_name)
+        current_time = time.time()
+
+        cached = _display_name_cache.get(cache_key)
+        if cached and current_time - cached[1] < NAME_CACHE_TTL:
+            id_to_name = cached[0]
+        else:
+            id_to_name = {}
+            _display_name_cache[cache_key] = (id_to_name, current_time)
+
+        missing_ids = [i for i in ids if i not in id_to_name]
+        if not missing_ids:
+            return id_to_name
+
+        model = env[model_name].sudo()
+        if company_id:
+            model = model.with_company(company_id)
+        model = model.with_context(lang=lang, active_test=False)
+
+        rec_name = self._get_model_rec_name(model_name, env=env)
+        rec_field = model._fields.get(rec_name)
+        uses_default_name = (
+            type(model)._compute_display_name
+            is models.BaseModel._compute_display_name
+        )
 
-            except Exception as e:
-                _logger.warning(
-                    f"Failed to fetch relational data for {col_name}: {str(e)}"
+        if (
+            uses_default_name
+            and rec_field
+            and rec_field.store
+            and rec_field.type in ("char", "text")
+        ):
+            table_name_db = model._table
+            if rec_field.translate:
+                # Translated names live in a jsonb column keyed by language
+                name_sql = sql.SQL("COALESCE({col}->>%s, {col}->>'en_US')").format(
+                    col=sql.Identifier(rec_name)
                 )
-                continue
+                params = [lang, missing_ids]
+            else:
+                name_sql = sql.Identifier(rec_name)
+                params = [missing_ids]
+            env.cr.execute(
+                sql.SQL("SELECT id, {} FROM {} WHERE id = ANY(%s)").format(
+                    name_sql, sql.Identifier(table_name_db)
+                ),
+                params,
+            )
+            for record_id, name in env.cr.fetchall():
+                id_to_name[record_id] = str(name) if name not in (None, False) else ""
+        else:
+            for record in model.browse(missing_ids).exists():
+                id_to_name[record.id] = record.display_name or ""
 
-        return relational_data
+        # Remember misses too so deleted ids are not looked up on every page
+        for record_id in missing_ids:
+            id_to_name.setdefault(record_id, "")
+
+        return id_to_name
 
-    def _get_model_rec_name(self, model_name):
+    def _get_model_rec_name(self, model_name, env=None):
         """Get the rec_name field for a model, fallback to 'name'."""
         try:
-            model = request.env[model_name].sudo()
+            model = (env or request.env)[model_name].sudo()
             # Check if model has _rec_name defined
             if hasattr(model, "_rec_name") and model._rec_name:
                 return model._rec_name
@@ -785,6 +1042,7 @@ class OdooDataController(http.Controller):
             return str(value) if value else ""
 
     @http.route("/send_data", auth="public", type="http", csrf=False, methods=["POST"])
+    @throttled
     def fetch_table_odoo_data(self, **params):
         """Handle data import from Google Sheets with column-wise fallback and detailed logging."""
         config, error_resp = self._get_config_or_error()
@@ -821,15 +1079,86 @@ class OdooDataController(http.Controller):
             f"Starting data import for {table}: {record_count} records, columns: {headers}"
         )
 
+        has_company = "company_id" in model._fields
+        company_id = config.company_id.id if has_company else None
+
+        counts = self._import_records(model, headers, records_data[1:], company_id)
+        success_count = counts["success_count"]
+        partial_count = counts["partial_count"]
+        failed_count = counts["failed_count"]
+        detailed_errors = counts["detailed_errors"]
+
+        request.env.cr.commit()
+
+        duration = time.time() - start_time
+        completed_at = datetime.now()
+
+        status, error_summary = self._summarize_import(
+            success_count, partial_count, failed_count, detailed_errors
+        )
+
+        _logger.info(f"Data import completed in {duration:.2f}s - {error_summary}")
+
+        # Log to database
+        try:
+            request.env["cr.data.processing.log"].sudo().create(
+                {
+                    "table_name": table,
+                    "operation_type": "sheet_to_odoo",
+                    "record_count": record_count,
+                    "success_count": success_count,
+                    "failed_count": failed_count,
+                    "partial_count": partial_count,
+                    "status": status,
+                    "message": error_summary if status == "success" else None,
+                    "error_message": (
+                        error_summary if status in ["failure", "partial"] else None
+                    ),
+                    "detailed_errors": (
+                        json.dumps(detailed_errors, indent=2)
+                        if detailed_errors
+                        else None
+                    ),
+                    "timestamp": f"{duration:.2f}s",
+                    "initiated_at": initiated_at,
+                    "completed_at": completed_at,
+                }
+            )
+            request.env.cr.commit()
+        except Exception as log_error:
+            _logger.error(f"Failed to create log entry: {str(log_error)}")
+
+        return Response(
+            json.dumps(
+                {
+                    "message": "Data processed",
+                    "success_count": success_count,
+                    "partial_count": partial_count,
+                    "failed_count": failed_count,
+                    "total_count": record_count,
+                    "status": status,
+                    "errors": detailed_errors[:10],  # Limit to first 10 in response
+                }
+            ),
+            status=200,
+            content_type="application/json",
+        )
+
+    def _import_records(self, model, headers, rows, company_id=None, start_index=1):
+        """
+        Create or update records of ``model`` from sheet ``rows``.
+
+        Every row runs in its own savepoint with a column-wise fallback. Returns
+        a dict with the success/partial/failed counts and the detailed errors.
+        """
+        cr = model.env.cr
         success_count = 0
         failed_count = 0
         partial_count = 0
         detailed_errors = []
-
         has_company = "company_id" in model._fields
-        company_id = config.company_id.id if has_company else None
 
-        for idx, row in enumerate(records_data[1:], 1):
+        for idx, row in enumerate(rows, start_index):
             record_data = {headers[i]: value for i, value in enumerate(row)}
             processed_data, translations = self._prepare_data(record_data, model)
             record_id = (
@@ -863,7 +1192,7 @@ class OdooDataController(http.Controller):
 
             # Create a savepoint before attempting the operation
             savepoint_name = f'record_{record_id or "new"}_{idx}'
-            request.env.cr.execute(f"SAVEPOINT {savepoint_name}")
+            cr.execute(f"SAVEPOINT {savepoint_name}")
 
             existing_record = (
                 model.search([("id", "=", record_id)], limit=1) if record_id else None
@@ -875,11 +1204,11 @@ class OdooDataController(http.Controller):
                     existing_record.write(processed_data)
                     self._apply_translations(existing_record, translations)
                     success_count += 1
-                    request.env.cr.execute(f"RELEASE SAVEPOINT {savepoint_name}")
+                    cr.execute(f"RELEASE SAVEPOINT {savepoint_name}")
                     _logger.debug(f"✓ Successfully updated record ID {record_id}")
                 except Exception as e:
                     # FALLBACK: Try column-by-column update
-                    request.env.cr.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
+                    cr.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
                     _logger.warning(
                         f"Full update failed for ID {record_id}, trying column-wise: {str(e)}"
                     )
@@ -892,15 +1221,15 @@ class OdooDataController(http.Controller):
                             continue
 
                         field_savepoint = f"{savepoint_name}_{field}"
-                        request.env.cr.execute(f"SAVEPOINT {field_savepoint}")
+                        cr.execute(f"SAVEPOINT {field_savepoint}")
                         try:
                             existing_record.write({field: value})
-                            request.env.cr.execute(
+                            cr.execute(
                                 f"RELEASE SAVEPOINT {field_savepoint}"
                             )
                             successful_columns.append(field)
                         except Exception as field_error:
-                            request.env.cr.execute(
+                            cr.execute(
                                 f"ROLLBACK TO SAVEPOINT {field_savepoint}"
                             )
                             column_errors.append(
@@ -934,11 +1263,11 @@ class OdooDataController(http.Controller):
                     new_record = model.create(processed_data)
                     self._apply_translations(new_record, translations)
                     success_count += 1
-                    request.env.cr.execute(f"RELEASE SAVEPOINT {savepoint_name}")
+                    cr.execute(f"RELEASE SAVEPOINT {savepoint_name}")
                     _logger.debug(f"✓ Successfully created new record (row {idx})")
                 except Exception as e:
                     # FALLBACK: Try column-by-column create
-                    request.env.cr.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
+                    cr.execute(f"ROLLBACK TO SAVEPOINT {savepoint_name}")
                     _logger.warning(
                         f"Full create failed for row {idx}, trying column-wise: {str(e)}"
                     )
@@ -958,11 +1287,11 @@ class OdooDataController(http.Controller):
                     }
 
                     field_savepoint = f"{savepoint_name}_minimal"
-                    request.env.cr.execute(f"SAVEPOINT {field_savepoint}")
+                    cr.execute(f"SAVEPOINT {field_savepoint}")
 
                     try:
                         new_record = model.create(minimal_data)
-                        request.env.cr.execute(f"RELEASE SAVEPOINT {field_savepoint}")
+                        cr.execute(f"RELEASE SAVEPOINT {field_savepoint}")
                         successful_columns = list(minimal_data.keys())
 
                         # Now try to update with remaining fields one by one
@@ -974,17 +1303,17 @@ class OdooDataController(http.Controller):
 
                         for field, value in remaining_data.items():
                             field_savepoint_update = f"{savepoint_name}_{field}"
-                            request.env.cr.execute(
+                            cr.execute(
                                 f"SAVEPOINT {field_savepoint_update}"
                             )
                             try:
                                 new_record.write({field: value})
-                                request.env.cr.execute(
+                                cr.execute(
                                     f"RELEASE SAVEPOINT {field_savepoint_update}"
                                 )
                                 successful_columns.append(field)
                             except Exception as field_error:
-                                request.env.cr.execute(
+                                cr.execute(
                                     f"ROLLBACK TO SAVEPOINT {field_savepoint_update}"
                                 )
                                 column_errors.append(
@@ -1012,7 +1341,7 @@ class OdooDataController(http.Controller):
 
                     except Exception as minimal_error:
                         # Even minimal create failed
-                        request.env.cr.execute(
+                        cr.execute(
                             f"ROLLBACK TO SAVEPOINT {field_savepoint}"
                         )
                         failed_count += 1
@@ -1031,14 +1360,18 @@ class OdooDataController(http.Controller):
             # Log progress every 100 records
             if idx % 100 == 0:
                 _logger.info(
-                    f"Progress: {idx}/{record_count} processed (Success: {success_count}, Partial: {partial_count}, Failed: {failed_count})"
+                    f"Progress: {idx} rows processed (Success: {success_count}, Partial: {partial_count}, Failed: {failed_count})"
                 )
 
-        request.env.cr.commit()
-
-        duration = time.time() - start_time
-        completed_at = datetime.now()
+        return {
+            "success_count": success_count,
+            "partial_count": partial_count,
+            "failed_count": failed_count,
+            "detailed_errors": detailed_errors,
+        }
 
+    def _summarize_import(self, success_count, partial_count, failed_count, detailed_errors):
+        """Return the overall (status, summary message) of an import."""
         # Determine overall status
         if failed_count == 0 and partial_count == 0:
             status = "success"
@@ -1062,52 +1395,7 @@ class OdooDataController(http.Controller):
             if len(detailed_errors) > 5:
                 error_summary += f"... and {len(detailed_errors) - 5} more errors (see detailed_errors field)\n"
 
-        _logger.info(f"Data import completed in {duration:.2f}s - {error_summary}")
-
-        # Log to database
-        try:
-            request.env["cr.data.processing.log"].sudo().create(
-                {
-                    "table_name": table,
-                    "operation_type": "sheet_to_odoo",
-                    "record_count": record_count,
-                    "success_count": success_count,
-                    "failed_count": failed_count,
-                    "partial_count": partial_count,
-                    "status": status,
-                    "message": error_summary if status == "success" else None,
-                    "error_message": (
-                        error_summary if status in ["failure", "partial"] else None
-                    ),
-                    "detailed_errors": (
-                        json.dumps(detailed_errors, indent=2)
-                        if detailed_errors
-                        else None
-                    ),
-                    "timestamp": f"{duration:.2f}s",
-                    "initiated_at": initiated_at,
-                    "completed_at": completed_at,
-                }
-            )
-            request.env.cr.commit()
-        except Exception as log_error:
-            _logger.error(f"Failed to create log entry: {str(log_error)}")
-
-        return Response(
-            json.dumps(
-                {
-                    "message": "Data processed",
-                    "success_count": success_count,
-                    "partial_count": partial_count,
-                    "failed_count": failed_count,
-                    "total_count": record_count,
-                    "status": status,
-                    "errors": detailed_errors[:10],  # Limit to first 10 in response
-                }
-            ),
-            status=200,
-            content_type="application/json",
-        )
+        return status, error_summary
 
     def _parse_translation_dict(self, value):
         """
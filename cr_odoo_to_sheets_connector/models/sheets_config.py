@@ -2,9 +2,18 @@
 # Part of Creyox Technologies
 
 import base64
-from odoo import models, fields, api
+import logging
+from psycopg2 import errors
+from odoo import models, fields, api, tools
 import secrets
 
+_logger = logging.getLogger(__name__)
+
+# Fields whose values are cached by _get_token_limits
+THROTTLE_FIELDS = {"cr_access_token", "cr_rate_limit", "cr_max_concurrent_requests"}
+# Attempts to take a rate token when concurrent requests update the same bucket
+RATE_TOKEN_ATTEMPTS = 3
+
 
 class GoogleSheetConnectorConfig(models.Model):
     _name = "cr.google.sheet.connector.config"
@@ -26,6 +35,114 @@ class GoogleSheetConnectorConfig(models.Model):
         required=True,
         default=lambda self: self.env.company,
     )
+    cr_rate_limit = fields.Integer(
+        "Requests per Minute",
+        default=60,
+        help="Maximum API calls per minute for this token. 0 disables rate limiting.",
+    )
+    cr_max_concurrent_requests = fields.Integer(
+        "Concurrent Requests",
+        default=2,
+        help="Maximum simultaneous API calls for this token. 0 disables the limit.",
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if THROTTLE_FIELDS.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    def init(self):
+        # One token bucket row per configuration, shared by all workers
+        self.env.cr.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cr_sheet_rate_bucket (
+                config_id INTEGER PRIMARY KEY
+                    REFERENCES cr_google_sheet_connector_config (id) ON DELETE CASCADE,
+                tokens DOUBLE PRECISION NOT NULL,
+                refilled_at TIMESTAMP NOT NULL
+            )
+        """
+        )
+
+    @api.model
+    def _consume_rate_token(self, config_id, rate_limit):
+        """
+        Take one token from the configuration's bucket.
+
+        The bucket holds ``rate_limit`` tokens and refills at ``rate_limit``
+        per minute. It is updated in its own short transaction, so the limit
+        applies across workers and databases never share a bucket, and the
+        row lock is not held for the whole request.
+
+        :return: seconds to wait before retrying, or 0 if the token was taken
+        """
+        if not rate_limit or rate_limit <= 0:
+            return 0
+        refill_rate = rate_limit / 60.0
+        params = {"config_id": config_id, "capacity": float(rate_limit), "rate": refill_rate}
+        for attempt in range(RATE_TOKEN_ATTEMPTS):
+            try:
+                with self.env.registry.cursor() as cr:
+                    cr.execute(
+                        """
+                        INSERT INTO cr_sheet_rate_bucket (config_id, tokens, refilled_at)
+                        VALUES (%(config_id)s, %(capacity)s, now() AT TIME ZONE 'UTC')
+                        ON CONFLICT (config_id) DO NOTHING
+                    """,
+                        params,
+                    )
+                    cr.execute(
+                        """
+                        WITH bucket AS (
+                            SELECT config_id,
+                                   LEAST(%(capacity)s, tokens + GREATEST(0, EXTRACT(
+                                       EPOCH FROM (now() AT TIME ZONE 'UTC') - refilled_at
+                                   )) * %(rate)s) AS available
+                              FROM cr_sheet_rate_bucket
+                             WHERE config_id = %(config_id)s
+                        )
+                        UPDATE cr_sheet_rate_bucket b
+                           SET tokens = CASE WHEN bucket.available >= 1
+                                             THEN bucket.available - 1
+                                             ELSE bucket.available END,
+                               refilled_at = now() AT TIME ZONE 'UTC'
+                          FROM bucket
+                         WHERE b.config_id = bucket.config_id
+                     RETURNING bucket.available
+                    """,
+                        params,
+                    )
+                    row = cr.fetchone()
+            except errors.SerializationFailure:
+                # another request of the same token updated the bucket first
+                _logger.debug(f"Rate bucket of config {config_id} busy, attempt {attempt + 1}")
+                continue
+            available = row[0] if row else float(rate_limit)
+            if available >= 1:
+                return 0
+            return max(1, int((1 - available) / refill_rate + 0.999))
+        return 1
+
+    @api.model
+    @tools.ormcache("token")
+    def _get_token_limits(self, token):
+        """Return (config id, rate limit, max concurrency) for a token, cached."""
+        config = self.sudo().search([("cr_access_token", "=", token)], limit=1)
+        if not config:
+            return None
+        return config.id, config.cr_rate_limit, config.cr_max_concurrent_requests
 
     def generate_token(self):
         """Generate a new API token."""
@@ -520,12 +637,31 @@ function buildSheetColumnMap(sheetNames) {
   return map;
 }
 
+// Odoo answers 429 with a Retry-After header when the token is throttled
+const MAX_FETCH_ATTEMPTS = 5;
+
+function fetchWithBackoff(url, options) {
+  let response = null;
+  for (let attempt = 1; attempt <= MAX_FETCH_ATTEMPTS; attempt++) {
+    response = UrlFetchApp.fetch(url, options);
+    if (response.getResponseCode() !== 429 || attempt === MAX_FETCH_ATTEMPTS) {
+      return response;
+    }
+    const headers = response.getHeaders();
+    const retryAfter = parseInt(headers['Retry-After'] || headers['retry-after'] || '5', 10);
+    const waitMs = Math.min(retryAfter, 60) * 1000 + Math.floor(Math.random() * 1000);
+    console.log('Throttled by Odoo, retrying in ' + waitMs + 'ms (attempt ' + attempt + ')');
+    Utilities.sleep(waitMs);
+  }
+  return response;
+}
+
 function fetchAvailableTables(url) {
   const urli = PropertiesService.getScriptProperties().getProperty('odooUrl');
   const token = PropertiesService.getScriptProperties().getProperty('odootoken');
   const dbListUrl = urli + '/ht';
 
-  const response = UrlFetchApp.fetch(dbListUrl, {
+  const response = fetchWithBackoff(dbListUrl, {
       method: 'get',
       headers: {
         'X-Odoo-Access-Token': token
@@ -552,7 +688,7 @@ function fetchModelFields(model) {
   };
 
   try {
-      const response = UrlFetchApp.fetch(url + '/get_model_fields', options);
+      const response = fetchWithBackoff(url + '/get_model_fields', options);
       return JSON.parse(response.getContentText());
   } catch (e) {
       return [];
@@ -878,6 +1014,11 @@ function fetchDataWithColumns(tablesAndFields) {
 
     SpreadsheetApp.getActiveSpreadsheet().toast('Fetching ' + table + '...');
 
+    if (countTableRows(url, table) > ASYNC_ROW_THRESHOLD) {
+        fetchTableViaJob(url, table, fields);
+        return;
+    }
+
     while (hasMore) {
         try {
             const data = fetchTableDataFromOdoo(url, table, fields, BATCH_SIZE, offset);
@@ -934,7 +1075,7 @@ function fetchTableDataFromOdoo(url, table, fields, limit, offset) {
        console.log('Fetching from: ' + url + '/get_table/' + table);
        console.log('Payload: ' + JSON.stringify(payload));
 
-       const response = UrlFetchApp.fetch(url + '/get_table/' + table, {
+       const response = fetchWithBackoff(url + '/get_table/' + table, {
          method: 'post',
          contentType: 'text/plain',
          headers: {
@@ -963,6 +1104,171 @@ function fetchTableDataFromOdoo(url, table, fields, limit, offset) {
    }
 }
 
+// Transfers above this many rows run as background jobs in Odoo
+const ASYNC_ROW_THRESHOLD = 50000;
+const JOB_POLL_INTERVAL_MS = 5000;
+// Stay below the 6 minute Apps Script limit, then resume from a trigger
+const JOB_TIME_BUDGET_MS = 5 * 60 * 1000;
+
+function callOdooJson(path, method, payload) {
+  const url = PropertiesService.getScriptProperties().getProperty('odooUrl');
+  const token = PropertiesService.getScriptProperties().getProperty('odootoken');
+  const options = {
+    method: method,
+    headers: {
+      'X-Odoo-Access-Token': token
+    },
+    muteHttpExceptions: true
+  };
+  if (payload !== undefined) {
+    options.contentType = 'text/plain';
+    options.payload = JSON.stringify(payload);
+  }
+  try {
+    const response = fetchWithBackoff(url + path, options);
+    const result = JSON.parse(response.getContentText());
+    if (response.getResponseCode() !== 200 && !result.error) {
+      return {error: 'HTTP ' + response.getResponseCode()};
+    }
+    return result;
+  } catch (e) {
+    console.error('Exception calling ' + path + ': ' + e.message);
+    return {error: e.message};
+  }
+}
+
+function countTableRows(url, table) {
+  const result = callOdooJson('/get_table_count/' + table, 'post', {});
+  return (result && result.count) || 0;
+}
+
+function startSheetJob(url, payload) {
+  return callOdooJson('/sheet_job/start', 'post', payload);
+}
+
+function fetchTableViaJob(url, table, fields) {
+  const job = startSheetJob(url, {operation: 'odoo_to_sheet', table: table, fields: fields || []});
+  if (!job || job.error) {
+    SpreadsheetApp.getActiveSpreadsheet().toast('Error starting job for ' + table + ': ' + (job && job.error));
+    return;
+  }
+  SpreadsheetApp.getActiveSpreadsheet().toast('Started background fetch of ' + table + ' (job ' + job.job_id + ')');
+  pollExportJob(url, {operation: 'export', table: table, jobId: job.job_id, nextChunk: 0}, Date.now());
+}
+
+function pollExportJob(url, pending, startedAt) {
+  while (true) {
+    const status = callOdooJson('/sheet_job/' + pending.jobId, 'get');
+    if (!status || status.error) {
+      SpreadsheetApp.getActiveSpreadsheet().toast('Error polling job for ' + pending.table + ': ' + (status && status.error));
+      return true;
+    }
+
+    while (pending.nextChunk < status.chunk_count) {
+      const rows = callOdooJson('/sheet_job/' + pending.jobId + '/chunk/' + pending.nextChunk, 'get');
+      if (!Array.isArray(rows)) {
+        SpreadsheetApp.getActiveSpreadsheet().toast('Error fetching ' + pending.table + ': ' + (rows && rows.error));
+        return true;
+      }
+      writeDataToSheet(pending.table, rows, pending.nextChunk > 0);
+      pending.nextChunk += 1;
+    }
+
+    if (status.state === 'failed') {
+      SpreadsheetApp.getActiveSpreadsheet().toast('Fetching ' + pending.table + ' failed: ' + status.error);
+      return true;
+    }
+    if (status.state === 'done') {
+      if (status.chunk_count === 0) {
+        writeDataToSheet(pending.table, [], false);
+      }
+      SpreadsheetApp.getActiveSpreadsheet().toast('Fetched ' + status.processed + ' records for ' + pending.table);
+      return true;
+    }
+    if (Date.now() - startedAt > JOB_TIME_BUDGET_MS) {
+      savePendingSheetJob(pending);
+      return false;
+    }
+    SpreadsheetApp.getActiveSpreadsheet().toast('Fetching ' + pending.table + ': ' + status.processed + '/' + status.total);
+    Utilities.sleep(JOB_POLL_INTERVAL_MS);
+  }
+}
+
+function pollImportJobs(url, pending, startedAt) {
+  while (true) {
+    let processed = 0;
+    let total = 0;
+    let failed = 0;
+    let finished = true;
+    // One request for all the batches of the upload, whatever their number
+    const result = callOdooJson('/sheet_job/status', 'post', {job_ids: pending.jobIds});
+    if (!result || result.error) {
+      SpreadsheetApp.getActiveSpreadsheet().toast('Error polling jobs for ' + pending.table + ': ' + (result && result.error));
+      return true;
+    }
+    // Jobs that no longer exist count as failed
+    failed += pending.jobIds.length - result.jobs.length;
+    result.jobs.forEach(status => {
+      processed += status.processed;
+      total += status.total;
+      failed += status.failed_count;
+      if (status.state === 'queued' || status.state === 'running') {
+        finished = false;
+      }
+    });
+
+    if (finished) {
+      SpreadsheetApp.getActiveSpreadsheet().toast('Export Completed for ' + pending.table + ' (' + processed + ' rows, ' + failed + ' failed)');
+      return true;
+    }
+    if (Date.now() - startedAt > JOB_TIME_BUDGET_MS) {
+      savePendingSheetJob(pending);
+      return false;
+    }
+    SpreadsheetApp.getActiveSpreadsheet().toast('Exporting ' + pending.table + ': ' + processed + '/' + total);
+    Utilities.sleep(JOB_POLL_INTERVAL_MS);
+  }
+}
+
+function savePendingSheetJob(pending) {
+  const props = PropertiesService.getScriptProperties();
+  const queue = JSON.parse(props.getProperty('PENDING_SHEET_JOBS') || '[]');
+  queue.push(pending);
+  props.setProperty('PENDING_SHEET_JOBS', JSON.stringify(queue));
+
+  ScriptApp.getProjectTriggers().forEach(t => {
+    if (t.getHandlerFunction() === 'resumeSheetJobs') {
+      ScriptApp.deleteTrigger(t);
+    }
+  });
+  ScriptApp.newTrigger('resumeSheetJobs')
+    .timeBased()
+    .after(60 * 1000)
+    .create();
+}
+
+function resumeSheetJobs() {
+  const props = PropertiesService.getScriptProperties();
+  const url = props.getProperty('odooUrl');
+  const queue = JSON.parse(props.getProperty('PENDING_SHEET_JOBS') || '[]');
+  props.deleteProperty('PENDING_SHEET_JOBS');
+
+  ScriptApp.getProjectTriggers().forEach(t => {
+    if (t.getHandlerFunction() === 'resumeSheetJobs') {
+      ScriptApp.deleteTrigger(t);
+    }
+  });
+
+  const startedAt = Date.now();
+  queue.forEach(pending => {
+    if (pending.operation === 'export') {
+      pollExportJob(url, pending, startedAt);
+    } else {
+      pollImportJobs(url, pending, startedAt);
+    }
+  });
+}
+
 function writeDataToSheet(table, data, append) {
   let sheet = SpreadsheetApp.getActiveSpreadsheet().getSheetByName(table);
   if (!sheet) {
@@ -1023,6 +1329,11 @@ function fetchData(selectedTables) {
 
     SpreadsheetApp.getActiveSpreadsheet().toast('Auto-refreshing ' + table + '...');
 
+    if (countTableRows(url, table) > ASYNC_ROW_THRESHOLD) {
+        fetchTableViaJob(url, table, fields);
+        return;
+    }
+
     while (hasMore) {
          const data = fetchTableDataFromOdoo(url, table, fields, BATCH_SIZE, offset);
 
@@ -1093,6 +1404,8 @@ function exportDataWithColumns(sheetsAndColumns) {
 
     const totalRows = fullData.length - 1;
     let processedCount = 0;
+    const useJobs = totalRows > ASYNC_ROW_THRESHOLD;
+    const jobIds = [];
 
     SpreadsheetApp.getActiveSpreadsheet().toast('Exporting ' + sheetName + ': 0/' + totalRows);
     for (let i = 1; i < fullData.length; i += BATCH_SIZE) {
@@ -1115,6 +1428,18 @@ function exportDataWithColumns(sheetsAndColumns) {
             filteredData.push(newRow);
         });
 
+        if (useJobs) {
+          const job = startSheetJob(url, {operation: 'sheet_to_odoo', table: sheetName, data: filteredData});
+          if (job && job.job_id) {
+            jobIds.push(job.job_id);
+            SpreadsheetApp.getActiveSpreadsheet().toast('Queued ' + sheetName + ' rows ' + i + '-' + (end - 1) + ' (job ' + job.job_id + ')');
+          } else {
+            console.error('Failed to queue batch ' + i + ': ' + (job && job.error));
+            SpreadsheetApp.getActiveSpreadsheet().toast('Failed batch ' + i + '-' + end);
+          }
+          continue;
+        }
+
         const payload = {
           table: sheetName,
           data: filteredData
@@ -1130,7 +1455,7 @@ function exportDataWithColumns(sheetsAndColumns) {
           payload: JSON.stringify(payload)
         };
         try {
-          const response = UrlFetchApp.fetch(url + '/send_data', options);
+          const response = fetchWithBackoff(url + '/send_data', options);
           const responseCode = response.getResponseCode();
           if (responseCode !== 200) {
               const resText = response.getContentText();
@@ -1145,6 +1470,10 @@ function exportDataWithColumns(sheetsAndColumns) {
           console.error(error);
         }
     }
+    if (useJobs) {
+      pollImportJobs(url, {operation: 'import', table: sheetName, jobIds: jobIds}, Date.now());
+      return;
+    }
     SpreadsheetApp.getActiveSpreadsheet().toast('Export Completed for ' + sheetName);
   });
 }
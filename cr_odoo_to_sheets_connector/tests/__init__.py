@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+
+from . import test_sheet_export
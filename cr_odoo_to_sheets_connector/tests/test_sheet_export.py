@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies
+
+from odoo.tests import TransactionCase, tagged
+from odoo.addons.cr_odoo_to_sheets_connector.models import sheet_controller
+
+
+@tagged("post_install", "-at_install")
+class TestSheetExport(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.controller = sheet_controller.OdooDataController()
+        cls.country = cls.env.ref("base.be")
+        cls.company = cls.env["res.partner"].create(
+            {"name": "Sheets Export Company", "is_company": True}
+        )
+        cls.contact = cls.env["res.partner"].create(
+            {
+                "name": "Sheets Export Contact",
+                "parent_id": cls.company.id,
+                "country_id": cls.country.id,
+            }
+        )
+
+    def setUp(self):
+        super().setUp()
+        sheet_controller._display_name_cache.clear()
+        self.env.flush_all()
+
+    def test_many2one_display_name(self):
+        """Many2one columns are exported as "ID:Name" with the comodel's display name."""
+        rows = self.controller._fetch_optimized_data(
+            "res.partner",
+            ["id", "country_id", "parent_id"],
+            limit=100000,
+            offset=0,
+            initiated_at=None,
+            lang="en_US",
+            env=self.env,
+        )
+        row = next(row for row in rows if row["id"] == self.contact.id)
+        # res.country keeps the default display name: read from its name column
+        self.assertEqual(row["country_id"], f"{self.country.id}:{self.country.name}")
+        # res.partner computes its display name: resolved through the ORM
+        self.assertEqual(
+            row["parent_id"], f"{self.company.id}:{self.company.display_name}"
+        )
+
+    def test_get_model_rec_name(self):
+        """The rec_name helper returns the model's _rec_name, 'name' by default."""
+        self.assertEqual(
+            self.controller._get_model_rec_name("res.country", env=self.env), "name"
+        )
@@ -83,6 +83,7 @@
         "views/hr_employee.xml",
         "views/biometric_dashboard_view.xml",
         "views/menu.xml",
+        "views/biometric_job_views.xml",
         "views/res_users_view.xml",
         "wizard/biometric_enroll_wizard_view.xml",
         "wizard/biometric_user_transfer_wizard_view.xml",
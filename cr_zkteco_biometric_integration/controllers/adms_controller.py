@@ -4,10 +4,12 @@
 import logging
 import pytz
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from odoo import http, fields
 from odoo.http import request
 
+from ..models import biometric_device_registry
+
 # try:
 #     from zk import ZK
 #     HAS_PYZK = True
@@ -48,14 +50,10 @@ class AdmsController(http.Controller):
                 comm_key = str(v).strip()
                 break
 
-        _logger.info("ADMS: Heartbeat (GET) from SN=%s. Params: %s", serial, kwargs)
+        _logger.debug("ADMS: Heartbeat (GET) from SN=%s. Params: %s", serial, kwargs)
 
-        device = (
-            request.env["biometric.device"]
-            .sudo()
-            .search([("serial_number", "=", serial)], limit=1)
-        )
-        if not device:
+        info = self._get_adms_device(serial)
+        if not info:
             _logger.info("ADMS: New device discovered via heartbeat SN=%s. Auto-creating...", serial)
             device = (
                 request.env["biometric.device"]
@@ -73,11 +71,11 @@ class AdmsController(http.Controller):
             device._notify_admin(notification_type="discovered")
             return request.make_response("OK", headers=[("Content-Type", "text/plain")])
 
-        if device.password and device.communication_key != comm_key:
+        if info.password and info.communication_key != comm_key:
             _logger.warning(
                 "ADMS: Key Mismatch for SN=%s. Expected: '%s', Received: '%s'",
                 serial,
-                device.communication_key,
+                info.communication_key,
                 comm_key,
             )
             return request.make_response(
@@ -86,33 +84,32 @@ class AdmsController(http.Controller):
                 status=403,
             )
 
-        # Notify if device was offline (> 10 mins) and just came back
-        if device.last_seen:
-            from datetime import datetime, timedelta
-
-            if (datetime.now() - device.last_seen) > timedelta(minutes=10):
+        # Notify if device was offline (> 10 mins) and just came back; the row
+        # is only read when this process has no recent heartbeat of the device
+        device = request.env["biometric.device"].sudo().browse(info.id)
+        last_seen = biometric_device_registry.get_last_seen(request.env.cr.dbname, info.id)
+        if not last_seen or (datetime.now() - last_seen) > timedelta(minutes=10):
+            last_seen = biometric_device_registry.get_last_seen(
+                request.env.cr.dbname, info.id, device.last_seen
+            )
+            if not last_seen or (datetime.now() - last_seen) > timedelta(minutes=10):
+                # Back after a while, or first time seeing a discovered device heartbeat
                 device._notify_admin(notification_type="online")
-        elif not device.last_seen:
-            # First time seeing a discovered device heartbeat
-            device._notify_admin(notification_type="online")
+        device._adms_touch()
 
-        # Check for pending commands for this device
-        # Fetch the oldest pending commands (Batch of 5 to speed up processing)
+        # Claim the next batch of queued commands for this device (marked
+        # 'sent' until the device acknowledges them through devicecmd)
         commands = (
             request.env["biometric.device.command"]
             .sudo()
-            .search(
-                [("device_id", "=", device.id), ("status", "=", "pending")],
-                order="id asc",
-                limit=5,
-            )
+            ._dispatch(info.id, info.heartbeat_delay)
         )
 
         if commands:
             # Build multi-line response: C:ID:COMMAND
             resp_lines = []
-            for cmd in commands:
-                resp_lines.append("C:%s:%s" % (cmd.id, cmd.command_text))
+            for cmd_id, command_text in commands:
+                resp_lines.append("C:%s:%s" % (cmd_id, command_text))
 
             resp_body = "\n".join(resp_lines)
             _logger.info("ADMS: Sending command to device SN=%s: %s", serial, resp_body)
@@ -145,16 +142,12 @@ class AdmsController(http.Controller):
         raw_body = request.httprequest.get_data(as_text=True) or ""
         _logger.info("ADMS: Command result from SN=%s. Params: %s", serial, kwargs)
 
-        device = (
-            request.env["biometric.device"]
-            .sudo()
-            .search([("serial_number", "=", serial)], limit=1)
-        )
-        if device and device.password and device.communication_key != comm_key:
+        info = self._get_adms_device(serial)
+        if info and info.password and info.communication_key != comm_key:
             _logger.warning(
                 "ADMS: Key Mismatch in devicecmd for SN=%s. Expected: '%s', Received: '%s'",
                 serial,
-                device.communication_key,
+                info.communication_key,
                 comm_key,
             )
             return request.make_response(
@@ -166,6 +159,7 @@ class AdmsController(http.Controller):
         # Split by newline in case the device returns results for multiple commands at once
         lines = [line.strip() for line in raw_body.split("\n") if line.strip()]
 
+        results = []
         for line in lines:
             params = {}
             for part in line.split("&"):
@@ -178,27 +172,19 @@ class AdmsController(http.Controller):
 
             if cmd_id:
                 try:
-                    command = (
-                        request.env["biometric.device.command"]
-                        .sudo()
-                        .browse(int(cmd_id))
-                    )
-                    if command.exists():
-                        # Return code 0 usually means success in ADMS
-                        # Return=0: command success (fingerprint enrolled)
-                        # Return=2: face enrolled successfully (ZKTeco sends 2 for face via ENROLL_FP FID=111)
-                        status = "success" if return_code in ("0", "2") else "failed"
-                        command.write(
-                            {
-                                "status": status,
-                                "response_text": line,
-                            }
-                        )
-                except Exception as e:
+                    # Return code 0 usually means success in ADMS
+                    # Return=0: command success (fingerprint enrolled)
+                    # Return=2: face enrolled successfully (ZKTeco sends 2 for face via ENROLL_FP FID=111)
+                    status = "success" if return_code in ("0", "2") else "failed"
+                    results.append((int(cmd_id), status, line))
+                except ValueError as e:
                     _logger.error(
                         "ADMS: Error processing devicecmd for SN=%s: %s", serial, e
                     )
 
+        if info and results:
+            request.env["biometric.device.command"].sudo()._acknowledge(info.id, results)
+
         return request.make_response("OK", headers=[("Content-Type", "text/plain")])
 
     # ---------------------------------------------------------
@@ -240,14 +226,10 @@ class AdmsController(http.Controller):
                     "ERROR", headers=[("Content-Type", "text/plain")]
                 )
 
-            device = (
-                request.env["biometric.device"]
-                .sudo()
-                .search([("serial_number", "=", serial)], limit=1)
-            )
+            info = self._get_adms_device(serial)
 
             # Auto-discovery: Create device if it doesn't exist
-            if not device:
+            if not info:
                 _logger.info(
                     "ADMS: New device discovered SN=%s. Auto-creating...", serial
                 )
@@ -267,7 +249,7 @@ class AdmsController(http.Controller):
                 # Notify admin about new discovery
                 device._notify_admin(notification_type="discovered")
 
-            if not device or device.state != "confirmed":
+            if not info or info.state != "confirmed":
                 _logger.warning(
                     "ADMS: Device SN=%s is pending approval or unknown", serial
                 )
@@ -276,7 +258,7 @@ class AdmsController(http.Controller):
                     headers=[("Content-Type", "text/plain")],
                 )
 
-            device.sudo().write({"last_seen": fields.Datetime.now()})
+            request.env["biometric.device"].sudo().browse(info.id)._adms_touch()
 
             body = (
                 "\n".join(
@@ -285,8 +267,8 @@ class AdmsController(http.Controller):
                         "ATTLOGStamp=0",
                         "OPERLOGStamp=0",
                         "ATTPHOTOStamp=0",
-                        f"ErrorDelay={device.heartbeat_delay * 2}",
-                        f"Delay={device.heartbeat_delay}",
+                        f"ErrorDelay={info.heartbeat_delay * 2}",
+                        f"Delay={info.heartbeat_delay}",
                         "TransTimes=00:00;14:05",
                         "TransInterval=1",
                         "TransFlag=TransData AttLog OpLog AttPhoto Photo",
@@ -302,14 +284,10 @@ class AdmsController(http.Controller):
         # ── POST: Attendance push ─────────────────────────────────────────────
         # print("adms post hit")
 
-        device = (
-            request.env["biometric.device"]
-            .sudo()
-            .search([("serial_number", "=", serial)], limit=1)
-        )
+        info = self._get_adms_device(serial)
 
         # Auto-discovery also handles POST if handshake was skipped
-        if not device:
+        if not info:
             _logger.info(
                 "ADMS: New device discovered via POST SN=%s. Auto-creating...", serial
             )
@@ -329,7 +307,7 @@ class AdmsController(http.Controller):
             # Notify admin about new discovery
             device._notify_admin(notification_type="discovered")
 
-        if not device or device.state != "confirmed":
+        if not info or info.state != "confirmed":
             _logger.warning("ADMS: Device SN=%s is pending approval or unknown", serial)
             return request.make_response(
                 "ERROR: Device pending approval",
@@ -337,12 +315,13 @@ class AdmsController(http.Controller):
                 status=403,
             )
 
-        if device.password and device.communication_key != comm_key:
+        if info.password and info.communication_key != comm_key:
             return request.make_response(
                 "ERROR: Invalid communication key",
                 headers=[("Content-Type", "text/plain")],
                 status=403,
             )
+        device = request.env["biometric.device"].sudo().browse(info.id)
 
         table_upper = table.upper()
         raw_body = request.httprequest.data.decode("utf-8")
@@ -359,8 +338,11 @@ class AdmsController(http.Controller):
             _logger.info(
                 "ADMS: Processing %d ATTLOG line(s) from SN=%s", len(lines), serial
             )
-            for line in lines:
-                self._process_attlog_line(device, line)
+            Log = request.env["biometric.attendance.log"].sudo()
+            # Only store the punches here: the log worker applies them to
+            # hr.attendance once the device has its answer
+            if Log._ingest_attlog_lines(device, lines):
+                Log._trigger_log_processing()
 
             # Automatic Post-Sync Cleanup
             if device.auto_clear_log:
@@ -420,7 +402,7 @@ class AdmsController(http.Controller):
                 raw_body[:100],
             )
 
-        device.sudo().write({"last_seen": fields.Datetime.now()})
+        device._adms_touch()
         return request.make_response("OK", headers=[("Content-Type", "text/plain")])
 
     @http.route(
@@ -452,16 +434,12 @@ class AdmsController(http.Controller):
             kwargs,
         )
 
-        device = (
-            request.env["biometric.device"]
-            .sudo()
-            .search([("serial_number", "=", serial)], limit=1)
-        )
-        if device and device.password and device.communication_key != comm_key:
+        info = self._get_adms_device(serial)
+        if info and info.password and info.communication_key != comm_key:
             _logger.warning(
                 "ADMS: Key Mismatch in fdata for SN=%s. Expected: '%s', Received: '%s'",
                 serial,
-                device.communication_key,
+                info.communication_key,
                 comm_key,
             )
             return request.make_response(
@@ -759,186 +737,20 @@ class AdmsController(http.Controller):
     #     thread.start()
 
     # -------------------------------------------------------------------------
-    # Attendance Processing
+    # Device Registry
     # -------------------------------------------------------------------------
 
-    def _process_attendance(self, device, employee, utc_dt, punch_type):
-        """
-        Create or update an ``hr.attendance`` record based on the explicit
-        punch type reported by the ZKTeco device.
-
-        Punch type mapping (from ATTLOG status field):
-            ``"in"``  — status 0 (Check In) or 4 (Overtime In)
-            ``"out"`` — status 1 (Check Out) or 5 (Overtime Out)
-
-        Rules:
-            - ``"in"``  → always creates a new ``check_in`` record.
-            - ``"out"`` → finds the most-recent open record (``check_out`` is
-              False) and sets its ``check_out``.
-              If no open record exists the punch is invalid: voice index 4
-              ("Please try again") is played on the device asynchronously and
-              the method returns ``False`` to signal the caller to skip saving.
-
-        Args:
-            device (biometric.device): The device record (used for voice playback).
-            employee (hr.employee): The employee record.
-            utc_dt (datetime): UTC-naive punch datetime.
-            punch_type (str): ``"in"`` or ``"out"``.
-
-        Returns:
-            bool: ``True`` if an attendance record was written, ``False`` if the
-            punch was invalid and was deliberately skipped.
-        """
-        return employee._process_biometric_punch(device, utc_dt, punch_type)
-
-    def _process_attlog_line(self, device, line):
+    def _get_adms_device(self, serial):
         """
-        Parse a single tab-separated ATTLOG line, resolve the punch type from
-        the status field, and create both the raw attendance log and the
-        ``hr.attendance`` record.
-
-        ATTLOG line format (tab-separated, 0-indexed):
-            [0] user_id   [1] timestamp   [2] verify   [3] status
-            [4] work_code [5..] reserved
-
-        Status codes handled:
-            0  = Check In      → punch_type ``"in"``
-            1  = Check Out     → punch_type ``"out"``
-            4  = Overtime In   → punch_type ``"in"``
-            5  = Overtime Out  → punch_type ``"out"``
-            other             → logged and skipped (no ``hr.attendance`` record)
-
-        Args:
-            device (biometric.device): The device record that sent this line.
-            line (str): One raw ATTLOG line string.
+        Cached registry entry (``AdmsDevice``: id, state, password,
+        communication_key, heartbeat_delay) of the device sending ``serial``,
+        or None when the device is unknown.
         """
-        # Status code → punch_type mapping
-        PUNCH_TYPE_MAP = {
-            0: "in",  # Check In
-            1: "out",  # Check Out
-            4: "in",  # Overtime In
-            5: "out",  # Overtime Out
-        }
-
-        parts = line.split("\t")
-        if len(parts) < 2:
-            _logger.warning("ADMS: Malformed ATTLOG line (too few fields): %r", line)
-            return
-
-        device_user_id = parts[0].strip()
-        ts_str = parts[1].strip()
-        verify_state = parts[2].strip() if len(parts) > 2 else ""
-        verify_mode = parts[3].strip() if len(parts) > 3 else ""
-
-        if not device_user_id or not ts_str:
-            _logger.warning("ADMS: Empty user_id or timestamp in line: %r", line)
-            return
-
-        # Resolve punch type from status code
-        try:
-            status_code = int(verify_state)
-        except (ValueError, TypeError):
-            status_code = -1
-
-        punch_type = PUNCH_TYPE_MAP.get(status_code)
-
-        # Get or auto-create employee (needed for 'both' logic)
-        employee = self._get_or_create_employee(device, device_user_id)
-
-        # Override punch type based on device settings
-        if device.used_for == "in":
-            punch_type = "in"
-            verify_state = "0"  # Force Check-in code in logs
-        elif device.used_for == "out":
-            punch_type = "out"
-            verify_state = "1"  # Force Check-out code in logs
-        elif device.used_for == "both" and not device.status_code_based:
-            # If not status code based, we guess: In if no open attendance, Out otherwise
-            open_attendance = (
-                request.env["hr.attendance"]
-                .sudo()
-                .search(
-                    [
-                        ("employee_id", "=", employee.id),
-                        ("check_out", "=", False),
-                    ],
-                    limit=1,
-                )
-            )
-            punch_type = "out" if open_attendance else "in"
-            verify_state = "1" if open_attendance else "0"
+        return request.env["biometric.device"].sudo()._adms_device_info(serial)
 
-        if punch_type is None:
-            _logger.info(
-                "ADMS: Unsupported punch status=%r for device_user_id=%s — "
-                "attendance record will not be created",
-                status_code,
-                device_user_id,
-            )
-
-        # Convert timestamp to UTC
-        utc_dt = self._parse_attlog_timestamp(ts_str, device.timezone)
-        if not utc_dt:
-            return
-
-        # Build unique key for deduplication
-        utc_ts_str = fields.Datetime.to_string(utc_dt)
-        unique_key = f"{device.serial_number}_{device_user_id}_{utc_ts_str}"
-
-        # Skip duplicates
-        Log = request.env["biometric.attendance.log"].sudo()
-        if Log.search([("unique_key", "=", unique_key)], limit=1):
-            _logger.debug("ADMS: Duplicate punch skipped — unique_key=%s", unique_key)
-            return
-
-        # Get or auto-create employee
-        employee = self._get_or_create_employee(device, device_user_id)
-
-        # Create raw attendance log
-        try:
-            Log.create(
-                {
-                    "device_id": device.id,
-                    "device_user_id": device_user_id,
-                    "employee_id": employee.id,
-                    "timestamp": utc_dt,
-                    "verify_state": verify_state,
-                    "raw_data": line,
-                    "unique_key": unique_key,
-                    "status": "new",
-                }
-            )
-            _logger.info(
-                "ADMS: Created attendance log for unique_key=%s employee=%s",
-                unique_key,
-                employee.name,
-            )
-        except Exception as e:
-            _logger.error(
-                "ADMS: Failed to create attendance log for unique_key=%s: %s",
-                unique_key,
-                e,
-            )
-            return
-
-        # Skip hr.attendance processing for unsupported status codes
-        if punch_type is None:
-            Log.search([("unique_key", "=", unique_key)]).write({"status": "processed"})
-            return
-
-        # Process hr.attendance record
-        try:
-            success = self._process_attendance(device, employee, utc_dt, punch_type)
-            log_status = "processed" if success else "failed"
-            Log.search([("unique_key", "=", unique_key)]).write({"status": log_status})
-        except Exception as e:
-            _logger.error(
-                "ADMS: Failed to process hr.attendance for employee=%s unique_key=%s: %s",
-                employee.name,
-                unique_key,
-                e,
-            )
-            Log.search([("unique_key", "=", unique_key)]).write({"status": "failed"})
+    # -------------------------------------------------------------------------
+    # User / Template Processing
+    # -------------------------------------------------------------------------
 
     def _process_user_data(self, device, raw_body):
         """
@@ -10,3 +10,6 @@ from . import biometric_device_command
 from . import biometric_user_template
 from . import hr_attendance_extend
 from . import res_users
+from . import biometric_job
+from . import resource_calendar
+from . import hr_leave
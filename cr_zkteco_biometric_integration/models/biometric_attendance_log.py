@@ -1,11 +1,32 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
 
+import collections
 import logging
+import threading
+from datetime import datetime
+
+import psycopg2
+import pytz
+from psycopg2.extras import execute_values
+
 from odoo import models, fields, api
 
 _logger = logging.getLogger(__name__)
 
+# ATTLOG status code → punch type (0/1 Check In/Out, 4/5 Overtime In/Out)
+ATTLOG_PUNCH_TYPES = {
+    "0": "in",
+    "1": "out",
+    "4": "in",
+    "5": "out",
+}
+
+# Employees whose logs are applied concurrently by the log worker
+LOG_WORKER_THREADS = 4
+# Advisory lock namespace serializing the log processing of an employee
+LOG_WORKER_LOCK = 74301
+
 
 class BiometricAttendanceLog(models.Model):
     """
@@ -113,14 +134,15 @@ class BiometricAttendanceLog(models.Model):
         Link the log to an hr.employee by matching `device_user_id`
         against `hr.employee.device_user_id`.
         """
+        device_user_ids = {uid for uid in self.mapped("device_user_id") if uid}
+        employees = {}
+        if device_user_ids:
+            for employee in self.env["hr.employee"].search(
+                [("device_user_id", "in", list(device_user_ids))]
+            ):
+                employees.setdefault(employee.device_user_id, employee.id)
         for record in self:
-            if record.device_user_id:
-                employee = self.env["hr.employee"].search(
-                    [("device_user_id", "=", record.device_user_id)], limit=1
-                )
-                record.employee_id = employee.id if employee else False
-            else:
-                record.employee_id = False
+            record.employee_id = employees.get(record.device_user_id, False)
 
     @api.depends("device_id.serial_number", "device_user_id", "timestamp")
     def _compute_unique_key(self):
@@ -134,6 +156,197 @@ class BiometricAttendanceLog(models.Model):
             ts = fields.Datetime.to_string(record.timestamp) if record.timestamp else ""
             record.unique_key = f"{serial}_{uid}_{ts}"
 
+    # -------------------------------------------------------------------------
+    # Bulk ingestion
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _ingest_attlog_lines(self, device, lines):
+        """
+        Store the punches of an ADMS ATTLOG payload in bulk.
+
+        ATTLOG line format (tab-separated, 0-indexed):
+            [0] user_id   [1] timestamp   [2] status   [3] verify
+            [4] work_code [5..] reserved
+
+        Lines are parsed and converted to UTC first, duplicates are dropped
+        against the payload itself and the stored ``unique_key``s, employees
+        of all PINs are resolved (or created) at once and the new logs are
+        inserted with a single ``INSERT ... ON CONFLICT DO NOTHING``.
+
+        Args:
+            device (biometric.device): The device that sent the payload.
+            lines (list[str]): Non-empty raw ATTLOG lines.
+
+        Returns:
+            biometric.attendance.log: The logs created, in status ``new``.
+        """
+        device_tz = pytz.timezone(device.timezone or "UTC")
+        serial = (device.serial_number or "").strip()
+        guess_punch = device.used_for == "both" and not device.status_code_based
+        forced_state = {"in": "0", "out": "1"}.get(device.used_for)
+
+        parsed = {}
+        for line in lines:
+            parts = line.split("\t")
+            if len(parts) < 2:
+                _logger.warning("ADMS: Malformed ATTLOG line (too few fields): %r", line)
+                continue
+            device_user_id = parts[0].strip()
+            ts_str = parts[1].strip()
+            if not device_user_id or not ts_str:
+                _logger.warning("ADMS: Empty user_id or timestamp in line: %r", line)
+                continue
+            try:
+                naive_dt = datetime.strptime(ts_str, "%Y-%m-%d %H:%M:%S")
+            except ValueError as e:
+                _logger.warning("ADMS: Failed to parse timestamp '%s': %s", ts_str, e)
+                continue
+            utc_dt = (
+                device_tz.localize(naive_dt, is_dst=False)
+                .astimezone(pytz.utc)
+                .replace(tzinfo=None)
+            )
+
+            verify_state = parts[2].strip() if len(parts) > 2 else ""
+            if forced_state:
+                verify_state = forced_state
+            elif guess_punch:
+                # Decided when the punch is applied, from the open attendance
+                verify_state = None
+            elif verify_state not in ATTLOG_PUNCH_TYPES:
+                _logger.info(
+                    "ADMS: Unsupported punch status=%r for device_user_id=%s — skipped",
+                    verify_state,
+                    device_user_id,
+                )
+                continue
+
+            unique_key = "%s_%s_%s" % (
+                serial,
+                device_user_id,
+                fields.Datetime.to_string(utc_dt),
+            )
+            parsed.setdefault(unique_key, (device_user_id, utc_dt, verify_state, line))
+
+        if parsed:
+            self.env.cr.execute(
+                "SELECT unique_key FROM biometric_attendance_log WHERE unique_key IN %s",
+                (tuple(parsed),),
+            )
+            for (unique_key,) in self.env.cr.fetchall():
+                del parsed[unique_key]
+        if not parsed:
+            return self.browse()
+
+        employees = self.env["hr.employee"]._get_or_create_biometric_employees(
+            device, {values[0] for values in parsed.values()}
+        )
+        now = fields.Datetime.now()
+        rows = execute_values(
+            self.env.cr._obj,
+            """
+            INSERT INTO biometric_attendance_log
+                (device_id, device_user_id, employee_id, timestamp, verify_state,
+                 raw_data, unique_key, status, create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT (unique_key) DO NOTHING
+            RETURNING id
+            """,
+            [
+                (
+                    device.id,
+                    device_user_id,
+                    employees[device_user_id].id,
+                    utc_dt,
+                    verify_state,
+                    line,
+                    unique_key,
+                    "new",
+                    self.env.uid,
+                    now,
+                    self.env.uid,
+                    now,
+                )
+                for unique_key, (device_user_id, utc_dt, verify_state, line) in parsed.items()
+            ],
+            page_size=1000,
+            fetch=True,
+        )
+        logs = self.browse([row[0] for row in rows])
+        _logger.info(
+            "ADMS: Stored %d new attendance log(s) out of %d line(s) from SN=%s",
+            len(logs),
+            len(lines),
+            device.serial_number,
+        )
+        return logs
+
+    def _apply_punches(self):
+        """
+        Apply these logs to ``hr.attendance``, per employee in timestamp order,
+        then record their outcome with one write per status.
+
+        The punch type comes from the device mode or the log's status code;
+        on devices guessing it, a punch is a check-out when the employee has
+        an open attendance at that point of the sequence, a check-in otherwise.
+        """
+        logs = self.filtered("employee_id").sorted(
+            lambda log: (log.employee_id.id, log.timestamp, log.id)
+        )
+        if not logs:
+            return
+        open_employee_ids = {
+            employee.id
+            for [employee] in self.env["hr.attendance"].sudo()._read_group(
+                [("employee_id", "in", logs.employee_id.ids), ("check_out", "=", False)],
+                ["employee_id"],
+            )
+        }
+
+        outcome = {"processed": [], "failed": []}
+        guessed_states = {"0": [], "1": []}
+        for log in logs:
+            device = log.device_id
+            employee = log.employee_id
+            if device.used_for in ("in", "out"):
+                punch_type = device.used_for
+            elif log.verify_state:
+                punch_type = ATTLOG_PUNCH_TYPES.get(log.verify_state)
+            else:
+                punch_type = "out" if employee.id in open_employee_ids else "in"
+                guessed_states["0" if punch_type == "in" else "1"].append(log.id)
+            if not punch_type:
+                outcome["processed"].append(log.id)
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    success = employee._process_biometric_punch(device, log.timestamp, punch_type)
+            except psycopg2.OperationalError:
+                # Transient (lock, serialization): leave the logs 'new' for a retry
+                raise
+            except Exception as e:
+                _logger.error(
+                    "ADMS: Failed to process hr.attendance for employee=%s unique_key=%s: %s",
+                    employee.name,
+                    log.unique_key,
+                    e,
+                )
+                success = False
+            if success:
+                if punch_type == "in":
+                    open_employee_ids.add(employee.id)
+                else:
+                    open_employee_ids.discard(employee.id)
+            outcome["processed" if success else "failed"].append(log.id)
+
+        for verify_state, log_ids in guessed_states.items():
+            if log_ids:
+                self.browse(log_ids).write({"verify_state": verify_state})
+        for status, log_ids in outcome.items():
+            if log_ids:
+                self.browse(log_ids).write({"status": status})
+
     def action_process_punch(self):
         """
         Manually trigger the processing logic for this specific log.
@@ -181,79 +394,107 @@ class BiometricAttendanceLog(models.Model):
         else:
             self.status = "failed"
 
-    def action_process_logs(self):
-        """
-        Scheduled action to process 'new' logs.
-        """
-        # Find all devices that have real-time disabled or just process all 'new' logs
-        # To be safe and respect the user's choice, we only process 'new' logs from
-        # devices where real-time is disabled.
-        batch_devices = self.env["biometric.device"].search([("active", "=", True)])
-
-        # We filter logs that are 'new' and have an employee linked
-        new_logs = self.search(
-            [
-                ("status", "=", "new"),
-                ("device_id", "in", batch_devices.ids),
-                ("employee_id", "!=", False),
-            ],
-            order="timestamp asc",
+    @api.model
+    def _trigger_log_processing(self):
+        """Wake the log worker up to apply freshly ingested punches."""
+        cron = self.env.ref(
+            "cr_zkteco_biometric_integration.ir_cron_process_biometric_logs",
+            raise_if_not_found=False,
         )
+        if cron:
+            cron.sudo()._trigger()
 
-        # Mapping verify_state to punch type
-        PUNCH_TYPE_MAP = {
-            "0": "in",
-            "4": "in",
-            "1": "out",
-            "5": "out",
-        }
+    def action_process_logs(self):
+        """
+        Scheduled action (log worker) applying the 'new' logs of active devices.
 
-        for log in new_logs:
-            device = log.device_id
-            punch_type = False
-
-            if device.used_for == "in":
-                punch_type = "in"
-            elif device.used_for == "out":
-                punch_type = "out"
-            elif device.used_for == "both" and not device.status_code_based:
-                # If not status code based, we guess: In if no open attendance, Out otherwise
-                open_att = self.env["hr.attendance"].search(
-                    [
-                        ("employee_id", "=", log.employee_id.id),
-                        ("check_out", "=", False),
-                    ],
-                    limit=1,
+        Employees are independent from one another, so they are handled by
+        ``LOG_WORKER_THREADS`` threads, each employee in its own transaction;
+        the punches of one employee are applied in timestamp order. A log and
+        the attendance change it causes are committed together, so a crashed
+        or concurrent run never applies a punch twice: its logs simply stay
+        'new' and are picked up by the next run.
+        """
+        employee_ids = [
+            employee.id
+            for [employee] in self._read_group(
+                [
+                    ("status", "=", "new"),
+                    ("employee_id", "!=", False),
+                    ("device_id.active", "=", True),
+                ],
+                ["employee_id"],
+            )
+        ]
+        if employee_ids:
+            pending = collections.deque(employee_ids)
+            dbname, uid, context = self.env.cr.dbname, self.env.uid, self.env.context
+            threads = [
+                threading.Thread(
+                    target=self._log_worker_thread,
+                    args=(dbname, uid, context, pending),
+                    name="biometric.log.worker.%d" % index,
+                    daemon=True,
                 )
-                punch_type = "out" if open_att else "in"
-            else:
-                punch_type = PUNCH_TYPE_MAP.get(log.verify_state)
-                if not punch_type:
-                    # Logic to guess: In if no open attendance, Out otherwise
-                    open_att = self.env["hr.attendance"].search(
-                        [
-                            ("employee_id", "=", log.employee_id.id),
-                            ("check_out", "=", False),
-                        ],
-                        limit=1,
-                    )
-                    punch_type = "out" if open_att else "in"
-
-            # Update log's verify_state to reflect what was actually considered
-            # 0=In, 1=Out
-            new_verify_state = "0" if punch_type == "in" else "1"
-            if log.verify_state != new_verify_state:
-                log.verify_state = new_verify_state
-
-            success = log.employee_id._process_biometric_punch(
-                log.device_id, log.timestamp, punch_type
+                for index in range(min(LOG_WORKER_THREADS, len(employee_ids)))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            _logger.info(
+                "ADMS: Log worker processed new logs of %d employee(s)", len(employee_ids)
             )
-            if success:
-                log.write({"status": "processed"})
-            else:
-                # It might fail if it's a duplicate or within interval
-                # We mark as processed so we don't try again forever, but we can log it
-                log.write({"status": "processed"})
 
         # After processing all logs, run auto-checkout
         self.env["hr.employee"]._run_biometric_auto_checkout()
+
+    @api.model
+    def _log_worker_thread(self, dbname, uid, context, pending):
+        """Process employees taken from ``pending`` until it is empty."""
+        threading.current_thread().dbname = dbname
+        registry = self.pool
+        while True:
+            try:
+                employee_id = pending.popleft()
+            except IndexError:
+                return
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, context)
+                    env[self._name]._process_employee_logs(employee_id)
+            except psycopg2.OperationalError:
+                _logger.info(
+                    "ADMS: Logs of employee %s locked or changed concurrently, retried next run",
+                    employee_id,
+                )
+            except Exception:
+                _logger.exception("ADMS: Failed to process logs of employee %s", employee_id)
+
+    @api.model
+    def _process_employee_logs(self, employee_id):
+        """
+        Apply the 'new' logs of one employee, holding a transaction-level lock
+        on the employee so concurrent workers never interleave its punches.
+        """
+        self.env.cr.execute(
+            "SELECT pg_try_advisory_xact_lock(%s, %s)", (LOG_WORKER_LOCK, employee_id)
+        )
+        if not self.env.cr.fetchone()[0]:
+            return
+        # Row locks make a run that raced with a committed one fail instead of
+        # re-applying punches already processed
+        self.env.cr.execute(
+            """
+            SELECT log.id
+              FROM biometric_attendance_log log
+              JOIN biometric_device device ON device.id = log.device_id
+             WHERE log.employee_id = %s
+               AND log.status = 'new'
+               AND device.active
+             ORDER BY log.timestamp, log.id
+               FOR UPDATE OF log
+            """,
+            (employee_id,),
+        )
+        self.browse([row[0] for row in self.env.cr.fetchall()])._apply_punches()
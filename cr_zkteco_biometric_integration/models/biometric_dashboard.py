@@ -4,6 +4,8 @@ from odoo import models, api, fields, _
 from datetime import datetime, date, timedelta
 import pytz
 
+from . import biometric_device_registry
+
 
 class BiometricDashboard(models.AbstractModel):
     _name = "biometric.dashboard"
@@ -79,11 +81,14 @@ class BiometricDashboard(models.AbstractModel):
         for dev in devices:
             is_online = False
             last_seen_str = _("Never seen")
-            if dev.last_seen:
+            last_seen = biometric_device_registry.get_last_seen(
+                self.env.cr.dbname, dev.id, dev.last_seen
+            )
+            if last_seen:
                 # If seen in last 10 minutes, consider online
-                if (datetime.now() - dev.last_seen) < timedelta(minutes=10):
+                if (datetime.now() - last_seen) < timedelta(minutes=10):
                     is_online = True
-                last_seen_str = dev.last_seen.strftime("%Y-%m-%d %H:%M:%S")
+                last_seen_str = last_seen.strftime("%Y-%m-%d %H:%M:%S")
 
             device_stats.append(
                 {
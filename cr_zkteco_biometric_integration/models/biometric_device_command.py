@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
 
+from psycopg2.extras import execute_values
+
 from odoo import models, fields, api
+from odoo.tools import sql
+
+# Bounds of the per-device command batch size (biometric.device.command_batch_size)
+COMMAND_BATCH_MIN = 1
+COMMAND_BATCH_MAX = 500
+# A sent command not acknowledged within max(lease, 4 heartbeats) is sent again
+COMMAND_LEASE_MIN = 120
+# Deliveries before an unacknowledged command is given up
+COMMAND_MAX_ATTEMPTS = 3
 
 
 class BiometricDeviceCommand(models.Model):
     """
     Stores commands to be sent to the biometric device via ADMS.
     The device pulls these commands during its heartbeat (getrequest).
+
+    Dispatch queue: ``pending`` commands are claimed in batches by the
+    heartbeat and become ``sent``, until the device acknowledges them through
+    devicecmd (``success`` / ``failed``). A sent command whose lease expires is
+    queued again, up to ``COMMAND_MAX_ATTEMPTS`` deliveries.
     """
 
     _name = "biometric.device.command"
@@ -28,6 +44,7 @@ class BiometricDeviceCommand(models.Model):
     status = fields.Selection(
         selection=[
             ("pending", "Pending"),
+            ("sent", "Sent"),
             ("success", "Success"),
             ("failed", "Failed"),
         ],
@@ -39,10 +56,152 @@ class BiometricDeviceCommand(models.Model):
         string="Device Response",
         readonly=True,
     )
+    sent_at = fields.Datetime(
+        string="Sent At",
+        readonly=True,
+        copy=False,
+        help="When the command was last handed to the device.",
+    )
+    attempts = fields.Integer(
+        string="Attempts",
+        readonly=True,
+        copy=False,
+        help="Number of times the command was handed to the device.",
+    )
+
+    def init(self):
+        # The heartbeat only ever looks for the queued / in-flight commands of one device
+        sql.create_index(
+            self.env.cr,
+            "biometric_device_command_pending_idx",
+            self._table,
+            ["device_id", "id"],
+            where="status = 'pending'",
+        )
+        sql.create_index(
+            self.env.cr,
+            "biometric_device_command_sent_idx",
+            self._table,
+            ["device_id", "sent_at"],
+            where="status = 'sent'",
+        )
 
     def name_get(self):
         return [(rec.id, f"{rec.device_id.name}: {rec.command_text}") for rec in self]
 
+    @api.model
+    def _dispatch(self, device_id, heartbeat_delay):
+        """
+        Claim the next batch of pending commands of a device for a heartbeat.
+
+        Commands whose lease expired are queued again first (or failed after
+        ``COMMAND_MAX_ATTEMPTS``), which also halves the device's batch size:
+        a device that cannot keep up gets smaller batches.
+
+        Args:
+            device_id (int): ID of the polling device.
+            heartbeat_delay (int): Heartbeat interval of the device, in seconds.
+
+        Returns:
+            list[tuple[int, str]]: ``(id, command_text)`` of the claimed commands,
+            oldest first.
+        """
+        cr = self.env.cr
+        lease = max(COMMAND_LEASE_MIN, 4 * (heartbeat_delay or 0))
+        cr.execute(
+            """
+            UPDATE biometric_device_command
+               SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'failed' ELSE 'pending' END,
+                   response_text = CASE WHEN attempts >= %(max_attempts)s
+                                        THEN 'No acknowledgement from the device'
+                                        ELSE response_text END,
+                   write_date = now() AT TIME ZONE 'UTC'
+             WHERE device_id = %(device_id)s
+               AND status = 'sent'
+               AND sent_at < now() AT TIME ZONE 'UTC' - make_interval(secs => %(lease)s)
+            """,
+            {"device_id": device_id, "lease": lease, "max_attempts": COMMAND_MAX_ATTEMPTS},
+        )
+        if cr.rowcount:
+            cr.execute(
+                """
+                UPDATE biometric_device
+                   SET command_batch_size = GREATEST(%s, command_batch_size / 2)
+                 WHERE id = %s
+                """,
+                (COMMAND_BATCH_MIN, device_id),
+            )
+        cr.execute(
+            """
+            UPDATE biometric_device_command command
+               SET status = 'sent',
+                   sent_at = now() AT TIME ZONE 'UTC',
+                   attempts = command.attempts + 1,
+                   write_date = now() AT TIME ZONE 'UTC'
+             WHERE command.id IN (
+                    SELECT id
+                      FROM biometric_device_command
+                     WHERE device_id = %(device_id)s
+                       AND status = 'pending'
+                     ORDER BY id
+                     LIMIT (SELECT GREATEST(%(min)s, LEAST(%(max)s, COALESCE(command_batch_size, %(min)s)))
+                              FROM biometric_device WHERE id = %(device_id)s)
+                       FOR UPDATE SKIP LOCKED
+                   )
+            RETURNING command.id, command.command_text
+            """,
+            {"device_id": device_id, "min": COMMAND_BATCH_MIN, "max": COMMAND_BATCH_MAX},
+        )
+        claimed = sorted(cr.fetchall())
+        self.invalidate_model(["status", "sent_at", "attempts", "response_text"])
+        return claimed
+
+    @api.model
+    def _acknowledge(self, device_id, results):
+        """
+        Record the results reported by a device for its commands.
+
+        A device that acknowledged at least a full batch in time gets its
+        batch size doubled, up to ``COMMAND_BATCH_MAX``.
+
+        Args:
+            device_id (int): ID of the reporting device.
+            results (list[tuple[int, str, str]]): ``(command id, status, response)``
+                with status ``success`` or ``failed``.
+        """
+        if not results:
+            return
+        cr = self.env.cr
+        rows = execute_values(
+            cr._obj,
+            """
+            UPDATE biometric_device_command command
+               SET status = v.status,
+                   response_text = v.response,
+                   write_date = now() AT TIME ZONE 'UTC'
+              FROM (VALUES %s) AS v(id, status, response, device_id)
+             WHERE command.id = v.id
+               AND command.device_id = v.device_id
+            RETURNING command.id
+            """,
+            [(command_id, status, response, device_id) for command_id, status, response in results],
+            template="(%s, %s, %s, %s)",
+            fetch=True,
+        )
+        self.invalidate_model(["status", "response_text"])
+        cr.execute(
+            """
+            UPDATE biometric_device
+               SET command_batch_size = LEAST(%s, command_batch_size * 2)
+             WHERE id = %s
+               AND command_batch_size <= %s
+               AND NOT EXISTS (SELECT 1 FROM biometric_device_command
+                                WHERE device_id = %s AND status = 'sent')
+            """,
+            (COMMAND_BATCH_MAX, device_id, len(rows), device_id),
+        )
+        self.env["biometric.device"].invalidate_model(["command_batch_size"])
+
     @api.model
     def _gc_commands(self):
         """
@@ -1,12 +1,34 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
 
+import collections
 import logging
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
+from . import biometric_device_registry
+from .resource_calendar import (
+    DEVICE_CACHE_SEQUENCE,
+    bump_cache_version,
+    create_cache_sequence,
+    get_cache_version,
+)
+
 _logger = logging.getLogger(__name__)
 
+# What the ADMS endpoints need to know about a device, cached by serial number
+AdmsDevice = collections.namedtuple(
+    "AdmsDevice", ["id", "state", "password", "communication_key", "heartbeat_delay"]
+)
+ADMS_DEVICE_FIELDS = {
+    "serial_number",
+    "active",
+    "state",
+    "password",
+    "communication_key",
+    "heartbeat_delay",
+}
+
 
 class BiometricDevice(models.Model):
     """
@@ -136,14 +158,18 @@ class BiometricDevice(models.Model):
 
     def _compute_connection_status(self):
         """
-        Calculates status based on the last_seen timestamp.
+        Calculates status based on the last_seen timestamp (including the
+        heartbeats not flushed to the database yet).
         If the device has pushed data in the last 2 minutes, it is 'Connected'.
         """
         from datetime import datetime, timedelta
 
         now = datetime.now()
         for record in self:
-            if record.last_seen and (now - record.last_seen) < timedelta(minutes=2):
+            last_seen = biometric_device_registry.get_last_seen(
+                self.env.cr.dbname, record.id, record.last_seen
+            )
+            if last_seen and (now - last_seen) < timedelta(minutes=2):
                 record.connection_status = "connected"
             else:
                 record.connection_status = "not_connected"
@@ -205,6 +231,13 @@ class BiometricDevice(models.Model):
         help="How often the device checks Odoo for new commands. Higher values save server resources but make commands slower to reach the device. "
         "IMPORTANT: After changing this value, you MUST click the 'Push Heartbeat Interval' button to send the update to the device.",
     )
+    command_batch_size = fields.Integer(
+        string="Command Batch Size",
+        default=50,
+        help="Number of queued commands handed to the device per heartbeat. Adjusted automatically: "
+        "doubled (up to 500) when the device acknowledges a full batch in time, halved when it "
+        "leaves a batch unacknowledged.",
+    )
     used_for = fields.Selection(
         [
             ("in", "Check-in Only"),
@@ -281,6 +314,68 @@ class BiometricDevice(models.Model):
         ),
     ]
 
+    # -------------------------------------------------------------------------
+    # ORM Overrides
+    # -------------------------------------------------------------------------
+
+    def init(self):
+        super().init()
+        create_cache_sequence(self.env.cr, DEVICE_CACHE_SEQUENCE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._adms_invalidate_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if not ADMS_DEVICE_FIELDS.isdisjoint(vals):
+            self._adms_invalidate_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._adms_invalidate_cache()
+        return res
+
+    # -------------------------------------------------------------------------
+    # ADMS Registry
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _adms_cache_version(self):
+        return get_cache_version(self.env.cr, DEVICE_CACHE_SEQUENCE)
+
+    @api.model
+    def _adms_invalidate_cache(self):
+        bump_cache_version(self.env.cr, DEVICE_CACHE_SEQUENCE)
+
+    @api.model
+    @tools.ormcache("serial", "self._adms_cache_version()")
+    def _adms_device_info(self, serial):
+        """
+        Registry entry (``AdmsDevice``) of the device with this serial number,
+        or None. Cached per process so ADMS heartbeats do not search the device
+        table; the key holds a version that moves on every write of the fields
+        it holds, leaving the other caches of the registry alone.
+        """
+        device = self.sudo().search([("serial_number", "=", serial)], limit=1)
+        if not device:
+            return None
+        return AdmsDevice(
+            device.id,
+            device.state,
+            device.password,
+            device.communication_key,
+            device.heartbeat_delay,
+        )
+
+    def _adms_touch(self):
+        """Record an ADMS request of this device (coalesced ``last_seen``)."""
+        for device in self:
+            biometric_device_registry.touch(self.env, device.id)
+
     # -------------------------------------------------------------------------
     # Compute Methods
     # -------------------------------------------------------------------------
@@ -572,10 +667,13 @@ class BiometricDevice(models.Model):
                         _logger.info("ADMS Absent Alert Cron: Employee %s skipped — missing resource.resource record.", emp.name)
                     continue
 
-                intervals_dict = calendar._attendance_intervals_batch(day_start, day_end, resources)
-
                 for employee in group_employees:
-                    emp_intervals = intervals_dict.get(employee.resource_id.id, [])
+                    # Shared per calendar/timezone/day by the shift-interval cache
+                    emp_intervals = (
+                        calendar._biometric_intervals(day_start, day_end, employee.resource_id)
+                        if employee.resource_id
+                        else []
+                    )
                     if not emp_intervals:
                         _logger.info("ADMS Absent Alert Cron: Employee %s skipped — no scheduled shift intervals today on calendar '%s'.", employee.name, calendar.name)
                         continue
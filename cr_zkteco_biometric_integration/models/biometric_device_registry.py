@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+"""
+Coalesced ``last_seen`` heartbeats of the ADMS devices.
+
+Every ADMS request used to write ``last_seen`` on the device row, i.e. one
+UPDATE (and a row lock) per device every few seconds. Requests now only record
+the time in this per-process registry; the pending times are written with one
+UPDATE, in a short transaction of their own, at most every
+``LAST_SEEN_FLUSH_INTERVAL`` seconds: by the next request when it comes in
+time, otherwise by a timer thread, and at process exit. Online/offline
+detection combines the stored value with the newer, not yet flushed one.
+
+The device lookups by serial number themselves are cached by
+``biometric.device._adms_device_info``.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from odoo import fields
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Maximum delay before a heartbeat is written to the device row
+LAST_SEEN_FLUSH_INTERVAL = 30
+
+_lock = threading.Lock()
+# dbname → {device id: last request time (UTC)}
+_seen = {}
+# dbname → {device id: last request time not written yet}
+_pending = {}
+# dbname → monotonic time of the last flush
+_last_flush = {}
+# dbname → timer flushing the pending times if no request does it first
+_timers = {}
+
+
+def get_last_seen(dbname, device_id, stored=None):
+    """Most recent request time of a device: ``stored`` or the one in memory."""
+    with _lock:
+        seen = _seen.get(dbname, {}).get(device_id)
+    if seen and stored:
+        return max(seen, stored)
+    return seen or stored
+
+
+def touch(env, device_id):
+    """Record a request of the device now, flushing the pending times when due."""
+    dbname = env.cr.dbname
+    now = fields.Datetime.now()
+    with _lock:
+        _seen.setdefault(dbname, {})[device_id] = now
+        _pending.setdefault(dbname, {})[device_id] = now
+        due = time.monotonic() - _last_flush.get(dbname, 0) >= LAST_SEEN_FLUSH_INTERVAL
+        if due:
+            _last_flush[dbname] = time.monotonic()
+        elif dbname not in _timers:
+            timer = threading.Timer(LAST_SEEN_FLUSH_INTERVAL, _flush_on_timer, (dbname,))
+            timer.daemon = True
+            _timers[dbname] = timer
+            timer.start()
+    if due:
+        flush(env)
+
+
+def flush(env):
+    """Write the pending request times of this process to ``biometric_device``."""
+    if _write_pending(env.registry, env.cr.dbname):
+        env["biometric.device"].invalidate_model(["last_seen"])
+
+
+def _flush_on_timer(dbname):
+    """Timer thread: flush the times no later request has written."""
+    with _lock:
+        _timers.pop(dbname, None)
+        _last_flush[dbname] = time.monotonic()
+    try:
+        _write_pending(Registry(dbname), dbname)
+    except Exception:
+        _logger.exception("ADMS: Failed to flush the last_seen of database %s", dbname)
+
+
+@atexit.register
+def _flush_at_exit():
+    """Do not lose the last heartbeats when a worker stops or is recycled."""
+    with _lock:
+        dbnames = [dbname for dbname, pending in _pending.items() if pending]
+        for timer in _timers.values():
+            timer.cancel()
+        _timers.clear()
+    for dbname in dbnames:
+        try:
+            _write_pending(Registry(dbname), dbname)
+        except Exception:
+            _logger.exception("ADMS: Failed to flush the last_seen of database %s", dbname)
+
+
+def _write_pending(registry, dbname):
+    """Write the pending times of ``dbname``; return whether rows were written."""
+    with _lock:
+        pending = _pending.pop(dbname, None)
+    if not pending:
+        return False
+    rows = sorted(pending.items())
+    try:
+        with registry.cursor() as cr:
+            # Lock in id order so concurrent flushes never deadlock
+            cr.execute(
+                "SELECT id FROM biometric_device WHERE id IN %s ORDER BY id FOR NO KEY UPDATE",
+                (tuple(device_id for device_id, _seen_at in rows),),
+            )
+            execute_values(
+                cr._obj,
+                """
+                UPDATE biometric_device device
+                   SET last_seen = v.seen_at
+                  FROM (VALUES %s) AS v(id, seen_at)
+                 WHERE device.id = v.id
+                   AND (device.last_seen IS NULL OR device.last_seen < v.seen_at)
+                """,
+                rows,
+                template="(%s, %s::timestamp)",
+            )
+    except Exception:
+        _logger.exception("ADMS: Failed to flush the last_seen of %d device(s)", len(rows))
+        with _lock:
+            dirty = _pending.setdefault(dbname, {})
+            for device_id, seen_at in rows:
+                if seen_at > dirty.get(device_id, seen_at.min):
+                    dirty[device_id] = seen_at
+        return False
+    return True
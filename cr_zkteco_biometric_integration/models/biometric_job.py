@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+
+class BiometricJob(models.Model):
+    """
+    Long-running operation (attendance recalculation, reports) executed in the
+    background by the job cron instead of inside the user's HTTP request.
+
+    The model named in ``res_model`` does the work: the cron calls
+    ``env[res_model]._run_biometric_job(job)``, which reads its arguments from
+    ``params``, reports progress with ``job._set_progress`` and returns the
+    result message. The requesting user is notified when the job ends.
+    """
+
+    _name = "biometric.job"
+    _description = "Biometric Background Job"
+    _order = "create_date desc, id desc"
+
+    name = fields.Char(
+        string="Job",
+        required=True,
+        readonly=True,
+    )
+    res_model = fields.Char(
+        string="Model",
+        required=True,
+        readonly=True,
+        help="Technical name of the model implementing _run_biometric_job.",
+    )
+    params = fields.Json(
+        string="Parameters",
+        readonly=True,
+    )
+    user_id = fields.Many2one(
+        comodel_name="res.users",
+        string="Requested By",
+        readonly=True,
+        help="The job runs with the access rights of this user.",
+    )
+    state = fields.Selection(
+        selection=[
+            ("queued", "Queued"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        string="Status",
+        default="queued",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    progress = fields.Float(
+        string="Progress",
+        readonly=True,
+        help="Completion percentage of the job.",
+    )
+    progress_message = fields.Char(
+        string="Current Step",
+        readonly=True,
+    )
+    result_message = fields.Text(
+        string="Result",
+        readonly=True,
+    )
+    date_started = fields.Datetime(
+        string="Started On",
+        readonly=True,
+    )
+    date_done = fields.Datetime(
+        string="Finished On",
+        readonly=True,
+    )
+    attachment_id = fields.Many2one(
+        comodel_name="ir.attachment",
+        string="Result File",
+        readonly=True,
+        help="File produced by the job (e.g. an Excel report).",
+    )
+    file_data = fields.Binary(
+        string="Download",
+        related="attachment_id.datas",
+    )
+    file_name = fields.Char(
+        related="attachment_id.name",
+    )
+
+    # -------------------------------------------------------------------------
+    # Queueing
+    # -------------------------------------------------------------------------
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # A job runs as its requester: always the current user, never a given one
+        for vals in vals_list:
+            vals["user_id"] = self.env.uid
+        return super().create(vals_list)
+
+    def write(self, vals):
+        vals.pop("user_id", None)
+        return super().write(vals)
+
+    @api.model
+    def _enqueue(self, name, res_model, params):
+        """Queue a job and wake the job cron up; returns the job."""
+        job = self.sudo().create(
+            {
+                "name": name,
+                "res_model": res_model,
+                "params": params,
+            }
+        )
+        self.env.ref("cr_zkteco_biometric_integration.ir_cron_run_biometric_jobs").sudo()._trigger()
+        return job
+
+    def _action_notify_queued(self):
+        """Client action telling the user the job was queued, then opening it."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Job Queued"),
+                "message": _(
+                    "%s runs in the background; you will be notified when it is done.",
+                    self.name,
+                ),
+                "sticky": False,
+                "next": {
+                    "type": "ir.actions.act_window",
+                    "res_model": self._name,
+                    "res_id": self.id,
+                    "views": [(False, "form")],
+                    "target": "current",
+                },
+            },
+        }
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def _set_progress(self, progress, message=False):
+        """Record the progress of the running job and commit it (with the work done so far)."""
+        self.ensure_one()
+        self.write({"progress": min(progress, 100.0), "progress_message": message})
+        self.env.cr.commit()
+
+    @api.model
+    def _cron_run_jobs(self):
+        """Scheduled action: run the queued jobs, oldest first."""
+        self._fail_stale_jobs()
+        while True:
+            job = self.sudo().search([("state", "=", "queued")], order="id asc", limit=1)
+            if not job:
+                return
+            job.write(
+                {
+                    "state": "running",
+                    "progress": 0.0,
+                    "date_started": fields.Datetime.now(),
+                }
+            )
+            self.env.cr.commit()
+            try:
+                worker = self.env[job.res_model].with_user(job.user_id)
+                result = worker._run_biometric_job(job)
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Biometric job %s (%s) failed", job.id, job.name)
+                job.write(
+                    {
+                        "state": "failed",
+                        "result_message": str(e),
+                        "date_done": fields.Datetime.now(),
+                    }
+                )
+            else:
+                job.write(
+                    {
+                        "state": "done",
+                        "progress": 100.0,
+                        "progress_message": False,
+                        "result_message": result or False,
+                        "date_done": fields.Datetime.now(),
+                    }
+                )
+            job._notify_user()
+            self.env.cr.commit()
+
+    @api.model
+    def _fail_stale_jobs(self):
+        """
+        Fail the jobs still running after the cron time limit: their worker was
+        killed (time limit, out of memory...) before it could record the outcome.
+        """
+        time_limit = config["limit_time_real_cron"]
+        if not time_limit or time_limit < 0:
+            time_limit = config["limit_time_real"]
+        stale = self.sudo().search(
+            [
+                ("state", "=", "running"),
+                ("date_started", "<", fields.Datetime.now() - timedelta(seconds=time_limit)),
+            ]
+        )
+        if not stale:
+            return
+        _logger.warning("Failing %s interrupted biometric job(s): %s", len(stale), stale.ids)
+        stale.write(
+            {
+                "state": "failed",
+                "result_message": _("The job was interrupted (time limit or server restart)."),
+                "date_done": fields.Datetime.now(),
+            }
+        )
+        stale._notify_user()
+        self.env.cr.commit()
+
+    def _notify_user(self):
+        """Pop a notification up for the user who requested the job."""
+        for job in self:
+            self.env["bus.bus"]._sendone(
+                job.user_id.partner_id,
+                "simple_notification",
+                {
+                    "title": job.name,
+                    "message": job.result_message
+                    or (_("Done.") if job.state == "done" else _("Failed.")),
+                    "type": "success" if job.state == "done" else "danger",
+                    "sticky": job.state == "failed",
+                },
+            )
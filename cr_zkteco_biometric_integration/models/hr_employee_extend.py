@@ -281,6 +281,49 @@ class HrEmployeeExtend(models.Model):
             },
         }
 
+    @api.model
+    def _get_or_create_biometric_employees(self, device, device_user_ids):
+        """
+        Bulk counterpart of the ADMS controller's ``_get_or_create_employee``:
+        return {device_user_id: hr.employee} for all ``device_user_ids``,
+        creating the missing employees (and the commands requesting their
+        details from ``device``) in one go.
+        """
+        Employee = self.sudo()
+        device_user_ids = {uid for uid in device_user_ids if uid}
+        employees = {
+            employee.device_user_id: employee
+            for employee in Employee.search([("device_user_id", "in", list(device_user_ids))])
+        }
+        missing = sorted(device_user_ids - set(employees))
+        if missing:
+            logger.info(
+                "ADMS: Auto-creating %d employee(s) for device_user_ids=%s", len(missing), missing
+            )
+            created = Employee.create(
+                [
+                    {
+                        "name": "Biometric User %s" % device_user_id,
+                        "device_user_id": device_user_id,
+                    }
+                    for device_user_id in missing
+                ]
+            )
+            employees.update({employee.device_user_id: employee for employee in created})
+            # Automatically request full details (Name, Role, Templates) from device
+            self.env["biometric.device.command"].sudo().create(
+                [
+                    {"device_id": device.id, "command_text": command_text % device_user_id}
+                    for device_user_id in missing
+                    for command_text in (
+                        "DATA QUERY UserInfo PIN=%s",
+                        "DATA QUERY FingerTmp PIN=%s",
+                        "DATA QUERY Face PIN=%s",
+                    )
+                ]
+            )
+        return employees
+
     def _process_biometric_punch(self, device, utc_dt, punch_type):
         """
         Processes a single punch for this employee and updates hr.attendance.
@@ -392,9 +435,7 @@ class HrEmployeeExtend(models.Model):
             day_start = local_dt - timedelta(hours=14)
             day_end = local_dt + timedelta(hours=14)
 
-        intervals = calendar._attendance_intervals_batch(
-            day_start, day_end, self.resource_id
-        )[self.resource_id.id]
+        intervals = calendar._biometric_intervals(day_start, day_end, self.resource_id)
         if not intervals:
             return stats
 
@@ -478,9 +519,7 @@ class HrEmployeeExtend(models.Model):
             day_end = tz.localize(datetime.combine(local_date, time.max))
 
         # Get intervals (this handles both standard and global calendars)
-        intervals = calendar._attendance_intervals_batch(
-            day_start, day_end, self.resource_id
-        )[self.resource_id.id]
+        intervals = calendar._biometric_intervals(day_start, day_end, self.resource_id)
 
         if not intervals:
             return utc_dt
@@ -590,9 +629,7 @@ class HrEmployeeExtend(models.Model):
             day_start = tz.localize(datetime.combine(check_in_local.date(), time.min))
             day_end = day_start + timedelta(hours=30)
 
-            intervals = calendar._attendance_intervals_batch(
-                day_start, day_end, employee.resource_id
-            )[employee.resource_id.id]
+            intervals = calendar._biometric_intervals(day_start, day_end, employee.resource_id)
 
             if not intervals:
                 continue
@@ -654,45 +691,32 @@ class HrEmployeeExtend(models.Model):
         ])
         present_ids = set(attendances.mapped("employee_id.id"))
 
-        # 2. Fetch approved leaves today
+        # 2. Fetch approved leaves today (cached per day)
         approved_leaves = set()
         leave_reasons = {}
-        if self.env.registry.get("hr.leave"):
-            leaves = self.env["hr.leave"].sudo().search([
-                ("employee_id", "in", self.ids),
-                ("state", "=", "validate"),
-                ("date_from", "<=", end_utc),
-                ("date_to", ">=", start_utc),
-            ])
-            for leave in leaves:
-                eid = leave.employee_id.id
+        employee_ids = set(self.ids)
+        for eid, reason in self.env["hr.leave"]._biometric_leaves_on(check_date, user_tz.zone):
+            if eid in employee_ids:
                 approved_leaves.add(eid)
-                leave_reasons[eid] = leave.holiday_status_id.name or _("Approved Leave")
+                leave_reasons[eid] = reason
 
-        # 3. Fetch public holidays and scheduled work today per calendar
+        # 3. Fetch public holidays and scheduled work today per calendar (cached)
         calendar_working = {}
         public_holidays = {}
         unique_calendars = self.mapped("resource_calendar_id")
 
+        day_start = user_tz.localize(datetime.combine(check_date, time.min))
+        day_end = user_tz.localize(datetime.combine(check_date, time.max))
         for cal in unique_calendars:
             if not cal:
                 continue
             # Check for public holiday
-            holiday_leaves = self.env["resource.calendar.leaves"].sudo().search([
-                ("calendar_id", "=", cal.id),
-                ("resource_id", "=", False),
-                ("date_from", "<=", datetime.combine(check_date, time.max)),
-                ("date_to", ">=", datetime.combine(check_date, time.min)),
-            ], limit=1)
-            if holiday_leaves:
-                public_holidays[cal.id] = holiday_leaves[0].name or _("Public Holiday")
+            holiday_name = cal._biometric_public_holiday(check_date)
+            if holiday_name is not None:
+                public_holidays[cal.id] = holiday_name or _("Public Holiday")
 
             # Check working day status
-            day_start = user_tz.localize(datetime.combine(check_date, time.min))
-            day_end = user_tz.localize(datetime.combine(check_date, time.max))
-            intervals = cal._attendance_intervals_batch(day_start, day_end)
-            # cal._attendance_intervals_batch returns a dict mapping resource_id -> list of tuples
-            calendar_working[cal.id] = bool(intervals.get(False) or intervals.get(None))
+            calendar_working[cal.id] = bool(cal._biometric_intervals(day_start, day_end))
 
         # 4. Map statuses
         for emp in self:
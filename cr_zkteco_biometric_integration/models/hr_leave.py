@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+
+from datetime import datetime, time
+
+import pytz
+
+from odoo import models, api, tools, _
+
+from .resource_calendar import (
+    LEAVE_CACHE_SEQUENCE,
+    bump_cache_version,
+    create_cache_sequence,
+    get_cache_version,
+)
+
+# Changes that alter the set of employees on leave on a given day
+LEAVE_CACHE_FIELDS = {"state", "date_from", "date_to", "employee_id", "holiday_status_id"}
+
+
+class HrLeave(models.Model):
+    """
+    Extends hr.leave with the cached set of employees on approved leave per
+    day, used by the attendance statuses (alerts, dashboard, reports). The
+    cache keys hold a version that moves whenever a leave is created, removed
+    or changes state, dates, employee or type.
+    """
+
+    _inherit = "hr.leave"
+
+    def init(self):
+        super().init()
+        create_cache_sequence(self.env.cr, LEAVE_CACHE_SEQUENCE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        bump_cache_version(self.env.cr, LEAVE_CACHE_SEQUENCE)
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if not LEAVE_CACHE_FIELDS.isdisjoint(vals):
+            bump_cache_version(self.env.cr, LEAVE_CACHE_SEQUENCE)
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        bump_cache_version(self.env.cr, LEAVE_CACHE_SEQUENCE)
+        return res
+
+    @api.model
+    def _biometric_leave_cache_version(self):
+        return get_cache_version(self.env.cr, LEAVE_CACHE_SEQUENCE)
+
+    @api.model
+    @tools.ormcache("day", "tz_name", "self.env.lang", "self._biometric_leave_cache_version()")
+    def _biometric_leaves_on(self, day, tz_name):
+        """
+        Employees on approved leave during the local ``day``.
+
+        Returns:
+            tuple[tuple[int, str]]: ``(employee id, leave type name)`` pairs.
+        """
+        tz = pytz.timezone(tz_name)
+        start_utc = tz.localize(datetime.combine(day, time.min)).astimezone(pytz.utc).replace(tzinfo=None)
+        end_utc = tz.localize(datetime.combine(day, time.max)).astimezone(pytz.utc).replace(tzinfo=None)
+        leaves = self.sudo().search(
+            [
+                ("state", "=", "validate"),
+                ("date_from", "<=", end_utc),
+                ("date_to", ">=", start_utc),
+            ]
+        )
+        return tuple(
+            (leave.employee_id.id, leave.holiday_status_id.name or _("Approved Leave"))
+            for leave in leaves
+        )
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import models, api, tools
+from odoo.addons.resource.models.utils import Intervals
+
+# Sequences whose value is part of the keys of the shift and leave caches:
+# bumping one retires the entries of that cache in every worker, without
+# clearing the rest of the registry caches.
+CALENDAR_CACHE_SEQUENCE = "biometric_calendar_cache_seq"
+LEAVE_CACHE_SEQUENCE = "biometric_leave_cache_seq"
+DEVICE_CACHE_SEQUENCE = "biometric_device_cache_seq"
+
+
+def create_cache_sequence(cr, sequence):
+    cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % sequence)
+
+
+def get_cache_version(cr, sequence):
+    """Current version of a cache, read once per transaction."""
+    versions = cr.precommit.data.setdefault("biometric_cache_versions", {})
+    if sequence not in versions:
+        cr.execute("SELECT COALESCE(pg_sequence_last_value(%s::regclass), 0)", (sequence,))
+        versions[sequence] = cr.fetchone()[0]
+    return versions[sequence]
+
+
+def bump_cache_version(cr, sequence):
+    """
+    Retire the entries of a cache. The version moves now, for this
+    transaction, and again after the commit, so that entries another worker
+    computed from the not yet committed data are retired too.
+    """
+
+    def bump():
+        cr.execute("SELECT nextval(%s)", (sequence,))
+        return cr.fetchone()[0]
+
+    cr.precommit.data.setdefault("biometric_cache_versions", {})[sequence] = bump()
+    pending = cr.postcommit.data.setdefault("biometric_cache_bumps", set())
+    if sequence not in pending:
+        pending.add(sequence)
+        cr.postcommit.add(bump)
+
+
+class ResourceCalendar(models.Model):
+    """
+    Shift-interval cache shared by punch evaluation, auto check-out and the
+    absent/late alerts.
+
+    Work intervals are computed once per calendar, timezone and local day
+    (``ormcache``) and reused for any window (same day, +/- 14 hours, 30
+    hours...), together with the public holidays of the calendar. The cache
+    keys hold a version that moves whenever a calendar, its attendances or its
+    public holidays change.
+    """
+
+    _inherit = "resource.calendar"
+
+    def init(self):
+        super().init()
+        create_cache_sequence(self.env.cr, CALENDAR_CACHE_SEQUENCE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._biometric_invalidate_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._biometric_invalidate_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._biometric_invalidate_cache()
+        return res
+
+    @api.model
+    def _biometric_cache_version(self):
+        return get_cache_version(self.env.cr, CALENDAR_CACHE_SEQUENCE)
+
+    @api.model
+    def _biometric_invalidate_cache(self):
+        bump_cache_version(self.env.cr, CALENDAR_CACHE_SEQUENCE)
+
+    def _biometric_intervals(self, start_dt, end_dt, resource=None):
+        """
+        Cached equivalent of
+        ``_attendance_intervals_batch(start_dt, end_dt, resource)[resource.id]``.
+
+        Args:
+            start_dt (datetime): Timezone-aware start of the window.
+            end_dt (datetime): Timezone-aware end of the window.
+            resource (resource.resource): Resource whose timezone applies,
+                the calendar's one if not given.
+
+        Returns:
+            list[tuple]: ``(start, end, False)`` timezone-aware shift intervals
+            clipped to the window, in chronological order. As in
+            ``_attendance_intervals_batch``, touching intervals are merged, so
+            a night shift spanning midnight is one interval.
+        """
+        self.ensure_one()
+        tz_name = (resource.tz if resource else False) or self.tz or "UTC"
+        tz = pytz.timezone(tz_name)
+        resource_id = (
+            resource.id if resource and self._biometric_has_resource_attendances() else False
+        )
+        no_attendance = self.env["resource.calendar.attendance"]
+        intervals = []
+        day = start_dt.astimezone(tz).date()
+        last_day = end_dt.astimezone(tz).date()
+        while day <= last_day:
+            for start, end in self._biometric_day_intervals(tz_name, day, resource_id):
+                start, end = max(start, start_dt), min(end, end_dt)
+                if start < end:
+                    intervals.append((start, end, no_attendance))
+            day += timedelta(days=1)
+        # Merge the intervals the day boundaries split (e.g. 22:00-24:00 + 00:00-06:00)
+        return [(start, end, False) for start, end, _meta in Intervals(intervals)]
+
+    @tools.ormcache("self.id", "tz_name", "day", "resource_id", "self._biometric_cache_version()")
+    def _biometric_day_intervals(self, tz_name, day, resource_id):
+        """Shift intervals of one local day, as a tuple of ``(start, end)``."""
+        tz = pytz.timezone(tz_name)
+        day_start = tz.localize(datetime.combine(day, time.min))
+        day_end = tz.localize(datetime.combine(day + timedelta(days=1), time.min))
+        resource = self.env["resource.resource"].browse(resource_id)
+        intervals = self.sudo()._attendance_intervals_batch(
+            day_start, day_end, resource or None, tz=tz
+        )[resource.id]
+        return tuple((start, end) for start, end, _meta in intervals)
+
+    @tools.ormcache("self.id", "self._biometric_cache_version()")
+    def _biometric_has_resource_attendances(self):
+        """Whether some attendances of the calendar only apply to one resource."""
+        return bool(self.sudo().attendance_ids.filtered("resource_id"))
+
+    @tools.ormcache("self.id", "day", "self.env.lang", "self._biometric_cache_version()")
+    def _biometric_public_holiday(self, day):
+        """Name of the public holiday of the calendar on ``day`` ('' if unnamed), or None."""
+        holiday = self.env["resource.calendar.leaves"].sudo().search(
+            [
+                ("calendar_id", "=", self.id),
+                ("resource_id", "=", False),
+                ("date_from", "<=", datetime.combine(day, time.max)),
+                ("date_to", ">=", datetime.combine(day, time.min)),
+            ],
+            limit=1,
+        )
+        return (holiday.name or "") if holiday else None
+
+
+class ResourceCalendarAttendance(models.Model):
+    _inherit = "resource.calendar.attendance"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env["resource.calendar"]._biometric_invalidate_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env["resource.calendar"]._biometric_invalidate_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env["resource.calendar"]._biometric_invalidate_cache()
+        return res
+
+
+class ResourceCalendarLeaves(models.Model):
+    """
+    Only public holidays (leaves without resource) are cached: the time off
+    of one resource, e.g. created when a leave is approved, leaves the cache
+    alone.
+    """
+
+    _inherit = "resource.calendar.leaves"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if not all(records.mapped("resource_id")):
+            self.env["resource.calendar"]._biometric_invalidate_cache()
+        return records
+
+    def write(self, vals):
+        public = not all(self.mapped("resource_id"))
+        res = super().write(vals)
+        if public or not all(self.mapped("resource_id")):
+            self.env["resource.calendar"]._biometric_invalidate_cache()
+        return res
+
+    def unlink(self):
+        public = not all(self.mapped("resource_id"))
+        res = super().unlink()
+        if public:
+            self.env["resource.calendar"]._biometric_invalidate_cache()
+        return res
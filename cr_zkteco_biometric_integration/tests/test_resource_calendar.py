@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+
+from datetime import datetime
+
+import pytz
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged("post_install", "-at_install")
+class TestBiometricIntervals(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Night shift: 22:00 to 06:00 the next morning, every day of the week
+        attendances = []
+        for dayofweek in range(7):
+            attendances += [
+                (0, 0, {
+                    "name": "Night (evening)",
+                    "dayofweek": str(dayofweek),
+                    "hour_from": 22.0,
+                    "hour_to": 24.0,
+                    "day_period": "afternoon",
+                }),
+                (0, 0, {
+                    "name": "Night (morning)",
+                    "dayofweek": str(dayofweek),
+                    "hour_from": 0.0,
+                    "hour_to": 6.0,
+                    "day_period": "morning",
+                }),
+            ]
+        cls.calendar = cls.env["resource.calendar"].create(
+            {
+                "name": "Night Shift",
+                "tz": "Europe/Brussels",
+                "attendance_ids": [(5, 0, 0)] + attendances,
+            }
+        )
+        cls.tz = pytz.timezone("Europe/Brussels")
+
+    def _reference(self, start_dt, end_dt):
+        return [
+            (start, end, False)
+            for start, end, _meta in self.calendar._attendance_intervals_batch(start_dt, end_dt)[False]
+        ]
+
+    def test_night_shift_matches_attendance_intervals(self):
+        """A shift crossing midnight comes back as one interval, as from _attendance_intervals_batch."""
+        start_dt = self.tz.localize(datetime(2024, 3, 4, 12, 0))
+        end_dt = self.tz.localize(datetime(2024, 3, 6, 12, 0))
+        intervals = self.calendar._biometric_intervals(start_dt, end_dt)
+        self.assertEqual(intervals, self._reference(start_dt, end_dt))
+        self.assertEqual(
+            intervals[0][:2],
+            (
+                self.tz.localize(datetime(2024, 3, 4, 22, 0)),
+                self.tz.localize(datetime(2024, 3, 5, 6, 0)),
+            ),
+        )
+
+    def test_window_clipping_matches_attendance_intervals(self):
+        """Windows starting or ending inside a shift are clipped the same way."""
+        start_dt = self.tz.localize(datetime(2024, 3, 4, 23, 0))
+        end_dt = self.tz.localize(datetime(2024, 3, 5, 3, 0))
+        self.assertEqual(
+            self.calendar._biometric_intervals(start_dt, end_dt),
+            self._reference(start_dt, end_dt),
+        )
@@ -3,6 +3,7 @@
 
 from . import biometric_enroll_wizard
 from . import biometric_user_transfer_wizard
+from . import biometric_xlsx_report
 from . import biometric_attendance_report_wizard
 from . import calculate_attendance_wizard
 from . import daily_summary_report_wizard
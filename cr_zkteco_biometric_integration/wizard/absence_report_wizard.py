@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 # Part of Creyox Technologies.
 from odoo import models, fields, api, _
-from datetime import datetime, time, timedelta
+from datetime import datetime, timedelta
 import pytz
 
 
 class BiometricAbsenceReportWizard(models.TransientModel):
     _name = "biometric.absence.report.wizard"
+    _inherit = ["biometric.xlsx.report"]
     _description = "Absence Report Wizard (PDF)"
 
     from_date = fields.Date(
@@ -21,37 +22,58 @@ class BiometricAbsenceReportWizard(models.TransientModel):
             "cr_zkteco_biometric_integration.action_report_absence"
         ).report_action(self)
 
+    def action_export_excel(self):
+        """Generate the Excel version of the report in the background."""
+        self.ensure_one()
+        return self._xlsx_enqueue(
+            _("Absence Report %s - %s", self.from_date, self.to_date),
+            {
+                "from_date": fields.Date.to_string(self.from_date),
+                "to_date": fields.Date.to_string(self.to_date),
+                "tz": self.env.user.tz or "Asia/Kolkata",
+                "file_name": f"Absence_Report_{self.from_date}_{self.to_date}.xlsx",
+            },
+        )
+
     def get_report_data(self):
         user_tz = pytz.timezone(self.env.user.tz or "Asia/Kolkata")
+
+        absent_data = [
+            line
+            for _date, lines in self._absence_lines_by_day(self.from_date, self.to_date, user_tz)
+            for line in lines
+        ]
+
+        return {
+            "from_date": self.from_date.strftime("%Y-%m-%d"),
+            "to_date": self.to_date.strftime("%Y-%m-%d"),
+            "absent_records": absent_data,
+            "total_absences": len(absent_data),
+            "generated_on": pytz.utc.localize(datetime.utcnow())
+            .astimezone(user_tz)
+            .strftime("%Y-%m-%d %H:%M"),
+        }
+
+    @api.model
+    def _absence_lines_by_day(self, from_date, to_date, user_tz):
+        """Yield ``(date, lines)`` with the absent employees of each day of the range (PDF and Excel)."""
         employees = self.env["hr.employee"].search(
             [("active", "=", True)], order="name asc"
         )
 
-        absent_data = []
-        delta = self.to_date - self.from_date
+        delta = to_date - from_date
 
         for i in range(delta.days + 1):
-            current_date = self.from_date + timedelta(days=i)
-
-            # Start and End of the current_date in UTC
-            start_utc = (
-                user_tz.localize(datetime.combine(current_date, time.min))
-                .astimezone(pytz.utc)
-                .replace(tzinfo=None)
-            )
-            end_utc = (
-                user_tz.localize(datetime.combine(current_date, time.max))
-                .astimezone(pytz.utc)
-                .replace(tzinfo=None)
-            )
+            current_date = from_date + timedelta(days=i)
 
             # Batch check statuses for this date
             status_map = employees.get_attendance_statuses_for_date_batch(current_date, user_tz)
 
+            lines = []
             for emp in employees:
                 status, reason = status_map.get(emp.id, ("absent", False))
                 if status == "absent":
-                    absent_data.append(
+                    lines.append(
                         {
                             "employee": emp.name,
                             "department": emp.department_id.name or "-",
@@ -60,13 +82,33 @@ class BiometricAbsenceReportWizard(models.TransientModel):
                             "day": current_date.strftime("%a"),
                         }
                     )
+            yield current_date, lines
 
-        return {
-            "from_date": self.from_date.strftime("%Y-%m-%d"),
-            "to_date": self.to_date.strftime("%Y-%m-%d"),
-            "absent_records": absent_data,
-            "total_absences": len(absent_data),
-            "generated_on": pytz.utc.localize(datetime.utcnow())
-            .astimezone(user_tz)
-            .strftime("%Y-%m-%d %H:%M"),
-        }
+    @api.model
+    def _xlsx_write(self, workbook, formats, params, job):
+        from_date = fields.Date.to_date(params["from_date"])
+        to_date = fields.Date.to_date(params["to_date"])
+        user_tz = pytz.timezone(params["tz"])
+        cell_format = formats["cell"]
+        sheet, row = self._xlsx_add_sheet(
+            workbook,
+            formats,
+            "Absence Report",
+            f"Absence Report from {from_date} to {to_date}",
+            ["Date", "Day", "Employee", "Department", "Company"],
+        )
+        total_days = (to_date - from_date).days + 1
+        for count, (current_date, lines) in enumerate(
+            self._absence_lines_by_day(from_date, to_date, user_tz), 1
+        ):
+            for line in lines:
+                sheet.write(row, 0, line["date"], cell_format)
+                sheet.write(row, 1, line["day"], cell_format)
+                sheet.write(row, 2, line["employee"], cell_format)
+                sheet.write(row, 3, line["department"], cell_format)
+                sheet.write(row, 4, line["company"], cell_format)
+                row += 1
+            job._set_progress(
+                100.0 * count / total_days,
+                _("%(done)s / %(total)s days", done=count, total=total_days),
+            )
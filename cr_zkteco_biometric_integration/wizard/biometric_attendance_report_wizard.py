@@ -2,22 +2,16 @@
 # Part of Creyox Technologies.
 
 from odoo import models, fields, api, _
-import io
-import base64
 from datetime import datetime
-import logging
+import pytz
 
-_logger = logging.getLogger(__name__)
-
-try:
-    import xlsxwriter
-except ImportError:
-    xlsxwriter = None
-    _logger.warning("xlsxwriter is not installed. Excel reports will not be available.")
+# Employees summarized per grouped query of the summary report
+SUMMARY_EMPLOYEE_CHUNK = 200
 
 
 class BiometricAttendanceReportWizard(models.TransientModel):
     _name = "biometric.attendance.report.wizard"
+    _inherit = ["biometric.xlsx.report"]
     _description = "Biometric Attendance Report Wizard"
 
     from_date = fields.Date(
@@ -40,270 +34,136 @@ class BiometricAttendanceReportWizard(models.TransientModel):
     log_ids = fields.Many2many("biometric.attendance.log", string="Selected Logs")
     is_log_report = fields.Boolean(string="Is Log Report")
 
-    excel_file = fields.Binary("Download Report", readonly=True)
-    file_name = fields.Char("File Name", readonly=True)
-
     def action_export_excel(self):
-        if not xlsxwriter:
-            raise models.ValidationError(
-                _(
-                    "xlsxwriter is not installed on this server. Please contact your administrator."
-                )
-            )
-
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output, {"in_memory": True})
-        sheet = workbook.add_worksheet("Attendance Report")
-
-        # Formats
-        header_format = workbook.add_format(
-            {"bold": True, "bg_color": "#D3D3D3", "border": 1, "align": "center"}
-        )
-        title_format = workbook.add_format(
-            {"bold": True, "align": "center", "valign": "vcenter", "font_size": 14}
-        )
-        date_format = workbook.add_format(
-            {"num_format": "yyyy-mm-dd hh:mm:ss", "border": 1}
-        )
-        cell_format = workbook.add_format({"border": 1})
-
+        """Generate the Excel report in the background (see ``_xlsx_write``)."""
+        self.ensure_one()
         # Determine if we are reporting on Logs or Attendances
-        is_log_report = (
-            self.env.context.get("active_model") == "biometric.attendance.log"
+        is_log_report = bool(
+            self.is_log_report
+            or self.env.context.get("active_model") == "biometric.attendance.log"
             or self.log_ids
         )
+        return self._xlsx_enqueue(
+            _("Attendance Report %s - %s", self.from_date, self.to_date),
+            {
+                "from_date": fields.Date.to_string(self.from_date),
+                "to_date": fields.Date.to_string(self.to_date),
+                "report_type": self.report_type,
+                "is_log_report": is_log_report,
+                "record_ids": (self.log_ids if is_log_report else self.attendance_ids).ids,
+                # Resolve Timezone from User Profile (Source of Truth)
+                "tz": self.env.user.tz or "Asia/Kolkata",
+                "file_name": f'Attendance_Report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
+            },
+        )
+
+    @api.model
+    def _xlsx_write(self, workbook, formats, params, job):
+        from_date = fields.Date.to_date(params["from_date"])
+        to_date = fields.Date.to_date(params["to_date"])
+        is_log_report = params["is_log_report"]
+        local_tz = pytz.timezone(params["tz"])
+        cell_format = formats["cell"]
 
         # Columns based on report type and model
-        if self.report_type == "summary":
-            columns = ["Employee", "Check In", "Check Out", "Work Hours"]
+        if params["report_type"] == "detailed" and is_log_report:
+            columns = ["Device", "Device UID", "Employee", "Punch Time", "State", "Status"]
         else:
-            if is_log_report:
-                columns = [
-                    "Device",
-                    "Device UID",
-                    "Employee",
-                    "Punch Time",
-                    "State",
-                    "Status",
-                ]
-            else:
-                columns = ["Employee", "Check In", "Check Out", "Work Hours"]
+            columns = ["Employee", "Check In", "Check Out", "Work Hours"]
 
         # Add Title
         if is_log_report:
-            title = f"Attendance Log from {self.from_date} to {self.to_date}"
-        else:
-            title = f"Attendance from {self.from_date} to {self.to_date}"
-
-        sheet.merge_range(0, 0, 0, len(columns) - 1, title, title_format)
-
-        # Header Row
-        for i, col in enumerate(columns):
-            sheet.write(2, i, col, header_format)
-            sheet.set_column(i, i, 25)
-
-        # 1. Resolve Timezone from User Profile (Source of Truth)
-        import pytz
-
-        user_tz_name = self.env.user.tz or "Asia/Kolkata"
-        local_tz = pytz.timezone(user_tz_name)
-
-        domain = [("employee_id", "!=", False)]
-
-        if is_log_report:
-            domain += [
-                (
-                    "timestamp",
-                    ">=",
-                    datetime.combine(self.from_date, datetime.min.time()),
-                ),
-                (
-                    "timestamp",
-                    "<=",
-                    datetime.combine(self.to_date, datetime.max.time()),
-                ),
-            ]
-            if self.log_ids:
-                domain.append(("id", "in", self.log_ids.ids))
-            records = self.env["biometric.attendance.log"].search(
-                domain, order="timestamp asc"
-            )
+            title = f"Attendance Log from {from_date} to {to_date}"
         else:
-            domain += [
-                (
-                    "check_in",
-                    ">=",
-                    datetime.combine(self.from_date, datetime.min.time()),
-                ),
-                ("check_in", "<=", datetime.combine(self.to_date, datetime.max.time())),
-            ]
-            if self.attendance_ids:
-                domain.append(("id", "in", self.attendance_ids.ids))
-            records = self.env["hr.attendance"].search(domain, order="check_in asc")
-
-        row = 3
-        if self.report_type == "detailed":
-            # ── Detailed Report: Show Every Record ─────────────────────────────
-            for rec in records:
+            title = f"Attendance from {from_date} to {to_date}"
+        sheet, row = self._xlsx_add_sheet(workbook, formats, "Attendance Report", title, columns)
+
+        model = "biometric.attendance.log" if is_log_report else "hr.attendance"
+        date_field = "timestamp" if is_log_report else "check_in"
+        domain = [
+            ("employee_id", "!=", False),
+            (date_field, ">=", datetime.combine(from_date, datetime.min.time())),
+            (date_field, "<=", datetime.combine(to_date, datetime.max.time())),
+        ]
+        if params["record_ids"]:
+            domain.append(("id", "in", params["record_ids"]))
+
+        def local_str(utc_dt):
+            # Manual Localize UTC to User Timezone
+            return pytz.utc.localize(utc_dt).astimezone(local_tz).strftime("%d/%m/%Y %H:%M:%S")
+
+        if params["report_type"] == "detailed":
+            # ── Detailed Report: Show Every Record, streamed in chunks ─────────
+            Model = self.env[model]
+            total = Model.search_count(domain)
+            if is_log_report:
+                field_names = ["device_id", "device_user_id", "employee_id", "timestamp", "verify_state", "status"]
+                verify_states = dict(Model._fields["verify_state"].selection)
+                statuses = dict(Model._fields["status"].selection)
+            else:
+                field_names = ["employee_id", "check_in", "check_out", "worked_hours"]
+            for count, rec in enumerate(
+                self._xlsx_iter_records(model, domain, field_names, date_field), 1
+            ):
                 if is_log_report:
-                    # Manual Localize UTC to User Timezone
-                    ts_utc = pytz.utc.localize(rec.timestamp)
-                    ts_local = ts_utc.astimezone(local_tz)
-
-                    # 1. Device
                     sheet.write(row, 0, rec.device_id.name, cell_format)
-                    # 2. Device UID
                     sheet.write(row, 1, rec.device_user_id or "", cell_format)
-                    # 3. Employee
                     sheet.write(row, 2, rec.employee_id.name, cell_format)
-                    # 4. Punch Time
-                    sheet.write(
-                        row, 3, ts_local.strftime("%d/%m/%Y %H:%M:%S"), cell_format
-                    )
-                    # 5. State
-                    sheet.write(
-                        row,
-                        4,
-                        dict(rec._fields["verify_state"].selection).get(
-                            rec.verify_state, ""
-                        ),
-                        cell_format,
-                    )
-                    # 6. Status
-                    sheet.write(
-                        row,
-                        5,
-                        dict(rec._fields["status"].selection).get(rec.status, ""),
-                        cell_format,
-                    )
+                    sheet.write(row, 3, local_str(rec.timestamp), cell_format)
+                    sheet.write(row, 4, verify_states.get(rec.verify_state, ""), cell_format)
+                    sheet.write(row, 5, statuses.get(rec.status, ""), cell_format)
                 else:
-                    # Manual Localize UTC to User Timezone
-                    check_in_local = (
-                        pytz.utc.localize(rec.check_in).astimezone(local_tz)
-                        if rec.check_in
-                        else None
-                    )
-                    check_out_local = (
-                        pytz.utc.localize(rec.check_out).astimezone(local_tz)
-                        if rec.check_out
-                        else None
-                    )
-
                     sheet.write(row, 0, rec.employee_id.name, cell_format)
-                    sheet.write(
-                        row,
-                        1,
-                        (
-                            check_in_local.strftime("%d/%m/%Y %H:%M:%S")
-                            if check_in_local
-                            else ""
-                        ),
-                        cell_format,
-                    )
-                    sheet.write(
-                        row,
-                        2,
-                        (
-                            check_out_local.strftime("%d/%m/%Y %H:%M:%S")
-                            if check_out_local
-                            else ""
-                        ),
-                        cell_format,
-                    )
-
-                    total_seconds = rec.worked_hours * 3600
-                    total_minutes = int(round(total_seconds / 60.0))
-                    hours, minutes = divmod(total_minutes, 60)
-                    sheet.write(row, 3, f"{hours:02d}:{minutes:02d}", cell_format)
+                    sheet.write(row, 1, local_str(rec.check_in) if rec.check_in else "", cell_format)
+                    sheet.write(row, 2, local_str(rec.check_out) if rec.check_out else "", cell_format)
+                    sheet.write(row, 3, self._xlsx_hours(rec.worked_hours), cell_format)
                 row += 1
+                if count % 10000 == 0:
+                    job._set_progress(
+                        100.0 * count / total,
+                        _("%(done)s / %(total)s rows", done=count, total=total),
+                    )
+            return
+
+        # ── Summary Report: pre-summarized per Employee and (local) Date ──────
+        Model = self.env[model].with_context(tz=params["tz"])
+        employees = Model._read_group(domain, ["employee_id"])
+        employees = self.env["hr.employee"].browse(
+            [employee.id for [employee] in employees]
+        ).sorted("name")
+        if is_log_report:
+            aggregates = ["timestamp:min", "timestamp:max"]
         else:
-            # ── Summary Report: Group by Employee and Date ─────────────────────
-            summary_data = {}
-            for rec in records:
-                emp_id = rec.employee_id.id
-                ts = rec.timestamp if is_log_report else rec.check_in
-
-                # Use User TZ to determine the date boundary
-                ts_local = pytz.utc.localize(ts).astimezone(local_tz)
-                att_date = ts_local.date()
-
-                if emp_id not in summary_data:
-                    summary_data[emp_id] = {}
-                if att_date not in summary_data[emp_id]:
-                    summary_data[emp_id][att_date] = []
-                summary_data[emp_id][att_date].append(rec)
-
-            sorted_employees = sorted(
-                summary_data.keys(),
-                key=lambda eid: self.env["hr.employee"].browse(eid).name,
-            )
-            for emp_id in sorted_employees:
-                emp_name = self.env["hr.employee"].browse(emp_id).name
-                sorted_dates = sorted(summary_data[emp_id].keys())
-                for att_date in sorted_dates:
-                    recs = summary_data[emp_id][att_date]
-
+            aggregates = ["check_in:min", "check_out:max", "check_out:count", "__count", "worked_hours:sum"]
+
+        for index in range(0, len(employees), SUMMARY_EMPLOYEE_CHUNK):
+            chunk = employees[index : index + SUMMARY_EMPLOYEE_CHUNK]
+            groups = {}
+            # Use User TZ to determine the date boundary
+            for employee, day, *values in Model._read_group(
+                domain + [("employee_id", "in", chunk.ids)],
+                ["employee_id", "%s:day" % date_field],
+                aggregates,
+            ):
+                groups.setdefault(employee.id, []).append((day, values))
+
+            for employee in chunk:
+                for _day, values in sorted(groups.get(employee.id, []), key=lambda g: g[0]):
                     if is_log_report:
-                        first_in = min(r.timestamp for r in recs)
-                        last_out = max(r.timestamp for r in recs)
-                        total_worked_delta = last_out - first_in
-                        total_worked = total_worked_delta.total_seconds() / 3600.0
+                        first_in, last_out = values
+                        total_worked = (last_out - first_in).total_seconds() / 3600.0
                     else:
-                        first_in = min(r.check_in for r in recs)
-                        last_out = (
-                            max(r.check_out for r in recs)
-                            if all(r.check_out for r in recs)
-                            else None
-                        )
-                        total_worked = sum(r.worked_hours for r in recs)
-
-                    # Convert to Local Strings using User TZ
-                    first_in_local = pytz.utc.localize(first_in).astimezone(local_tz)
-                    last_out_local = (
-                        pytz.utc.localize(last_out).astimezone(local_tz)
-                        if last_out
-                        else None
-                    )
-
-                    sheet.write(row, 0, emp_name, cell_format)
-                    sheet.write(
-                        row,
-                        1,
-                        first_in_local.strftime("%d/%m/%Y %H:%M:%S"),
-                        cell_format,
-                    )
-                    sheet.write(
-                        row,
-                        2,
-                        (
-                            last_out_local.strftime("%d/%m/%Y %H:%M:%S")
-                            if last_out_local
-                            else "N/A"
-                        ),
-                        cell_format,
-                    )
+                        first_in, max_out, out_count, count, total_worked = values
+                        last_out = max_out if out_count == count else None
 
-                    total_seconds = total_worked * 3600
-                    total_minutes = int(round(total_seconds / 60.0))
-                    hours, minutes = divmod(total_minutes, 60)
-                    sheet.write(row, 3, f"{hours:02d}:{minutes:02d}", cell_format)
+                    sheet.write(row, 0, employee.name, cell_format)
+                    sheet.write(row, 1, local_str(first_in), cell_format)
+                    sheet.write(row, 2, local_str(last_out) if last_out else "N/A", cell_format)
+                    sheet.write(row, 3, self._xlsx_hours(total_worked), cell_format)
                     row += 1
 
-        workbook.close()
-        output.seek(0)
-
-        file_data = base64.b64encode(output.read())
-        self.write(
-            {
-                "excel_file": file_data,
-                "file_name": f'Attendance_Report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx',
-            }
-        )
-
-        return {
-            "type": "ir.actions.act_window",
-            "res_model": "biometric.attendance.report.wizard",
-            "view_mode": "form",
-            "res_id": self.id,
-            "target": "new",
-        }
+            done = index + len(chunk)
+            job._set_progress(
+                100.0 * done / len(employees),
+                _("%(done)s / %(total)s employees", done=done, total=len(employees)),
+            )
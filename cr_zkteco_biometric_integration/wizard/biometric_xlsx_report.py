@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Part of Creyox Technologies.
+
+import logging
+import os
+import tempfile
+
+from odoo import models, api, _
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+    _logger.warning("xlsxwriter is not installed. Excel reports will not be available.")
+
+# Records fetched (and released from the cache) per step of a detailed report
+XLSX_FETCH_SIZE = 5000
+
+
+class BiometricXlsxReport(models.AbstractModel):
+    """
+    Streaming XLSX engine shared by the attendance, daily and absence report
+    wizards.
+
+    A report is generated by a ``biometric.job``: the wizard queues it with
+    ``_xlsx_enqueue`` and implements ``_xlsx_write(workbook, formats, params,
+    job)``, which writes its rows in order from pre-summarized or chunked
+    queries. The workbook is written in xlsxwriter's ``constant_memory`` mode
+    to a temporary file, stored as an attachment of the job, and the user is
+    notified when it is ready.
+    """
+
+    _name = "biometric.xlsx.report"
+    _description = "Biometric Streaming XLSX Report"
+
+    def _xlsx_enqueue(self, name, params):
+        """Queue the generation of the report and tell the user about it."""
+        if not xlsxwriter:
+            raise ValidationError(
+                _(
+                    "xlsxwriter is not installed on this server. Please contact your administrator."
+                )
+            )
+        job = self.env["biometric.job"]._enqueue(name, self._name, params)
+        return job._action_notify_queued()
+
+    @api.model
+    def _run_biometric_job(self, job):
+        file_name = job.params.get("file_name") or "%s.xlsx" % job.name
+        fd, path = tempfile.mkstemp(suffix=".xlsx", prefix="biometric_report_")
+        os.close(fd)
+        try:
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+            self._xlsx_write(workbook, self._xlsx_formats(workbook), job.params, job)
+            workbook.close()
+            with open(path, "rb") as report_file:
+                attachment = self.env["ir.attachment"].sudo().create(
+                    {
+                        "name": file_name,
+                        "raw": report_file.read(),
+                        "res_model": job._name,
+                        "res_id": job.id,
+                        "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    }
+                )
+        finally:
+            os.remove(path)
+        job.attachment_id = attachment
+        return _("%s is ready for download.", file_name)
+
+    @api.model
+    def _xlsx_write(self, workbook, formats, params, job):
+        """Write the report into ``workbook``, rows in order (constant memory mode)."""
+        raise NotImplementedError()
+
+    @api.model
+    def _xlsx_formats(self, workbook):
+        return {
+            "header": workbook.add_format(
+                {"bold": True, "bg_color": "#D3D3D3", "border": 1, "align": "center"}
+            ),
+            "title": workbook.add_format(
+                {"bold": True, "align": "center", "valign": "vcenter", "font_size": 14}
+            ),
+            "cell": workbook.add_format({"border": 1}),
+        }
+
+    @api.model
+    def _xlsx_add_sheet(self, workbook, formats, sheet_name, title, columns):
+        """
+        Add a worksheet with its title (row 0) and header (row 2).
+
+        Returns:
+            tuple: The worksheet and the index of its first data row.
+        """
+        sheet = workbook.add_worksheet(sheet_name)
+        for i in range(len(columns)):
+            sheet.set_column(i, i, 25)
+        sheet.merge_range(0, 0, 0, len(columns) - 1, title, formats["title"])
+        for i, col in enumerate(columns):
+            sheet.write(2, i, col, formats["header"])
+        return sheet, 3
+
+    @api.model
+    def _xlsx_iter_records(self, model, domain, field_names, order_field):
+        """
+        Yield the records of ``domain`` ordered by ``order_field`` then id,
+        fetched ``XLSX_FETCH_SIZE`` at a time (keyset pagination) and released
+        from the cache after each chunk so memory stays flat.
+        """
+        Model = self.env[model]
+        last = None
+        while True:
+            chunk_domain = list(domain)
+            if last:
+                chunk_domain += [
+                    "|",
+                    (order_field, ">", last[0]),
+                    "&",
+                    (order_field, "=", last[0]),
+                    ("id", ">", last[1]),
+                ]
+            records = Model.search_fetch(
+                chunk_domain,
+                field_names,
+                order="%s asc, id asc" % order_field,
+                limit=XLSX_FETCH_SIZE,
+            )
+            yield from records
+            if len(records) < XLSX_FETCH_SIZE:
+                return
+            last = (records[-1][order_field], records[-1].id)
+            self.env.invalidate_all()
+
+    @api.model
+    def _xlsx_hours(self, hours):
+        """Format a number of hours as HH:MM."""
+        total_minutes = int(round((hours or 0.0) * 60.0))
+        return "%02d:%02d" % divmod(total_minutes, 60)
@@ -4,6 +4,9 @@ from odoo import models, fields, api, _
 from datetime import datetime, time
 import pytz
 
+# Employees recalculated (and committed) per step of the background job
+CALCULATION_CHUNK_SIZE = 200
+
 
 class BiometricCalculateAttendanceWizard(models.TransientModel):
     _name = "biometric.calculate.attendance.wizard"
@@ -17,142 +20,173 @@ class BiometricCalculateAttendanceWizard(models.TransientModel):
     )
 
     def action_calculate(self):
-        # 1. Resolve Timezone from User Profile
-        user_tz_name = self.env.user.tz or "Asia/Kolkata"
-        local_tz = pytz.timezone(user_tz_name)
+        """Queue the recalculation as a background job (see ``_run_biometric_job``)."""
+        self.ensure_one()
+        job = self.env["biometric.job"]._enqueue(
+            _("Attendance Calculation %s - %s", self.from_date, self.to_date),
+            self._name,
+            {
+                "from_date": fields.Date.to_string(self.from_date),
+                "to_date": fields.Date.to_string(self.to_date),
+                # Resolve Timezone from User Profile
+                "tz": self.env.user.tz or "Asia/Kolkata",
+            },
+        )
+        return job._action_notify_queued()
+
+    @api.model
+    def _run_biometric_job(self, job):
+        return self._calculate_attendance(
+            fields.Date.to_date(job.params["from_date"]),
+            fields.Date.to_date(job.params["to_date"]),
+            job.params["tz"],
+            job,
+        )
+
+    @api.model
+    def _calculate_attendance(self, from_date, to_date, tz_name, job=None):
+        """
+        Rebuild ``hr.attendance`` from the biometric logs of a date range.
+
+        For every employee and local day with logs, the day's attendances are
+        consolidated into the first one, spanning from the earliest to the
+        latest of the punches and existing check-ins/outs; a day without
+        attendance gets one from its first to its last punch.
+
+        Set-based: the logs are summarized per (employee, local day) by one
+        grouped query, and employees are handled in chunks with one
+        attendance search, one unlink, one create, only the writes that change
+        something and one log UPDATE per chunk. Each chunk is committed with
+        the job progress.
+
+        Returns:
+            str: The result message.
+        """
+        local_tz = pytz.timezone(tz_name)
+        Attendance = self.env["hr.attendance"]
 
-        # 2. Search for unprocessed logs in range
         # Note: We use datetime.combine to ensure we cover the full day
-        from_dt = datetime.combine(self.from_date, time.min)
-        to_dt = datetime.combine(self.to_date, time.max)
-
-        logs = self.env["biometric.attendance.log"].search(
-            [
-                ("timestamp", ">=", from_dt),
-                ("timestamp", "<=", to_dt),
-                ("status", "in", ["new", "processed", "failed"]),
-                ("employee_id", "!=", False),
-            ],
-            order="timestamp asc",
+        from_dt = datetime.combine(from_date, time.min)
+        to_dt = datetime.combine(to_date, time.max)
+
+        self.env["biometric.attendance.log"].flush_model()
+        self.env.cr.execute(
+            """
+            SELECT employee_id,
+                   (timestamp AT TIME ZONE 'UTC' AT TIME ZONE %(tz)s)::date AS local_date,
+                   MIN(timestamp), MAX(timestamp), COUNT(*), ARRAY_AGG(id)
+              FROM biometric_attendance_log
+             WHERE timestamp >= %(from_dt)s
+               AND timestamp <= %(to_dt)s
+               AND status IN ('new', 'processed', 'failed')
+               AND employee_id IS NOT NULL
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            """,
+            {"tz": tz_name, "from_dt": from_dt, "to_dt": to_dt},
         )
-
-        if not logs:
-            return {
-                "type": "ir.actions.client",
-                "tag": "display_notification",
-                "params": {
-                    "title": _("Calculation Complete"),
-                    "message": _(
-                        "No new logs found to process for the selected range."
-                    ),
-                    "sticky": False,
-                },
-            }
-
-        # 3. Group logs by Employee and Date (Local)
-        # Structure: {employee_id: {date: [log_ids]}}
-        grouped_logs = {}
-        for log in logs:
-            # Convert UTC timestamp to local date for grouping
-            ts_local = pytz.utc.localize(log.timestamp).astimezone(local_tz)
-            log_date = ts_local.date()
-
-            emp_id = log.employee_id.id
-            if emp_id not in grouped_logs:
-                grouped_logs[emp_id] = {}
-            if log_date not in grouped_logs[emp_id]:
-                grouped_logs[emp_id][log_date] = []
-            grouped_logs[emp_id][log_date].append(log)
-
-        # 4. Create or Update hr.attendance
-        for emp_id, dates in grouped_logs.items():
-            for att_date, day_logs in dates.items():
-                first_punch = day_logs[0].timestamp  # UTC
-                last_punch = day_logs[-1].timestamp  # UTC
-
-                # Check if an attendance already exists for this employee on this local date
-                # We search for attendances where the check_in (localized) is on att_date
-                # Start of day (UTC) and End of day (UTC) for that local date
-                start_local = (
-                    local_tz.localize(datetime.combine(att_date, time.min))
-                    .astimezone(pytz.utc)
-                    .replace(tzinfo=None)
-                )
-                end_local = (
-                    local_tz.localize(datetime.combine(att_date, time.max))
-                    .astimezone(pytz.utc)
-                    .replace(tzinfo=None)
+        # Structure: {employee_id: [(date, first punch, last punch, log count, log ids)]}
+        days_by_employee = {}
+        for emp_id, att_date, first_punch, last_punch, count, log_ids in self.env.cr.fetchall():
+            days_by_employee.setdefault(emp_id, []).append(
+                (att_date, first_punch, last_punch, count, log_ids)
+            )
+        if not days_by_employee:
+            return _("No new logs found to process for the selected range.")
+
+        def to_utc(att_date, day_time):
+            return (
+                local_tz.localize(datetime.combine(att_date, day_time))
+                .astimezone(pytz.utc)
+                .replace(tzinfo=None)
+            )
+
+        employee_ids = sorted(days_by_employee)
+        created = updated = removed = 0
+        for index in range(0, len(employee_ids), CALCULATION_CHUNK_SIZE):
+            chunk = employee_ids[index : index + CALCULATION_CHUNK_SIZE]
+            chunk_days = [day for emp_id in chunk for day in days_by_employee[emp_id]]
+
+            # Existing attendances of the chunk, by employee and local check-in date
+            existing_by_day = {}
+            for attendance in Attendance.search(
+                [
+                    ("employee_id", "in", chunk),
+                    ("check_in", ">=", to_utc(min(d[0] for d in chunk_days), time.min)),
+                    ("check_in", "<=", to_utc(max(d[0] for d in chunk_days), time.max)),
+                ],
+                order="check_in asc",
+            ):
+                local_date = pytz.utc.localize(attendance.check_in).astimezone(local_tz).date()
+                existing_by_day.setdefault(
+                    (attendance.employee_id.id, local_date), Attendance
                 )
-
-                existing_atts = self.env["hr.attendance"].search(
-                    [
-                        ("employee_id", "=", emp_id),
-                        ("check_in", ">=", start_local),
-                        ("check_in", "<=", end_local),
-                    ],
-                    order="check_in asc",
+                existing_by_day[(attendance.employee_id.id, local_date)] |= attendance
+
+            to_unlink = Attendance
+            to_write = []
+            to_create = []
+            log_ids = []
+            for emp_id in chunk:
+                for att_date, first_punch, last_punch, count, day_log_ids in days_by_employee[emp_id]:
+                    log_ids.extend(day_log_ids)
+                    existing_atts = existing_by_day.get((emp_id, att_date))
+                    if existing_atts:
+                        # Consolidate all attendances of the day into the first one
+                        main_att = existing_atts[0]
+                        other_atts = existing_atts[1:]
+
+                        # Determine final check_in/out from all sources (logs + existing records)
+                        final_in = min(first_punch, main_att.check_in)
+                        all_outs = [last_punch, main_att.check_out]
+                        for other in other_atts:
+                            all_outs += [other.check_in, other.check_out]
+                        final_out = max((o for o in all_outs if o), default=False)
+
+                        # Ensure check_out is strictly after check_in
+                        if final_out and final_out <= final_in:
+                            final_out = False
+
+                        to_unlink |= other_atts
+                        if (main_att.check_in, main_att.check_out or False) != (final_in, final_out):
+                            to_write.append((main_att, {"check_in": final_in, "check_out": final_out}))
+                    else:
+                        vals = {"employee_id": emp_id, "check_in": first_punch}
+                        if count > 1:
+                            vals["check_out"] = last_punch
+                        to_create.append(vals)
+
+            # Delete redundant attendance records first to avoid overlap validation errors
+            to_unlink.unlink()
+            for attendance, vals in to_write:
+                attendance.write(vals)
+            Attendance.create(to_create)
+            created += len(to_create)
+            updated += len(to_write)
+            removed += len(to_unlink)
+
+            # Mark all logs of the chunk as processed
+            self.env.cr.execute(
+                """
+                UPDATE biometric_attendance_log
+                   SET status = 'processed', write_uid = %s, write_date = now() AT TIME ZONE 'UTC'
+                 WHERE id = ANY(%s) AND status != 'processed'
+                """,
+                (self.env.uid, log_ids),
+            )
+            self.env["biometric.attendance.log"].invalidate_model(["status"])
+
+            if job:
+                done = index + len(chunk)
+                job._set_progress(
+                    100.0 * done / len(employee_ids),
+                    _("%(done)s / %(total)s employees", done=done, total=len(employee_ids)),
                 )
 
-                if existing_atts:
-                    # Consolidate all attendances of the day into the first one
-                    main_att = existing_atts[0]
-                    other_atts = existing_atts[1:]
-
-                    # Determine final check_in/out from all sources (logs + existing records)
-                    final_in = min(first_punch, main_att.check_in)
-
-                    # Get max check_out from main, others, and last log punch
-                    all_outs = [last_punch, main_att.check_out]
-                    for other in other_atts:
-                        if other.check_in:
-                            all_outs.append(other.check_in)
-                        if other.check_out:
-                            all_outs.append(other.check_out)
-
-                    final_out = (
-                        max([o for o in all_outs if o])
-                        if any(o for o in all_outs if o)
-                        else None
-                    )
-
-                    # Delete redundant attendance records first to avoid overlap validation errors
-                    if other_atts:
-                        other_atts.unlink()
-
-                    # Ensure check_out is strictly after check_in
-                    if final_out and final_out <= final_in:
-                        final_out = False
-
-                    main_att.write({"check_in": final_in, "check_out": final_out})
-                else:
-                    # Create new attendance
-                    if len(day_logs) > 1:
-                        self.env["hr.attendance"].create(
-                            {
-                                "employee_id": emp_id,
-                                "check_in": first_punch,
-                                "check_out": last_punch,
-                            }
-                        )
-                    else:
-                        self.env["hr.attendance"].create(
-                            {
-                                "employee_id": emp_id,
-                                "check_in": first_punch,
-                            }
-                        )
-
-                # Mark all logs in this group as processed
-                for log in day_logs:
-                    log.write({"status": "processed"})
-
-        return {
-            "type": "ir.actions.client",
-            "tag": "display_notification",
-            "params": {
-                "title": _("Success"),
-                "message": _("Attendance calculation completed successfully."),
-                "sticky": False,
-                "next": {"type": "ir.actions.client", "tag": "reload"},
-            },
-        }
+        return _(
+            "Attendance calculation completed successfully: %(created)s created, "
+            "%(updated)s updated, %(removed)s merged.",
+            created=created,
+            updated=updated,
+            removed=removed,
+        )
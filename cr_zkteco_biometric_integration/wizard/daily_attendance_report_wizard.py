@@ -7,6 +7,7 @@ import pytz
 
 class BiometricDailyAttendanceReportWizard(models.TransientModel):
     _name = "biometric.daily.attendance.report.wizard"
+    _inherit = ["biometric.xlsx.report"]
     _description = "Daily Attendance Report Wizard (PDF)"
 
     date = fields.Date(string="Date", required=True, default=fields.Date.context_today)
@@ -16,32 +17,61 @@ class BiometricDailyAttendanceReportWizard(models.TransientModel):
             "cr_zkteco_biometric_integration.action_report_daily_attendance"
         ).report_action(self)
 
+    def action_export_excel(self):
+        """Generate the Excel version of the report in the background."""
+        self.ensure_one()
+        return self._xlsx_enqueue(
+            _("Daily Attendance Report %s", self.date),
+            {
+                "date": fields.Date.to_string(self.date),
+                "tz": self.env.user.tz or "Asia/Kolkata",
+                "file_name": f"Daily_Attendance_Report_{self.date}.xlsx",
+            },
+        )
+
     def get_report_data(self):
         user_tz = pytz.timezone(self.env.user.tz or "Asia/Kolkata")
 
+        report_lines = list(self._daily_attendance_lines(self.date, user_tz))
+        total_hours = sum(line["worked"] for line in report_lines)
+
+        return {
+            "date": self.date.strftime("%Y-%m-%d"),
+            "day": self.date.strftime("%A"),
+            "present_count": len(report_lines),
+            "total_hours": f"{total_hours:.2f}",
+            "lines": report_lines,
+            "generated_on": pytz.utc.localize(datetime.utcnow())
+            .astimezone(user_tz)
+            .strftime("%Y-%m-%d %H:%M"),
+            "generated_by": self.env.user.name,
+            "company": self.env.company.name,
+        }
+
+    @api.model
+    def _daily_attendance_lines(self, date, user_tz):
+        """Yield the report line of every attendance checked in on ``date`` (PDF and Excel)."""
         # Start and End of the selected day in UTC
         start_utc = (
-            user_tz.localize(datetime.combine(self.date, time.min))
+            user_tz.localize(datetime.combine(date, time.min))
             .astimezone(pytz.utc)
             .replace(tzinfo=None)
         )
         end_utc = (
-            user_tz.localize(datetime.combine(self.date, time.max))
+            user_tz.localize(datetime.combine(date, time.max))
             .astimezone(pytz.utc)
             .replace(tzinfo=None)
         )
 
         # Fetch only present employees for this specific report
-        attendances = self.env["hr.attendance"].search(
+        attendances = self.env["hr.attendance"].search_fetch(
             [("check_in", ">=", start_utc), ("check_in", "<=", end_utc)],
+            ["employee_id", "check_in", "check_out", "worked_hours"],
             order="employee_id asc",
         )
 
-        report_lines = []
-        total_hours = 0.0
         for att in attendances:
             worked = att.worked_hours or 0.0
-            total_hours += worked
 
             # Format times for the report
             in_local = pytz.utc.localize(att.check_in).astimezone(user_tz)
@@ -51,25 +81,34 @@ class BiometricDailyAttendanceReportWizard(models.TransientModel):
                 else None
             )
 
-            report_lines.append(
-                {
-                    "employee": att.employee_id.name,
-                    "check_in": in_local.strftime("%H:%M:%S"),
-                    "check_out": out_local.strftime("%H:%M:%S") if out_local else "-",
-                    "worked_hours": f"{worked:.2f}",
-                    "difference": f"{worked:.2f}",  # Placeholder for difference
-                }
-            )
+            yield {
+                "employee": att.employee_id.name,
+                "check_in": in_local.strftime("%H:%M:%S"),
+                "check_out": out_local.strftime("%H:%M:%S") if out_local else "-",
+                "worked": worked,
+                "worked_hours": f"{worked:.2f}",
+                "difference": f"{worked:.2f}",  # Placeholder for difference
+            }
 
-        return {
-            "date": self.date.strftime("%Y-%m-%d"),
-            "day": self.date.strftime("%A"),
-            "present_count": len(attendances),
-            "total_hours": f"{total_hours:.2f}",
-            "lines": report_lines,
-            "generated_on": pytz.utc.localize(datetime.utcnow())
-            .astimezone(user_tz)
-            .strftime("%Y-%m-%d %H:%M"),
-            "generated_by": self.env.user.name,
-            "company": self.env.company.name,
-        }
+    @api.model
+    def _xlsx_write(self, workbook, formats, params, job):
+        date = fields.Date.to_date(params["date"])
+        user_tz = pytz.timezone(params["tz"])
+        cell_format = formats["cell"]
+        sheet, row = self._xlsx_add_sheet(
+            workbook,
+            formats,
+            "Daily Attendance",
+            f"Daily Attendance Report - {date} ({date.strftime('%A')})",
+            ["Employee", "Check In", "Check Out", "Worked Hours"],
+        )
+        total_hours = 0.0
+        for line in self._daily_attendance_lines(date, user_tz):
+            total_hours += line["worked"]
+            sheet.write(row, 0, line["employee"], cell_format)
+            sheet.write(row, 1, line["check_in"], cell_format)
+            sheet.write(row, 2, line["check_out"], cell_format)
+            sheet.write(row, 3, line["worked_hours"], cell_format)
+            row += 1
+        sheet.write(row, 0, "Total", formats["header"])
+        sheet.write(row, 3, f"{total_hours:.2f}", formats["header"])